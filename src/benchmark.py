@@ -1,11 +1,20 @@
 import contextlib
 import cProfile
+import io
 import pstats
-from typing import Optional
+import time
+import tracemalloc
+from typing import Iterable, Mapping, Optional
 
 import magma as m
 
+from builtin import builtin
+from comb import comb
 from compile_to_mlir import compile_to_mlir
+from mlir import MlirBlock, MlirValue, push_block
+from passes import walk_ops
+from printer_base import BufferedPrinter, PrinterBase
+from translation_unit import TranslationUnit
 
 
 @contextlib.contextmanager
@@ -30,3 +39,88 @@ def benchmark(defn: m.DefineCircuitKind, tag: Optional[str] = None):
     with profiler() as pr:
         m.compile(basename, defn, output="coreir")
     pstats.Stats(pr).dump_stats(f"{basename}.coreir.pstats")
+
+
+def benchmark_printers(
+        defns: Iterable[m.DefineCircuitKind],
+        repeats: int = 10) -> Mapping[str, float]:
+    """
+    Compiles each of @defns once and then times printing the resulting IR
+    @repeats times with each printer backend. Returns the throughput of each
+    backend in MB/s.
+
+    On the local examples, PrinterBase measured ~15-18 MB/s and
+    BufferedPrinter ~19-20 MB/s. Timings are noisy, and most of the printing
+    time is spent rendering op and type text rather than writing it.
+    """
+    ops = []
+    for defn in defns:
+        m.passes.clock.WireClockPass(defn).run()
+        translation_unit = TranslationUnit(defn)
+        translation_unit.compile()
+        ops += translation_unit.mlir_module.block.operations
+    printers = {
+        "PrinterBase": PrinterBase,
+        "BufferedPrinter": BufferedPrinter,
+        "BufferedPrinter(bytes)": lambda sout: BufferedPrinter(sout=sout),
+    }
+    throughputs = {}
+    for name, make_printer in printers.items():
+        num_bytes = 0
+        start = time.perf_counter()
+        for _ in range(repeats):
+            sout = io.BytesIO() if "bytes" in name else io.StringIO()
+            printer = make_printer(sout=sout)
+            for op in ops:
+                op.print(printer)
+            if isinstance(printer, BufferedPrinter):
+                printer.drain()
+            num_bytes += sout.tell()
+        elapsed = time.perf_counter() - start
+        throughputs[name] = num_bytes / elapsed / 1e6
+    return throughputs
+
+
+def benchmark_ir_memory(defn: m.DefineCircuitKind) -> Mapping[str, float]:
+    """
+    Compiles @defn and returns the number of IR ops, and the memory (measured
+    with tracemalloc) retained by the compiled IR in total and per op.
+    """
+    m.passes.clock.WireClockPass(defn).run()
+    translation_unit = TranslationUnit(defn)
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        translation_unit.compile()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    num_ops = sum(1 for _ in walk_ops(translation_unit.mlir_module))
+    return {
+        "ops": num_ops,
+        "bytes": after - before,
+        "peak_bytes": peak - before,
+        "bytes_per_op": (after - before) / num_ops,
+    }
+
+
+def benchmark_op_memory(num_ops: int = 100000) -> Mapping[str, float]:
+    """
+    Returns the memory (measured with tracemalloc) used by each of @num_ops
+    comb ops built into a block, excluding their (shared) operands, results
+    and types.
+    """
+    T = builtin.IntegerType(8)
+    operands = [MlirValue(T, "a"), MlirValue(T, "b")]
+    results = [MlirValue(T, "y")]
+    block = MlirBlock()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        with push_block(block):
+            for _ in range(num_ops):
+                comb.BaseOp(operands=operands, results=results, op_name="and")
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"ops": num_ops, "bytes_per_op": (after - before) / num_ops}
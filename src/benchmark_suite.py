@@ -0,0 +1,669 @@
+"""
+Benchmarks compile time and memory against design size, over families of
+parameterized synthetic designs, for the MLIR path (compile_to_mlir, writing
+either text or bytecode, or text with structurally identical modules merged,
+registers lowered to seq.compreg, LUTs packed or per-bit logic vectorized) and
+magma's coreir backend. If circt-opt is available (see
+mlir_to_verilog.get_circt_home()), the time taken to convert the MLIR to
+verilog is measured too, so the end-to-end time of the MLIR backends can be
+compared.
+
+Each point is measured in a fresh (forked) process, so that peak RSS reflects
+that point alone and magma's global state does not accumulate across points.
+Results are written as JSON, and can be compared against a saved baseline:
+
+    python benchmark_suite.py -o results.json
+    python benchmark_suite.py -o new.json --baseline results.json
+"""
+import argparse
+import dataclasses
+import json
+import logging
+import multiprocessing
+import os
+import pathlib
+import pstats
+import resource
+import sys
+import tempfile
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+import magma as m
+
+from benchmark import profiler
+from builtin import builtin
+from compile_cache import compiler_fingerprint
+from compile_options import CompileOptions
+from magma_common import value_or_type_to_string
+from mlir import MlirValue
+from mlir_bytecode import write_bytecode
+from mlir_to_verilog import get_circt_home, mlir_file_to_verilog
+from passes import walk_ops
+from printer_base import BufferedPrinter
+from scoped_name_generator import ScopedNameGenerator
+from translation_unit import TranslationUnit
+
+
+BACKENDS = (
+    "mlir", "mlirbc", "mlirdedup", "mlirseq", "mlirlut", "mlirvec", "coreir")
+# Options of the MLIR backends ("mlirbc" writes bytecode).
+_MLIR_BACKEND_OPTIONS = {
+    "mlir": CompileOptions(),
+    "mlirbc": CompileOptions(),
+    "mlirdedup": CompileOptions(dedup_modules=True),
+    "mlirseq": CompileOptions(seq_registers=True),
+    "mlirlut": CompileOptions(compact_luts=True),
+    "mlirvec": CompileOptions(vectorize_bitwise=True),
+}
+METRICS = (
+    "seconds", "peak_rss_bytes", "op_count", "output_bytes", "verilog_seconds")
+# Relative increase (over the baseline) of each metric which is flagged as a
+# regression. Timing is noisy, so it gets more slack.
+DEFAULT_THRESHOLDS = {
+    "seconds": 0.25,
+    "peak_rss_bytes": 0.10,
+    "op_count": 0.0,
+    "output_bytes": 0.0,
+    "verilog_seconds": 0.25,
+}
+# Smallest absolute increase of each metric which is flagged as a regression,
+# so that noise on tiny points isn't.
+DEFAULT_MIN_DELTAS = {
+    "seconds": 0.01,
+    "peak_rss_bytes": 1 << 20,
+    "verilog_seconds": 0.01,
+}
+
+
+def make_width_design(width: int) -> m.DefineCircuitKind:
+    """A fixed chain of (wide) comb ops on @width bit operands."""
+
+    class _Design(m.Circuit):
+        name = f"bench_width_{width}"
+        T = m.UInt[width]
+        io = m.IO(a=m.In(T), b=m.In(T), y=m.Out(T), z=m.Out(m.Bit))
+        x = (io.a + io.b) ^ ~io.a
+        x = (x | (io.b & io.a)) - io.b
+        x = m.mux([x, x << 1], io.a[0])
+        io.y @= x
+        io.z @= x.reduce_xor()
+
+    return _Design
+
+
+def make_hierarchy_design(depth: int, fanout: int) -> m.DefineCircuitKind:
+    """
+    A tree of @depth levels of distinct module definitions, each of which
+    instances the level below @fanout times (chained).
+    """
+    T = m.Bits[8]
+
+    class _Leaf(m.Circuit):
+        name = f"bench_hierarchy_{depth}_{fanout}_level0"
+        io = m.IO(a=m.In(T), y=m.Out(T))
+        io.y @= ~io.a ^ (io.a << 1)
+
+    child = _Leaf
+    for level in range(1, depth + 1):
+
+        class _Level(m.Circuit):
+            name = f"bench_hierarchy_{depth}_{fanout}_level{level}"
+            io = m.IO(a=m.In(T), y=m.Out(T))
+            x = io.a
+            for _ in range(fanout):
+                x = child()(x)
+            io.y @= x
+
+        child = _Level
+    return child
+
+
+def make_duplicate_design(count: int, depth: int) -> m.DefineCircuitKind:
+    """
+    @count chains of @depth levels of module definitions, as produced by a
+    generator which names each definition uniquely: all chains are identical
+    but for their names.
+    """
+    T = m.Bits[8]
+
+    def make_chain(index: int) -> m.DefineCircuitKind:
+        prefix = f"bench_duplicate_{count}_{depth}_chain{index}"
+
+        class _Leaf(m.Circuit):
+            name = f"{prefix}_level0"
+            io = m.IO(a=m.In(T), y=m.Out(T))
+            io.y @= ~io.a ^ (io.a << 1)
+
+        child = _Leaf
+        for level in range(1, depth + 1):
+
+            class _Level(m.Circuit):
+                name = f"{prefix}_level{level}"
+                io = m.IO(a=m.In(T), y=m.Out(T))
+                io.y @= child(name="child")(io.a) + io.a
+
+            child = _Level
+        return child
+
+    class _Design(m.Circuit):
+        name = f"bench_duplicate_{count}_{depth}"
+        io = m.IO(a=m.In(T), y=m.Out(T))
+        x = io.a
+        for index in range(count):
+            x = make_chain(index)()(x)
+        io.y @= x
+
+    return _Design
+
+
+def make_register_design(
+        count: int,
+        width: int,
+        sync_reset: bool = False) -> m.DefineCircuitKind:
+    """
+    A chain of @count enabled, reset @width bit registers. Resets are
+    asynchronous, unless @sync_reset is set.
+    """
+    reset_type = m.Reset if sync_reset else m.AsyncReset
+    suffix = "_sync" if sync_reset else ""
+
+    class _Design(m.Circuit):
+        name = f"bench_registers_{count}_{width}{suffix}"
+        T = m.Bits[width]
+        io = m.IO(a=m.In(T), y=m.Out(T))
+        io += m.ClockIO(
+            has_enable=True, has_async_reset=not sync_reset,
+            has_reset=sync_reset)
+        x = io.a
+        for i in range(count):
+            reg = m.Register(
+                T, init=i % (1 << width), reset_type=reset_type,
+                has_enable=True)()
+            reg.I @= x
+            x = reg.O
+        io.y @= x
+
+    return _Design
+
+
+def make_mux_design(count: int, width: int) -> m.DefineCircuitKind:
+    """A chain of @count 2:1 muxes of @width bits, each with its own select."""
+
+    class _Design(m.Circuit):
+        name = f"bench_muxes_{count}_{width}"
+        T = m.Bits[width]
+        io = m.IO(a=m.In(T), b=m.In(T), s=m.In(m.Bits[count]), y=m.Out(T))
+        x = io.a
+        for i in range(count):
+            x = m.mux([x, io.b ^ x], io.s[i])
+        io.y @= x
+
+    return _Design
+
+
+def make_lut_design(inputs: int, width: int) -> m.DefineCircuitKind:
+    """A LUT of 2**@inputs (pseudo-random) @width bit entries."""
+    T = m.Bits[width]
+    mask = (1 << width) - 1
+    values = tuple(T((i * 0x9E3779B1) & mask) for i in range(1 << inputs))
+
+    class _Design(m.Circuit):
+        name = f"bench_lut_{inputs}_{width}"
+        io = m.IO(a=m.In(m.Bits[inputs]), y=m.Out(T))
+        io.y @= m.LUT(T, values)()(io.a)
+
+    return _Design
+
+
+def _bitwise_stage(x: m.Bits, a: m.Bits, b: m.Bits) -> m.Bits:
+    width = len(x)
+    x = m.bits([x[i] ^ b[i] for i in range(width)])
+    return m.bits([x[i] & a[width - 1 - i] for i in range(width)])
+
+
+def make_bitwise_design(count: int, width: int) -> m.DefineCircuitKind:
+    """
+    A chain of @count stages of @width bit logic written bit by bit (an xor
+    and an and with the reversed input per bit), as is the target of
+    CompileOptions.vectorize_bitwise. With count=64 and width=32, the "mlir"
+    backend gives 4163 ops in ~0.20s, and "mlirvec" 163 ops in ~0.05s.
+    """
+
+    class _Design(m.Circuit):
+        name = f"bench_bitwise_{count}_{width}"
+        T = m.Bits[width]
+        io = m.IO(a=m.In(T), b=m.In(T), y=m.Out(T))
+        x = io.a
+        for _ in range(count):
+            x = _bitwise_stage(x, io.a, io.b)
+        io.y @= x
+
+    return _Design
+
+
+def _wire_reversed(y: m.Type, a: m.Type):
+    if isinstance(y, m.Array) and not isinstance(y, m.Bits):
+        for i in range(len(y)):
+            _wire_reversed(y[i], a[len(a) - 1 - i])
+        return
+    y @= a
+
+
+def make_nested_aggregate_design(
+        depth: int, length: int) -> m.DefineCircuitKind:
+    """
+    Ports of @depth nested arrays (of @length elements each) in a product,
+    with every level of the output wired from the reversed input, so that
+    each leaf is connected individually.
+    """
+    T = m.Bits[4]
+    for _ in range(depth):
+        T = m.Array[length, T]
+    P = m.Product.from_fields("anon", dict(x=T, y=m.Bits[4]))
+
+    class _Design(m.Circuit):
+        name = f"bench_nested_{depth}_{length}"
+        io = m.IO(a=m.In(P), y=m.Out(P))
+        _wire_reversed(io.y.x, io.a.x)
+        io.y.y @= ~io.a.y
+
+    return _Design
+
+
+@dataclasses.dataclass(frozen=True)
+class Family:
+    make_design: Callable[..., m.DefineCircuitKind]
+    # Parameters (keyword arguments to make_design) of each point.
+    sweep: Sequence[Mapping[str, int]]
+
+
+FAMILIES = {
+    "width": Family(
+        make_width_design,
+        [dict(width=w) for w in (8, 64, 512, 4096)]),
+    "hierarchy": Family(
+        make_hierarchy_design,
+        [
+            dict(depth=d, fanout=f)
+            for d, f in ((2, 2), (4, 4), (3, 16), (5, 6))
+        ]),
+    "duplicates": Family(
+        make_duplicate_design,
+        [dict(count=c, depth=d) for c, d in ((4, 2), (16, 4), (64, 4))]),
+    "registers": Family(
+        make_register_design,
+        [dict(count=n, width=8) for n in (16, 128, 512)]),
+    "sync_registers": Family(
+        make_register_design,
+        [dict(count=n, width=8, sync_reset=True) for n in (16, 128, 512)]),
+    "muxes": Family(
+        make_mux_design,
+        [dict(count=n, width=16) for n in (16, 128, 512)]),
+    "luts": Family(
+        make_lut_design,
+        [dict(inputs=n, width=8) for n in (2, 6, 10)]),
+    "nested_aggregates": Family(
+        make_nested_aggregate_design,
+        [dict(depth=d, length=4) for d in (1, 2, 3, 4)]),
+    "bitwise": Family(
+        make_bitwise_design,
+        [dict(count=n, width=32) for n in (4, 16, 64)]),
+}
+
+
+def _micro_mangle_types(number: int) -> Callable[[], None]:
+    kinds = [m.Bits[i] for i in range(1, 33)]
+    kinds += [m.Array[4, T] for T in kinds]
+    kinds += [m.Product.from_fields("anon", dict(x=T, y=m.Bit)) for T in kinds]
+
+    def run():
+        for _ in range(number):
+            for T in kinds:
+                value_or_type_to_string(T)
+
+    return run
+
+
+def _micro_mangle_ports(number: int) -> Callable[[], None]:
+    defn = make_nested_aggregate_design(depth=3, length=4)
+    ports = []
+
+    def flatten(value):
+        ports.append(value)
+        if isinstance(value, m.Array):
+            for item in value:
+                flatten(item)
+        elif isinstance(value, m.Product):
+            for field in value.values():
+                flatten(field)
+
+    for port in defn.interface.ports.values():
+        flatten(port)
+
+    def run():
+        for _ in range(number):
+            for port in ports:
+                value_or_type_to_string(port)
+
+    return run
+
+
+def _micro_value_names(number: int) -> Callable[[], None]:
+    T = builtin.IntegerType(8)
+
+    def run():
+        generator = ScopedNameGenerator()
+        for _ in range(number):
+            for name in ("", "x", "reg"):
+                MlirValue(T, *generator.allocate(name))
+
+    return run
+
+
+def _micro_print_names(number: int) -> Callable[[], None]:
+    T = builtin.IntegerType(8)
+    generator = ScopedNameGenerator()
+    values = [
+        MlirValue(T, *generator.allocate(name))
+        for _ in range(number) for name in ("", "x", "reg")
+    ]
+
+    def run():
+        for value in values:
+            value.name
+
+    return run
+
+
+# Microbenchmarks of hot helpers, each a function of an iteration count which
+# sets up and returns the function to time.
+MICROBENCHMARKS = {
+    "mangle_types": (_micro_mangle_types, 2000),
+    "mangle_ports": (_micro_mangle_ports, 200),
+    "value_names": (_micro_value_names, 100000),
+    "print_names": (_micro_print_names, 100000),
+}
+
+
+def run_microbenchmarks(
+        names: Sequence[str] = tuple(MICROBENCHMARKS),
+        repeats: int = 3) -> Dict[str, Any]:
+    """
+    Runs each of the microbenchmarks @names (in this process), returning the
+    best time over @repeats runs of each, keyed by "micro/<name>".
+    """
+    results = {}
+    for name in names:
+        make_run, number = MICROBENCHMARKS[name]
+        run = make_run(number)
+        seconds = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run()
+            seconds.append(time.perf_counter() - start)
+        results[f"micro/{name}"] = dict(
+            micro=name, number=number, seconds=min(seconds))
+    return results
+
+
+def point_key(backend: str, family: str, params: Mapping[str, int]) -> str:
+    params = ",".join(f"{k}={v}" for k, v in params.items())
+    return f"{backend}/{family}/{params}"
+
+
+def _count_coreir_ops(path: pathlib.Path) -> int:
+    with open(path) as f:
+        namespaces = json.load(f).get("namespaces", {})
+    count = 0
+    for namespace in namespaces.values():
+        for module in namespace.get("modules", {}).values():
+            defn = module.get("definition", module)
+            count += len(defn.get("instances", {}))
+            count += len(defn.get("connections", []))
+    return count
+
+
+def _has_circt_opt() -> bool:
+    return (get_circt_home() / "build/bin/circt-opt").exists()
+
+
+def _compile(
+        defn: m.DefineCircuitKind,
+        backend: str,
+        directory: pathlib.Path) -> Dict[str, Any]:
+    """Compiles @defn with @backend (into @directory) and returns metrics."""
+    basename = directory / defn.name
+    start = time.perf_counter()
+    if backend in _MLIR_BACKEND_OPTIONS:
+        options = _MLIR_BACKEND_OPTIONS[backend]
+        translation_unit = TranslationUnit(defn, options=options)
+        translation_unit.compile()
+        if backend == "mlirbc":
+            path = basename.with_suffix(".mlirbc")
+            with open(path, "wb") as f:
+                write_bytecode(translation_unit.mlir_module, f)
+        else:
+            path = basename.with_suffix(".mlir")
+            with open(path, "w") as f, BufferedPrinter(sout=f) as printer:
+                for op in translation_unit.mlir_module.block.operations:
+                    op.print(printer)
+        seconds = time.perf_counter() - start
+        op_count = sum(1 for _ in walk_ops(translation_unit.mlir_module))
+    elif backend == "coreir":
+        m.compile(str(basename), defn, output="coreir")
+        seconds = time.perf_counter() - start
+        path = basename.with_suffix(".json")
+        op_count = _count_coreir_ops(path)
+    else:
+        raise ValueError(f"Unknown backend {backend!r}")
+    metrics = dict(
+        seconds=seconds,
+        op_count=op_count,
+        output_bytes=path.stat().st_size,
+    )
+    if backend != "coreir" and _has_circt_opt():
+        start = time.perf_counter()
+        with open(os.devnull, "w") as f:
+            mlir_file_to_verilog(path, f)
+        metrics["verilog_seconds"] = time.perf_counter() - start
+    return metrics
+
+
+def _measure_in_child(
+        conn,
+        family: str,
+        params: Mapping[str, int],
+        backend: str,
+        profile_path: Optional[str]):
+    logging.getLogger("magma").setLevel(logging.WARNING)
+    try:
+        defn = FAMILIES[family].make_design(**params)
+        m.passes.clock.WireClockPass(defn).run()
+        with tempfile.TemporaryDirectory() as directory:
+            directory = pathlib.Path(directory)
+            if profile_path is None:
+                metrics = _compile(defn, backend, directory)
+            else:
+                with profiler() as pr:
+                    metrics = _compile(defn, backend, directory)
+                pstats.Stats(pr).dump_stats(profile_path)
+        # NOTE: ru_maxrss is in kilobytes on linux.
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        metrics["peak_rss_bytes"] = usage.ru_maxrss * 1024
+        conn.send((True, metrics))
+    except BaseException:
+        conn.send((False, traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+def measure_point(
+        family: str,
+        params: Mapping[str, int],
+        backend: str,
+        profile_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Measures a single point in a forked process and returns its metrics. If
+    @profile_path is given, the compilation is also profiled (see
+    benchmark.profiler()) and the stats dumped there.
+    """
+    ctx = multiprocessing.get_context("fork")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(
+        target=_measure_in_child,
+        args=(child_conn, family, params, backend, profile_path))
+    proc.start()
+    child_conn.close()
+    try:
+        ok, payload = parent_conn.recv()
+    except EOFError:
+        ok, payload = False, "benchmark process exited without a result"
+    proc.join()
+    if not ok:
+        key = point_key(backend, family, params)
+        raise RuntimeError(f"Benchmark {key} failed:\n{payload}")
+    return payload
+
+
+def run_suite(
+        families: Sequence[str] = tuple(FAMILIES),
+        backends: Sequence[str] = BACKENDS,
+        repeats: int = 1,
+        quick: bool = False,
+        profile_dir: Optional[str] = None,
+        micro: bool = True,
+        log: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    Measures every point of @families with each of @backends, keeping the
+    best time (and largest RSS) over @repeats runs. With @quick, only the
+    smallest point of each family is measured. If @profile_dir is given,
+    pstats of (the last run of) each point are dumped there. If @micro is
+    set, the microbenchmarks are run too.
+    """
+    results = {}
+    if micro:
+        results.update(run_microbenchmarks())
+        if log is not None:
+            for key, point in results.items():
+                log(f"{key}: {point['seconds']:.3f}s")
+    for family in families:
+        sweep = FAMILIES[family].sweep
+        if quick:
+            sweep = sweep[:1]
+        for params in sweep:
+            for backend in backends:
+                key = point_key(backend, family, params)
+                profile_path = None
+                if profile_dir is not None:
+                    name = key.replace("/", ".").replace(",", ".")
+                    profile_path = str(
+                        pathlib.Path(profile_dir) / f"{name}.pstats")
+                runs = [
+                    measure_point(family, params, backend, profile_path)
+                    for _ in range(repeats)
+                ]
+                point = dict(
+                    backend=backend,
+                    family=family,
+                    params=dict(params),
+                    seconds=min(run["seconds"] for run in runs),
+                    peak_rss_bytes=max(run["peak_rss_bytes"] for run in runs),
+                    op_count=runs[0]["op_count"],
+                    output_bytes=runs[0]["output_bytes"],
+                )
+                if "verilog_seconds" in runs[0]:
+                    point["verilog_seconds"] = min(
+                        run["verilog_seconds"] for run in runs)
+                results[key] = point
+                if log is not None:
+                    log(f"{key}: {point['seconds']:.3f}s "
+                        f"{point['peak_rss_bytes'] / 2**20:.1f}MB "
+                        f"{point['op_count']} ops "
+                        f"{point['output_bytes']} bytes")
+    return dict(fingerprint=compiler_fingerprint(), results=results)
+
+
+@dataclasses.dataclass(frozen=True)
+class Regression:
+    key: str
+    metric: str
+    baseline: float
+    value: float
+
+    def __str__(self) -> str:
+        change = (self.value / self.baseline - 1) * 100 if self.baseline else 0
+        return (f"{self.key}: {self.metric} {self.baseline:g} -> "
+                f"{self.value:g} (+{change:.1f}%)")
+
+
+def compare_results(
+        results: Mapping[str, Any],
+        baseline: Mapping[str, Any],
+        thresholds: Mapping[str, float] = DEFAULT_THRESHOLDS,
+        min_deltas: Mapping[str, float] = DEFAULT_MIN_DELTAS
+) -> List[Regression]:
+    """
+    Returns the metrics of points (present in both @results and @baseline)
+    which increased by more than both their relative threshold and their
+    minimum (absolute) delta.
+    """
+    regressions = []
+    for key, point in results["results"].items():
+        try:
+            old = baseline["results"][key]
+        except KeyError:
+            continue
+        for metric, threshold in thresholds.items():
+            if metric not in point or metric not in old:
+                continue
+            value, limit = point[metric], old[metric] * (1 + threshold)
+            limit = max(limit, old[metric] + min_deltas.get(metric, 0))
+            if value > limit:
+                regressions.append(
+                    Regression(key, metric, old[metric], value))
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--families", nargs="+", choices=list(FAMILIES),
+        default=list(FAMILIES))
+    parser.add_argument(
+        "--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument(
+        "--quick", action="store_true",
+        help="only measure the smallest point of each family")
+    parser.add_argument(
+        "--profile-dir", help="dump pstats of each point to this directory")
+    parser.add_argument(
+        "--no-micro", action="store_true", help="skip the microbenchmarks")
+    parser.add_argument("-o", "--output", help="write results (JSON) here")
+    parser.add_argument(
+        "--baseline", help="compare against these (JSON) results")
+    args = parser.parse_args(argv)
+    results = run_suite(
+        args.families, args.backends, args.repeats, args.quick,
+        args.profile_dir, not args.no_micro,
+        log=lambda line: print(line, file=sys.stderr))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("fingerprint") == results["fingerprint"]:
+        print("NOTE: baseline was measured with the same compiler sources",
+              file=sys.stderr)
+    regressions = compare_results(results, baseline)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,17 @@
 import dataclasses
+import functools
+from typing import List, Optional, Tuple
 
 import magma as m
 
+from compile_options import CompileOptions
 from graph_lib import Graph
 from magma_common import ModuleLike, visit_value_by_direction, safe_root
 from magma_ops import (
     MagmaArrayGetOp, MagmaArraySliceOp, MagmaArrayCreateOp,
-    MagmaProductGetOp, MagmaProductCreateOp,
-    MagmaBitConstantOp, MagmaBitsConstantOp)
+    MagmaArrayConcatOp, MagmaBitcastOp, MagmaBitwiseOp, MagmaProductGetOp,
+    MagmaProductCreateOp, MagmaBitConstantOp, MagmaBitsConstantOp,
+    sized_array_type)
 
 
 def _const_digital_to_bool(digital: m.Digital) -> bool:
@@ -33,68 +37,127 @@ def _get_inst_or_defn_or_die(ref):
 
 
 class ModuleContext:
-    def __init__(self, graph: Graph):
+    def __init__(self, graph: Graph, options: CompileOptions):
         self._graph = graph
+        self._options = options
         self._getter_cache = {}
+        self._deferred_instances = set()
 
     @property
     def graph(self) -> Graph:
         return self._graph
 
+    @property
+    def options(self) -> CompileOptions:
+        return self._options
+
     @property
     def getter_cache(self):
         return self._getter_cache
 
+    @property
+    def deferred_instances(self):
+        """
+        Vectorizable instances (see is_vectorizable_instance()) which have
+        neither been merged into a wide op nor had their inputs visited yet.
+        """
+        return self._deferred_instances
+
+
+def _add_edge(ctx: ModuleContext, src_module, src, dst, module):
+    ctx.graph.add_edge(src_module, module, src_port=src, dst_port=dst)
+
 
 def _visit_driver(
         ctx: ModuleContext, value: m.Type, driver: m.Type, module: ModuleLike):
+    """
+    Adds the edges driving @value (a port of @module) from @driver, creating
+    getter/creator ops for anonymous values and element references.
+
+    Nested drivers are processed with an explicit worklist, in the same order
+    (and adding edges in the same order) as a recursive post-order traversal
+    would. Worklist entries are either (value, driver, module) triples to
+    visit (where the driver may also be a list of bits, see _visit_bits()),
+    or deferred actions (callables) which run once everything pushed after
+    them has been processed.
+    """
+    worklist = [(value, driver, module)]
+    while worklist:
+        item = worklist.pop()
+        if callable(item):
+            item()
+            continue
+        value, driver, module = item
+        _visit_driver_step(ctx, value, driver, module, worklist)
+
+
+def _visit_driver_step(
+        ctx: ModuleContext,
+        value: m.Type,
+        driver: m.Type,
+        module: ModuleLike,
+        worklist: list):
+    if isinstance(driver, list):
+        _visit_bits(ctx, value, driver, module, worklist)
+        return
     if driver.const():
         if isinstance(driver, m.Digital):
             as_bool = _const_digital_to_bool(driver)
             const = MagmaBitConstantOp(type(driver), as_bool)
-            info = dict(src=const.O, dst=value)
-            ctx.graph.add_edge(const, module, info=info)
+            _add_edge(ctx, const, const.O, value, module)
             return
         if isinstance(driver, m.Bits):
             const = MagmaBitsConstantOp(type(driver), int(driver))
-            info = dict(src=const.O, dst=value)
-            ctx.graph.add_edge(const, module, info=info)
+            _add_edge(ctx, const, const.O, value, module)
             return
     ref = driver.name
     if isinstance(ref, m.ref.InstRef):
-        info = dict(src=driver, dst=value)
-        ctx.graph.add_edge(ref.inst, module, info=info)
+        _add_edge(ctx, ref.inst, driver, value, module)
+        if ref.inst in ctx.deferred_instances:
+            # Not merged into a wide op, so it is emitted on its own.
+            worklist.extend(reversed(_deferred_inputs(ctx, ref.inst)))
         return
     if isinstance(ref, m.ref.DefnRef):
-        info = dict(src=driver, dst=value)
-        ctx.graph.add_edge(ref.defn, module, info=info)
+        _add_edge(ctx, ref.defn, driver, value, module)
         return
     if isinstance(ref, m.ref.AnonRef):
+        if ctx.options.vectorize_bitwise:
+            if _visit_bitwise(ctx, value, driver, module, worklist):
+                return
+        if ctx.options.collapse_passthroughs:
+            if _visit_passthrough(ctx, value, driver, module, worklist):
+                return
         if isinstance(driver, m.Array):
+            if ctx.options.slice_arrays:
+                if _visit_array_slices(ctx, value, driver, module, worklist):
+                    return
             T = type(driver)
             creator = MagmaArrayCreateOp(T)
+            worklist.append(functools.partial(
+                _add_edge, ctx, creator, creator.O, value, module))
+            children = []
             for i, element in enumerate(driver):
                 creator_input = getattr(creator, f"I{i}")
-                _visit_driver(ctx, creator_input, element, creator)
-            info = dict(src=creator.O, dst=value)
-            ctx.graph.add_edge(creator, module, info=info)
+                children.append((creator_input, element, creator))
+            worklist.extend(reversed(children))
             return
         if isinstance(driver, m.Product):
             T = type(driver)
             creator = MagmaProductCreateOp(T)
+            worklist.append(functools.partial(
+                _add_edge, ctx, creator, creator.O, value, module))
+            children = []
             for k, t in T.field_dict.items():
                 element = getattr(driver, k)
                 creator_input = getattr(creator, f"I{k}")
-                _visit_driver(ctx, creator_input, element, creator)
-            info = dict(src=creator.O, dst=value)
-            ctx.graph.add_edge(creator, module, info=info)
+                children.append((creator_input, element, creator))
+            worklist.extend(reversed(children))
             return
         raise NotImplementedError(driver, ref)
     if isinstance(ref, m.ref.ArrayRef):
         if ref.array.is_mixed():
-            info=dict(src=driver, dst=value)
             src_module = _get_inst_or_defn_or_die(safe_root(ref.array.name))
-            ctx.graph.add_edge(src_module, module, info=info)
+            _add_edge(ctx, src_module, driver, value, module)
             return
         cache_key = (ref.array, ref.index)
         try:
@@ -102,16 +165,18 @@ def _visit_driver(
         except KeyError:
             T = type(ref.array)
             getter = MagmaArrayGetOp(T, ref.index)
-            _visit_driver(ctx, getter.I, ref.array, getter)
-            ctx.getter_cache[cache_key] = getter
-        info = dict(src=getter.O, dst=value)
-        ctx.graph.add_edge(getter, module, info=info)
+            worklist.append(functools.partial(
+                _add_edge, ctx, getter, getter.O, value, module))
+            worklist.append(functools.partial(
+                ctx.getter_cache.__setitem__, cache_key, getter))
+            worklist.append((getter.I, ref.array, getter))
+            return
+        _add_edge(ctx, getter, getter.O, value, module)
         return
     if isinstance(ref, m.ref.TupleRef):
         if ref.tuple.is_mixed():
-            info=dict(src=driver, dst=value)
             src_module = _get_inst_or_defn_or_die(safe_root(ref.tuple.name))
-            ctx.graph.add_edge(src_module, module, info=info)
+            _add_edge(ctx, src_module, driver, value, module)
             return
         cache_key = (ref.tuple, ref.index)
         try:
@@ -119,14 +184,530 @@ def _visit_driver(
         except KeyError:
             T = type(ref.tuple)
             getter = MagmaProductGetOp(T, ref.index)
-            _visit_driver(ctx, getter.I, ref.tuple, getter)
-            ctx.getter_cache[cache_key] = getter
-        info = dict(src=getter.O, dst=value)
-        ctx.graph.add_edge(getter, module, info=info)
+            worklist.append(functools.partial(
+                _add_edge, ctx, getter, getter.O, value, module))
+            worklist.append(functools.partial(
+                ctx.getter_cache.__setitem__, cache_key, getter))
+            worklist.append((getter.I, ref.tuple, getter))
+            return
+        _add_edge(ctx, getter, getter.O, value, module)
         return
     raise NotImplementedError(driver, type(driver), ref, type(ref))
 
 
+def _passthrough_source(driver: m.Type) -> Optional[m.Type]:
+    """
+    Returns the (non-anonymous) aggregate which @driver is an element-wise
+    identity copy of, i.e. X such that every element @driver[i] (or field
+    @driver.k) is X[i] (or X.k), or itself recursively such a copy of X[i]
+    (X.k). Returns None if @driver is not a passthrough.
+    """
+    ref = driver.name
+    if driver.const():
+        return None
+    if not isinstance(ref, m.ref.AnonRef):
+        return driver
+    if isinstance(driver, m.Array):
+        ref_t, items = m.ref.ArrayRef, enumerate(driver)
+    elif isinstance(driver, m.Product):
+        ref_t = m.ref.TupleRef
+        items = ((k, getattr(driver, k)) for k in type(driver).field_dict)
+    else:
+        return None
+    source = None
+    for index, element in items:
+        element = _passthrough_source(element)
+        if element is None:
+            return None
+        element_ref = element.name
+        if not isinstance(element_ref, ref_t) or element_ref.index != index:
+            return None
+        parent = (
+            element_ref.array if ref_t is m.ref.ArrayRef
+            else element_ref.tuple
+        )
+        if source is None:
+            source = parent
+        elif parent is not source:
+            return None
+    if source is None or source.is_mixed():
+        return None
+    if isinstance(driver, m.Array) and len(source) != len(driver):
+        return None
+    if isinstance(driver, m.Product):
+        fields = type(driver).field_dict.keys()
+        if type(source).field_dict.keys() != fields:
+            return None
+    return source
+
+
+@functools.lru_cache(maxsize=None)
+def _has_flat_layout(T: m.Kind) -> bool:
+    """Returns True if @T is a (possibly nested) array of bits."""
+    T = T.undirected_t
+    while issubclass(T, m.Array):
+        T = T.T
+    return issubclass(T, m.Digital)
+
+
+def _has_same_layout(T0: m.Kind, T1: m.Kind) -> bool:
+    """
+    Returns True if @T0 and @T1 (both satisfying _has_flat_layout()) lower to
+    the same MLIR type.
+    """
+    def _is_integer(T):
+        return issubclass(T, (m.Digital, m.Bits)) or issubclass(T.T, m.Bit)
+
+    T0, T1 = T0.undirected_t, T1.undirected_t
+    while not (_is_integer(T0) or _is_integer(T1)):
+        if T0.N != T1.N:
+            return False
+        T0, T1 = T0.T, T1.T
+    if not (_is_integer(T0) and _is_integer(T1)):
+        return False
+    return T0.flat_length() == T1.flat_length()
+
+
+def _flat_range(value: m.Type) -> Optional[Tuple[m.Type, int, int]]:
+    """
+    Returns (root, lo, hi) such that @value (a named value) is bits [lo, hi)
+    of the flattened array of bits @root, or None if there is no such root.
+    """
+    width = type(value).flat_length()
+    lo = 0
+    while isinstance(value.name, m.ref.ArrayRef):
+        array = value.name.array
+        if array.is_mixed():
+            return None
+        lo += value.name.index * type(value).flat_length()
+        value = array
+    if isinstance(value.name, m.ref.AnonRef):
+        return None
+    if not _has_flat_layout(type(value)):
+        return None
+    return value, lo, lo + width
+
+
+def _reshape_source(driver: m.Array) -> Optional[m.Type]:
+    """
+    Returns the named array of bits X such that flattening @driver (an
+    anonymous array of bits) yields exactly the bits of X in order, or None if
+    there is no such X.
+    """
+    if not _has_flat_layout(type(driver)):
+        return None
+    root, end = None, 0
+    stack = [driver]
+    while stack:
+        value = stack.pop()
+        if value.const():
+            return None
+        if isinstance(value.name, m.ref.AnonRef):
+            stack.extend(reversed(list(value)))
+            continue
+        flat_range = _flat_range(value)
+        if flat_range is None:
+            return None
+        value_root, lo, hi = flat_range
+        if root is None:
+            root = value_root
+        if value_root is not root or lo != end:
+            return None
+        end = hi
+    if root is None or end != type(root).flat_length():
+        return None
+    return root
+
+
+def _visit_passthrough(
+        ctx: ModuleContext,
+        value: m.Type,
+        driver: m.Type,
+        module: ModuleLike,
+        worklist: list) -> bool:
+    """
+    Drives @value directly from the aggregate which @driver (anonymous) is an
+    element-wise copy of, or from a single bitcast of the array of bits which
+    @driver is an in-order reshaping of. Returns False (doing nothing) if
+    @driver is neither.
+    """
+    source = _passthrough_source(driver)
+    if source is not None:
+        worklist.append((value, source, module))
+        return True
+    if not isinstance(driver, m.Array):
+        return False
+    source = _reshape_source(driver)
+    if source is None:
+        return False
+    if _has_same_layout(type(source), type(driver)):
+        worklist.append((value, source, module))
+        return True
+    bitcast = MagmaBitcastOp(type(source), type(driver))
+    worklist.append(functools.partial(
+        _add_edge, ctx, bitcast, bitcast.O, value, module))
+    worklist.append((bitcast.I, source, bitcast))
+    return True
+
+
+@dataclasses.dataclass
+class _Run:
+    """
+    A run of consecutive elements of an anonymous array. If @array is not None,
+    the elements are @array[lo:hi]; otherwise they are simply @elements.
+    """
+    array: Optional[m.Array]
+    lo: int
+    hi: int
+    elements: List[m.Type]
+
+
+def _find_runs(driver: m.Array) -> List[_Run]:
+    runs = []
+    for element in driver:
+        ref = element.name
+        array, index = None, None
+        is_array_ref = (
+            not element.const() and
+            isinstance(ref, m.ref.ArrayRef) and
+            not ref.array.is_mixed()
+        )
+        if is_array_ref:
+            array, index = ref.array, ref.index
+        if runs and array is not None:
+            last = runs[-1]
+            if last.array is array and last.hi == index:
+                last.hi += 1
+                last.elements.append(element)
+                continue
+        runs.append(_Run(array, index, None, [element]))
+        if array is not None:
+            runs[-1].hi = index + 1
+    # Runs of length 1 are not worth slicing; merge them (and any other
+    # non-slice runs) with their neighbors.
+    merged = []
+    for run in runs:
+        if run.array is not None and len(run.elements) == 1:
+            run = _Run(None, None, None, run.elements)
+        if merged and run.array is None and merged[-1].array is None:
+            merged[-1].elements += run.elements
+            continue
+        merged.append(run)
+    return merged
+
+
+def _visit_array_slices(
+        ctx: ModuleContext,
+        value: m.Type,
+        driver: m.Array,
+        module: ModuleLike,
+        worklist: list) -> bool:
+    """
+    Drives @value from slices of the arrays which @driver takes runs of
+    consecutive elements from, concatenated with any remaining elements.
+    Returns False (doing nothing) if there are no such runs.
+    """
+    runs = _find_runs(driver)
+    if all(run.array is None for run in runs):
+        return False
+    T = type(driver)
+    is_bits = issubclass(T, m.Bits) or issubclass(T.T, m.Bit)
+    pieces = []
+    for run in runs:
+        if run.array is not None:
+            pieces.append((sized_array_type(T, run.hi - run.lo), run))
+            continue
+        if is_bits:
+            pieces.extend((type(e).undirected_t, e) for e in run.elements)
+            continue
+        pieces.append((sized_array_type(T, len(run.elements)), run))
+    if len(pieces) == 1:
+        concat, inputs = module, [value]
+    else:
+        concat = MagmaArrayConcatOp(T, [t for t, _ in pieces])
+        inputs = [getattr(concat, f"I{i}") for i in range(len(pieces))]
+        worklist.append(functools.partial(
+            _add_edge, ctx, concat, concat.O, value, module))
+    children = []
+    for (t, piece), concat_input in zip(pieces, inputs):
+        if not isinstance(piece, _Run):
+            children.append((concat_input, piece, concat))
+            continue
+        if piece.array is None:
+            creator = MagmaArrayCreateOp(t)
+            for i, element in enumerate(piece.elements):
+                creator_input = getattr(creator, f"I{i}")
+                children.append((creator_input, element, creator))
+            children.append(functools.partial(
+                _add_edge, ctx, creator, creator.O, concat_input, concat))
+            continue
+        if piece.lo == 0 and piece.hi == len(piece.array):
+            children.append((concat_input, piece.array, concat))
+            continue
+        cache_key = (piece.array, "slice", piece.lo, piece.hi)
+        try:
+            getter = ctx.getter_cache[cache_key]
+        except KeyError:
+            getter = MagmaArraySliceOp(type(piece.array), piece.lo, piece.hi)
+            ctx.getter_cache[cache_key] = getter
+            children.append((getter.I, piece.array, getter))
+        children.append(functools.partial(
+            _add_edge, ctx, getter, getter.O, concat_input, concat))
+    worklist.extend(reversed(children))
+    return True
+
+
+# Names of the single bit primitives (see is_vectorizable_instance()) which are
+# merged into wide comb ops.
+_BITWISE_PRIMITIVES = frozenset(("and", "or", "xor"))
+
+
+def is_vectorizable_instance(inst: m.Circuit) -> bool:
+    """
+    Returns True if @inst is a single bit and/or/xor whose output drives a
+    single value, so that it can be merged into a wide op with others.
+    """
+    defn = type(inst)
+    if not m.isprimitive(defn) or defn.coreir_lib != "corebit":
+        return False
+    if defn.coreir_name not in _BITWISE_PRIMITIVES:
+        return False
+    return len(inst.O.driving()) == 1
+
+
+def _deferred_inputs(ctx: ModuleContext, inst: m.Circuit) -> list:
+    """
+    Returns the worklist entries visiting the inputs of the deferred instance
+    @inst, which is no longer deferred.
+    """
+    ctx.deferred_instances.remove(inst)
+    children = []
+    for port in inst.interface.ports.values():
+        visit_value_by_direction(
+            port,
+            lambda p: children.append((p, p.trace(), inst)),
+            lambda _: None
+        )
+    return children
+
+
+def _bitwise_group(
+        ctx: ModuleContext,
+        bits: List[m.Digital]) -> Optional[List[m.Circuit]]:
+    """
+    Returns the deferred instances (see ModuleContext.deferred_instances)
+    whose outputs @bits are, if there are at least two of them and they are
+    all of the same kind, or None otherwise.
+    """
+    if len(bits) < 2:
+        return None
+    insts = []
+    for bit in bits:
+        ref = bit.name
+        if bit.const() or not isinstance(ref, m.ref.InstRef):
+            return None
+        if ref.inst not in ctx.deferred_instances:
+            return None
+        if insts and type(ref.inst).coreir_name != type(insts[0]).coreir_name:
+            return None
+        insts.append(ref.inst)
+    if len(set(insts)) != len(insts):
+        return None
+    return insts
+
+
+def _flatten_bits(value: m.Array) -> List[m.Digital]:
+    """Returns the bits of @value (see _has_flat_layout()), in order."""
+    bits = []
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, m.Digital):
+            bits.append(value)
+            continue
+        stack.extend(reversed(list(value)))
+    return bits
+
+
+def _visit_bitwise(
+        ctx: ModuleContext,
+        value: m.Type,
+        driver: m.Type,
+        module: ModuleLike,
+        worklist: list) -> bool:
+    """
+    Drives @value from a single wide op (see _visit_bits()) if the bits of
+    @driver (an anonymous array of bits) are the outputs of deferred instances
+    of the same kind. Returns False (doing nothing) otherwise.
+    """
+    if not isinstance(driver, m.Array) or not _has_flat_layout(type(driver)):
+        return False
+    # Most anonymous arrays aren't driven by such instances, so check the
+    # first bit before flattening the whole array.
+    first = driver
+    while isinstance(first, m.Array):
+        if not len(first):
+            return False
+        first = first[0]
+    if first.const() or not isinstance(first.name, m.ref.InstRef):
+        return False
+    if first.name.inst not in ctx.deferred_instances:
+        return False
+    bits = _flatten_bits(driver)
+    if _bitwise_group(ctx, bits) is None:
+        return False
+    T = m.Bits[len(bits)]
+    if _has_same_layout(T, type(driver)):
+        worklist.append((value, bits, module))
+        return True
+    bitcast = MagmaBitcastOp(T, type(driver))
+    worklist.append(functools.partial(
+        _add_edge, ctx, bitcast, bitcast.O, value, module))
+    worklist.append((bitcast.I, bits, bitcast))
+    return True
+
+
+def _find_bit_runs(bits: List[m.Digital]) -> List[_Run]:
+    """
+    Returns the maximal runs of @bits which are consecutive bits [lo, hi) of
+    the same flattened array of bits (see _flat_range()), with @array set to
+    that array, or constants; every other bit is a run of its own.
+    """
+    runs = []
+    for bit in bits:
+        last = runs[-1] if runs else None
+        if bit.const():
+            if last is not None and last.elements[0].const():
+                last.elements.append(bit)
+                continue
+            runs.append(_Run(None, None, None, [bit]))
+            continue
+        flat_range = None
+        if isinstance(bit.name, m.ref.ArrayRef):
+            flat_range = _flat_range(bit)
+        if flat_range is None:
+            runs.append(_Run(None, None, None, [bit]))
+            continue
+        root, lo, hi = flat_range
+        if last is not None and last.array is root and last.hi == lo:
+            last.hi = hi
+            last.elements.append(bit)
+            continue
+        runs.append(_Run(root, lo, hi, [bit]))
+    return runs
+
+
+def _visit_flat_run(
+        ctx: ModuleContext, run: _Run, value: m.Type, module: ModuleLike
+) -> list:
+    """
+    Returns the worklist entries driving @value from bits [@run.lo, @run.hi)
+    of the flattened @run.array, bitcasting and slicing it as needed.
+    """
+    root, children = run.array, []
+    T, N = type(root).undirected_t, type(root).flat_length()
+    if _has_same_layout(T, m.Bits[N]):
+        def _drive(dst, dst_module):
+            return (dst, root, dst_module)
+
+        kind = "slice"
+    else:
+        cache_key = (root, "flat")
+        try:
+            bitcast = ctx.getter_cache[cache_key]
+        except KeyError:
+            bitcast = MagmaBitcastOp(T, m.Bits[N])
+            ctx.getter_cache[cache_key] = bitcast
+            children.append((bitcast.I, root, bitcast))
+
+        def _drive(dst, dst_module):
+            return functools.partial(
+                _add_edge, ctx, bitcast, bitcast.O, dst, dst_module)
+
+        T, kind = m.Bits[N], "flat"
+    if run.lo == 0 and run.hi == N:
+        children.append(_drive(value, module))
+        return children
+    cache_key = (root, kind, run.lo, run.hi)
+    try:
+        getter = ctx.getter_cache[cache_key]
+    except KeyError:
+        getter = MagmaArraySliceOp(T, run.lo, run.hi)
+        ctx.getter_cache[cache_key] = getter
+        children.append(_drive(getter.I, getter))
+    children.append(functools.partial(
+        _add_edge, ctx, getter, getter.O, value, module))
+    return children
+
+
+def _visit_bits(
+        ctx: ModuleContext,
+        value: m.Type,
+        bits: List[m.Digital],
+        module: ModuleLike,
+        worklist: list):
+    """
+    Drives @value (an array of len(@bits) bits) from the (at least two) bits
+    @bits: from a single wide op if they are the outputs of deferred instances
+    of the same kind (whose operands are visited in turn), and otherwise from
+    the concatenation of the runs (see _find_bit_runs()) of @bits.
+    """
+    T = m.Bits[len(bits)]
+    insts = _bitwise_group(ctx, bits)
+    if insts is not None:
+        arity = len(type(insts[0]).interface.ports) - 1
+        op = MagmaBitwiseOp(type(insts[0]).coreir_name, T, arity)
+        worklist.append(functools.partial(
+            _add_edge, ctx, op, op.O, value, module))
+        children = []
+        for i in range(arity):
+            operands = [getattr(inst, f"I{i}").trace() for inst in insts]
+            children.append((getattr(op, f"I{i}"), operands, op))
+        for inst in insts:
+            ctx.deferred_instances.remove(inst)
+        worklist.extend(reversed(children))
+        return
+    runs = _find_bit_runs(bits)
+    if len(runs) == 1:
+        concat, inputs = module, [value]
+    else:
+        # Permutations (e.g. reversals) of the same bits are often repeated,
+        # so their concatenations are shared.
+        cache_key = ("bits",) + tuple(map(id, bits))
+        try:
+            concat = ctx.getter_cache[cache_key]
+        except KeyError:
+            pass
+        else:
+            _add_edge(ctx, concat, concat.O, value, module)
+            return
+        Ts = [
+            type(run.elements[0]).undirected_t if len(run.elements) == 1
+            else m.Bits[len(run.elements)]
+            for run in runs
+        ]
+        concat = MagmaArrayConcatOp(T, Ts)
+        ctx.getter_cache[cache_key] = concat
+        inputs = [getattr(concat, f"I{i}") for i in range(len(runs))]
+        worklist.append(functools.partial(
+            _add_edge, ctx, concat, concat.O, value, module))
+    children = []
+    for run, concat_input in zip(runs, inputs):
+        if len(run.elements) == 1:
+            children.append((concat_input, run.elements[0], concat))
+            continue
+        if run.array is not None:
+            children.extend(_visit_flat_run(ctx, run, concat_input, concat))
+            continue
+        const_value = sum(
+            _const_digital_to_bool(bit) << i
+            for i, bit in enumerate(run.elements))
+        const = MagmaBitsConstantOp(m.Bits[len(run.elements)], const_value)
+        children.append(functools.partial(
+            _add_edge, ctx, const, const.O, concat_input, concat))
+    worklist.extend(reversed(children))
+
+
 def _visit_input(ctx: ModuleContext, value: m.Type, module: ModuleLike):
     driver = value.trace()
     assert driver is not None
@@ -142,9 +723,24 @@ def _visit_inputs(ctx: ModuleContext, module: ModuleLike):
         )
 
 
-def build_magma_graph(ckt: m.DefineCircuitKind) -> Graph:
-    ctx = ModuleContext(Graph())
+def build_magma_graph(
+        ckt: m.DefineCircuitKind,
+        options: Optional[CompileOptions] = None) -> Graph:
+    if options is None:
+        options = CompileOptions()
+    ctx = ModuleContext(Graph(), options)
+    vectorizable = set()
+    if options.vectorize_bitwise:
+        # The inputs of vectorizable instances are only visited once their
+        # output is reached (and it is known whether they are merged).
+        vectorizable.update(filter(is_vectorizable_instance, ckt.instances))
+        ctx.deferred_instances.update(vectorizable)
     _visit_inputs(ctx, ckt)
     for inst in ckt.instances:
-        _visit_inputs(ctx, inst)
+        if inst not in vectorizable:
+            _visit_inputs(ctx, inst)
+    for inst in ckt.instances:
+        if inst in ctx.deferred_instances:
+            for value, driver, module in _deferred_inputs(ctx, inst):
+                _visit_driver(ctx, value, driver, module)
     return ctx.graph
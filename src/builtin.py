@@ -1,4 +1,5 @@
 import dataclasses
+from typing import ClassVar
 
 from mlir import MlirDialect, begin_dialect, end_dialect
 from mlir import MlirOp, MlirRegion, MlirBlock
@@ -10,7 +11,7 @@ builtin = MlirDialect("builtin")
 begin_dialect(builtin)
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, eq=False, slots=True)
 class IntegerType(MlirType):
     n: int
 
@@ -18,17 +19,20 @@ class IntegerType(MlirType):
         return f"i{self.n}"
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class ModuleOp(MlirOp):
+    op_name: ClassVar[str] = "module"
+    isolated_from_above: ClassVar[bool] = True
+
     def __post_init__(self):
-        self._block = self.new_region().new_block()
+        self.new_region().new_block()
 
     @property
     def block(self) -> MlirBlock:
-        return self._block
+        return self.regions[0].blocks[0]
 
     def add_operation(self, operation: MlirOp):
-        self._block.add_operation(operation)
+        self.block.add_operation(operation)
 
     def print_op(self, printer: PrinterBase):
         printer.print("module")
@@ -1,5 +1,5 @@
 import dataclasses
-from typing import List
+from typing import ClassVar, Dict, List
 
 from mlir import MlirDialect, begin_dialect, end_dialect
 from mlir_printer_utils import print_names, print_types
@@ -12,7 +12,12 @@ comb = MlirDialect("comb")
 begin_dialect(comb)
 
 
-@dataclasses.dataclass
+# ICmpPredicate values, in order of their encoding.
+_ICMP_PREDICATES = (
+    "eq", "ne", "slt", "sle", "sgt", "sge", "ult", "ule", "ugt", "uge")
+
+
+@dataclasses.dataclass(slots=True)
 class BaseOp(MlirOp):
     operands: List[MlirValue]
     results: List[MlirValue]
@@ -26,11 +31,13 @@ class BaseOp(MlirOp):
         print_types(self.results, printer)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class ConcatOp(MlirOp):
     operands: List[MlirValue]
     results: List[MlirValue]
 
+    op_name: ClassVar[str] = "concat"
+
     def print_op(self, printer: PrinterBase):
         print_names(self.results, printer)
         printer.print(f" = comb.concat ")
@@ -39,12 +46,14 @@ class ConcatOp(MlirOp):
         print_types(self.operands, printer)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class ExtractOp(MlirOp):
     operands: List[MlirValue]
     results: List[MlirValue]
     lo: int
 
+    op_name: ClassVar[str] = "extract"
+
     def print_op(self, printer: PrinterBase):
         print_names(self.results, printer)
         printer.print(" = comb.extract ")
@@ -54,13 +63,18 @@ class ExtractOp(MlirOp):
         printer.print(") -> ")
         print_types(self.results, printer)
 
+    def generic_attributes(self) -> Dict[str, str]:
+        return {"lowBit": f"{self.lo} : i32"}
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(slots=True)
 class ICmpOp(MlirOp):
     operands: List[MlirValue]
     results: List[MlirValue]
     predicate: str
 
+    op_name: ClassVar[str] = "icmp"
+
     def print_op(self, printer: PrinterBase):
         print_names(self.results, printer)
         printer.print(f" = comb.icmp {self.predicate} ")
@@ -68,12 +82,18 @@ class ICmpOp(MlirOp):
         printer.print(f" : ")
         print_types(self.operands[0], printer)
 
+    def generic_attributes(self) -> Dict[str, str]:
+        predicate = _ICMP_PREDICATES.index(self.predicate)
+        return {"predicate": f"{predicate} : i64"}
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(slots=True)
 class ParityOp(MlirOp):
     operands: List[MlirValue]
     results: List[MlirValue]
 
+    op_name: ClassVar[str] = "parity"
+
     def print_op(self, printer: PrinterBase):
         print_names(self.results, printer)
         printer.print(f" = comb.parity ")
@@ -1,5 +1,4 @@
 import collections
-import dataclasses
 import functools
 from typing import Any, Callable, Dict, Iterable, Tuple
 
@@ -34,15 +33,6 @@ def make_unique_name() -> str:
     return name
 
 
-def default_field(cons, **kwargs):
-    return dataclasses.field(default_factory=cons, **kwargs)
-
-
-@dataclasses.dataclass
-class WithId:
-    id: str = dataclasses.field(default_factory=make_unique_name, init=False)
-
-
 class Stack:
     """Lightweight wrapper over builtin lists to provide a stack interface"""
     def __init__(self):
@@ -64,10 +54,6 @@ def replace_all(s: str, replacements: Dict[str, str]) -> str:
     return s
 
 
-def constant(value: Any):
-    return lambda: value
-
-
 def try_call(fn: Callable[[], Any], ExceptionType: Any):
     if ExceptionType is None:
         ExceptionType = BaseException
@@ -0,0 +1,259 @@
+import contextlib
+import dataclasses
+import fcntl
+import functools
+import hashlib
+import os
+import pathlib
+import tempfile
+from typing import Callable, Iterable, List, Optional
+
+import magma as m
+
+from magma_common import visit_value_by_direction
+from mlir import MlirOp
+from printer_base import PrinterBase
+
+
+_ENTRY_SUFFIX = ".mlir"
+_LOCK_FILENAME = ".lock"
+_DEFAULT_MAX_BYTES = 1 << 30
+# Attributes of a circuit (beyond its interface, instances, and connections)
+# which can affect the emitted MLIR.
+_HASHED_ATTRIBUTES = (
+    "name",
+    "primitive",
+    "coreir_lib",
+    "coreir_name",
+    "coreir_genargs",
+    "coreir_configargs",
+    "coreir_metadata",
+    "verilog",
+    "verilogFile",
+    "inline_verilog_strs",
+    "init",
+    "reset_type",
+)
+
+
+@functools.lru_cache()
+def compiler_fingerprint() -> str:
+    """
+    Returns a hash of the compiler sources, so that any change to the compiler
+    invalidates previously cached output.
+    """
+    h = hashlib.sha256()
+    root = pathlib.Path(__file__).parent
+    for filename in sorted(root.glob("*.py")):
+        if filename.name.startswith("test_"):
+            continue
+        h.update(filename.name.encode())
+        h.update(filename.read_bytes())
+    return h.hexdigest()
+
+
+def _driver_to_string(driver: m.Type) -> str:
+    if driver.const():
+        if isinstance(driver, m.Digital):
+            return f"{type(driver)}({driver is type(driver).VCC})"
+        if isinstance(driver, m.Bits):
+            return f"{type(driver)}({int(driver)})"
+    if isinstance(driver.name, m.ref.AnonRef):
+        if isinstance(driver, m.Array):
+            elements = ", ".join(map(_driver_to_string, driver))
+            return f"[{elements}]"
+        if isinstance(driver, m.Product):
+            elements = ", ".join(
+                f"{k}: {_driver_to_string(v)}" for k, v in driver.items())
+            return f"{{{elements}}}"
+    return driver.name.qualifiedname(".")
+
+
+class DefinitionHasher:
+    """
+    Computes a stable content hash of a circuit, covering its ports, instances,
+    connections, metadata and (recursively) the hashes of its children.
+
+    @resolve maps a circuit to the circuit it is compiled as (e.g. the first
+    definition with a given name).
+    """
+    def __init__(
+            self,
+            resolve: Callable[[m.circuit.CircuitKind], m.circuit.CircuitKind]):
+        self._resolve = resolve
+        self._hashes = {}
+
+    def __call__(self, defn_or_decl: m.circuit.CircuitKind) -> str:
+        defn_or_decl = self._resolve(defn_or_decl)
+        try:
+            return self._hashes[defn_or_decl]
+        except KeyError:
+            pass
+        h = hashlib.sha256()
+        for line in self._lines(defn_or_decl):
+            h.update(line.encode())
+            h.update(b"\n")
+        self._hashes[defn_or_decl] = digest = h.hexdigest()
+        return digest
+
+    def _lines(self, defn_or_decl: m.circuit.CircuitKind) -> Iterable[str]:
+        yield type(defn_or_decl).__name__
+        yield str(m.isdefinition(defn_or_decl))
+        for attr in _HASHED_ATTRIBUTES:
+            yield f"{attr}={getattr(defn_or_decl, attr, None)!r}"
+        for name, port in defn_or_decl.interface.ports.items():
+            yield f"port {name}: {type(port)}"
+        if not m.isdefinition(defn_or_decl):
+            return
+        for inst in defn_or_decl.instances:
+            metadata = getattr(inst, "coreir_metadata", {})
+            yield f"inst {inst.name}: {self(type(inst))} {metadata!r}"
+        for module in [defn_or_decl] + list(defn_or_decl.instances):
+            for port in module.interface.ports.values():
+                yield from self._connections(port)
+        for bind_module, (args, _) in defn_or_decl.bind_modules.items():
+            args = ", ".join(arg.name.qualifiedname(".") for arg in args)
+            yield f"bind {self(bind_module)}({args})"
+
+    def _connections(self, port: m.Type) -> List[str]:
+        lines = []
+
+        def _visit_input(value):
+            driver = value.trace()
+            driver = "" if driver is None else _driver_to_string(driver)
+            lines.append(f"{value.name.qualifiedname('.')} <= {driver}")
+
+        visit_value_by_direction(port, _visit_input, lambda _: None)
+        return lines
+
+
+@dataclasses.dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+
+class CompileCache:
+    """
+    Content-addressed, size-bounded on-disk cache of printed hw.module text.
+
+    Entries are written atomically (write to a temporary file then rename), so
+    readers never observe partial entries, and eviction is serialized across
+    processes with a lock file. Entries are evicted in least-recently-used
+    order (by mtime, which is refreshed on every hit) once the total size of
+    the cache exceeds @max_bytes.
+    """
+    def __init__(
+            self,
+            directory: os.PathLike,
+            max_bytes: int = _DEFAULT_MAX_BYTES):
+        self._directory = pathlib.Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._stats = CacheStats()
+        self._size = self._scan_size()
+
+    @property
+    def directory(self) -> pathlib.Path:
+        return self._directory
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._stats
+
+    def make_key(self, *parts: str) -> str:
+        """
+        Returns the cache key for the given parts (e.g. a definition hash and
+        the compile options), scoped to the current compiler sources.
+        """
+        h = hashlib.sha256()
+        h.update(compiler_fingerprint().encode())
+        for part in parts:
+            h.update(b"\0")
+            h.update(part.encode())
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._entry_path(key)
+        try:
+            text = path.read_text()
+            os.utime(path)
+        except FileNotFoundError:
+            # Missing, or evicted by another process.
+            self._stats.misses += 1
+            return None
+        self._stats.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        path = self._entry_path(key)
+        # The size of an entry being replaced no longer counts.
+        old_size = 0
+        with contextlib.suppress(FileNotFoundError):
+            old_size = path.stat().st_size
+        fd, tmp = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+            size = os.stat(tmp).st_size
+            os.replace(tmp, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp)
+            raise
+        self._stats.stores += 1
+        self._size += size - old_size
+        if self._size > self._max_bytes:
+            self._evict()
+
+    def _entry_path(self, key: str) -> pathlib.Path:
+        return self._directory / f"{key}{_ENTRY_SUFFIX}"
+
+    def _entries(self) -> List[os.DirEntry]:
+        entries = []
+        with os.scandir(self._directory) as it:
+            for entry in it:
+                if entry.name.endswith(_ENTRY_SUFFIX):
+                    entries.append(entry)
+        return entries
+
+    def _scan_size(self) -> int:
+        size = 0
+        for entry in self._entries():
+            with contextlib.suppress(FileNotFoundError):
+                size += entry.stat().st_size
+        return size
+
+    def _evict(self):
+        lock_path = self._directory / _LOCK_FILENAME
+        with open(lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            stats = []
+            for entry in self._entries():
+                with contextlib.suppress(FileNotFoundError):
+                    stats.append((entry.stat(), entry.path))
+            stats.sort(key=lambda s: s[0].st_mtime)
+            size = sum(stat.st_size for stat, _ in stats)
+            for stat, path in stats:
+                if size <= self._max_bytes:
+                    break
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+                    self._stats.evictions += 1
+                size -= stat.st_size
+            self._size = size
+
+
+@dataclasses.dataclass
+class CachedTextOp(MlirOp):
+    """Op which prints previously printed (e.g. cached) text verbatim."""
+    text: str
+
+    def print(self, printer: PrinterBase):
+        for line in self.text.splitlines():
+            printer.print_line(line)
+
+    def print_op(self, printer: PrinterBase):
+        raise NotImplementedError()
@@ -0,0 +1,50 @@
+import dataclasses
+from typing import Tuple
+
+
+@dataclasses.dataclass(frozen=True)
+class CompileOptions:
+    """
+    Options controlling the IR emitted by compile_to_mlir(). The defaults
+    reproduce the original (one op per element/bit) lowering.
+    """
+    # Emit a single hw.array_slice/comb.extract for each run of consecutive
+    # elements taken from the same array, rather than one getter per element.
+    slice_arrays: bool = False
+    # Connect aggregates which are driven element-by-element from the matching
+    # elements of a single (possibly nested) aggregate directly to that
+    # aggregate, rather than through per-element getters and a create op.
+    collapse_passthroughs: bool = False
+    # Merge single bit and/or/xor instances which together drive a value (or
+    # the operands of such a merged op), and whose outputs have no other uses,
+    # into a single wide comb op while the graph is built, rather than
+    # emitting one op per bit (and extracts and concats around them).
+    vectorize_bitwise: bool = False
+    # Names of the passes (see passes.available_passes()) to run, in order, on
+    # each compiled hw.module before it is printed.
+    passes: Tuple[str, ...] = ()
+    # Replace each hw.module which is structurally identical to a previously
+    # compiled one (i.e. differs only in its symbol and value names) with the
+    # latter, retargeting its instances (see module_dedup.py).
+    dedup_modules: bool = False
+    # Emit a single sv.alwaysff and sv.initial for all registers of a module
+    # which share a clock and reset (and their edges), rather than a pair per
+    # register.
+    group_registers: bool = False
+    # Emit registers with synchronous resets as seq.compreg ops, which
+    # circt-opt lowers to sv, rather than expanding each into
+    # sv.reg/sv.alwaysff/sv.initial/sv.read_inout. seq.compreg has no initial
+    # value, so registers are only initialized by their reset; registers
+    # without one (or with an asynchronous one) are still expanded.
+    seq_registers: bool = False
+    # Emit the table of each LUT as a single (packed) hw.constant bitcast to an
+    # array, rather than an hw.array_create of one constant per entry.
+    compact_luts: bool = False
+    # Emit each aggregate constant as a single (packed) hw.constant bitcast to
+    # the aggregate type, rather than a tree of hw.array_create and
+    # hw.struct_create ops over one constant per leaf.
+    pack_constants: bool = False
+    # Skip the check for combinational loops (see ModuleVisitor.check_loops())
+    # made before emitting each module, which costs an extra linear pass over
+    # its graph.
+    skip_loop_check: bool = False
@@ -4,17 +4,89 @@ from typing import Optional
 
 import magma as m
 
-from printer_base import PrinterBase
+from compile_cache import CompileCache
+from compile_options import CompileOptions
+from mlir_bytecode import write_bytecode
+from mlir_to_verilog import open_mlir_to_verilog_pipe
+from printer_base import BufferedPrinter
 from translation_unit import TranslationUnit
+import tracing
 
 
 def compile_to_mlir(
-        top: m.DefineCircuitKind, sout: Optional[io.TextIOBase] = None):
+        top: m.DefineCircuitKind,
+        sout: Optional[io.TextIOBase] = None,
+        jobs: int = 1,
+        cache: Optional[CompileCache] = None,
+        stream: bool = False,
+        options: Optional[CompileOptions] = None,
+        pass_timing_out: Optional[io.TextIOBase] = None,
+        bytecode: bool = False,
+        dedup_report_out: Optional[io.TextIOBase] = None):
+    """
+    Compiles @top (and its dependencies) to MLIR, printing to @sout.
+
+    IR passes are selected with @options.passes; if @pass_timing_out is given,
+    a per-pass timing report is written to it once compilation finishes.
+    Likewise, if @options.dedup_modules is set and @dedup_report_out is given,
+    the modules replaced by structurally identical ones are reported to it.
+
+    If @bytecode is set, MLIR bytecode is written to @sout (a binary stream)
+    instead of text. Bytecode is written in one go once the whole design is
+    compiled, so it can not be combined with @jobs, @stream or @cache (which
+    all produce text per module).
+    """
+    if bytecode and (jobs > 1 or stream or cache is not None):
+        raise ValueError(
+            "Bytecode output is not supported with jobs, stream or cache")
     if sout is None:
-        sout = sys.stdout
-    translation_unit = TranslationUnit(top)
-    translation_unit.compile()
-    printer = PrinterBase(sout=sout)
-    hw_module_ops = translation_unit.mlir_module.block.operations
-    for op in hw_module_ops:
-        op.print(printer)
+        sout = sys.stdout.buffer if bytecode else sys.stdout
+    translation_unit = TranslationUnit(top, cache=cache, options=options)
+    if bytecode:
+        translation_unit.compile()
+        with tracing.span("print"):
+            write_bytecode(translation_unit.mlir_module, sout)
+    else:
+        _compile_to_mlir(translation_unit, sout, jobs, stream)
+    if pass_timing_out is not None:
+        pass_timing_out.write(translation_unit.pass_manager.timing_report())
+    deduplicator = translation_unit.deduplicator
+    if dedup_report_out is not None and deduplicator is not None:
+        dedup_report_out.write(deduplicator.report())
+
+
+def _compile_to_mlir(
+        translation_unit: TranslationUnit,
+        sout: io.TextIOBase,
+        jobs: int,
+        stream: bool):
+    if jobs > 1:
+        for text in translation_unit.compile_parallel(jobs):
+            sout.write(text)
+        return
+    with BufferedPrinter(sout=sout) as printer:
+        if stream:
+            translation_unit.compile(printer)
+            return
+        translation_unit.compile()
+        hw_module_ops = translation_unit.mlir_module.block.operations
+        with tracing.span("print"):
+            for op in hw_module_ops:
+                op.print(printer)
+
+
+def compile_to_verilog(
+        top: m.DefineCircuitKind,
+        ostream: Optional[io.RawIOBase] = None,
+        **kwargs):
+    """
+    Compiles @top to MLIR and converts it to verilog (written to @ostream),
+    streaming each module into circt-opt as soon as it is compiled rather than
+    waiting for the whole design. @kwargs are forwarded to compile_to_mlir().
+    """
+    if ostream is None:
+        ostream = sys.stdout
+    bytecode = kwargs.get("bytecode", False)
+    kwargs.setdefault("stream", not bytecode)
+    with open_mlir_to_verilog_pipe(ostream, binary=bytecode) as sout:
+        compile_to_mlir(top, sout, **kwargs)
@@ -58,6 +58,35 @@ class complex_aggregates_nested_array(m.Circuit):
         io.y[i][j][k] @= a0 | a1
 
 
+class complex_bitwise(m.Circuit):
+    T = m.Bits[4]
+    io = m.IO(
+        a=m.In(T), b=m.In(m.Array[2, T]),
+        y0=m.Out(T), y1=m.Out(T), y2=m.Out(m.Bits[2]))
+
+    # y0 is a chain of two stages of per-bit logic, over a reversed input, a
+    # slice and constants.
+    c = [io.b[1][0], io.b[1][1], m.Bit(1), m.Bit(0)]
+    for i in range(4):
+        io.y0[i] @= (io.a[i] ^ io.b[0][3 - i]) & c[i]
+    # y1 mixes ops with a plain input bit, and s (in y2) is used twice.
+    for i in range(3):
+        io.y1[i] @= io.a[i] | io.b[1][i]
+    io.y1[3] @= io.a[3]
+    s = io.a[0] ^ io.a[1]
+    io.y2 @= m.bits([s, s ^ io.b[0][0]])
+
+
+class complex_aggregates_reshape(m.Circuit):
+    T = m.Array[2, m.Array[2, m.Bits[4]]]
+    io = m.IO(
+        a=m.In(T), b=m.In(m.Bits[16]),
+        y=m.Out(m.Bits[16]), z=m.Out(T), w=m.Out(T))
+    io.y @= m.as_bits(io.a)
+    io.z @= m.from_bits(T, io.b)
+    io.w @= m.from_bits(T, m.as_bits(io.a))
+
+
 class simple_aggregates_tuple(m.Circuit):
     S = m.Bits[8]
     T = m.Product.from_fields("anon", dict(x=S, y=S))
@@ -114,6 +143,18 @@ class complex_register_wrapper(m.Circuit):
     io.y @= y
 
 
+class sync_reset_register_wrapper(m.Circuit):
+    T = m.Bits[8]
+    io = m.IO(a=m.In(T), y0=m.Out(T), y1=m.Out(T))
+    io += m.ClockIO(has_enable=True, has_reset=True)
+    # reg_a has both a (synchronous) reset and an enable signal, and reg_b has
+    # only a reset signal.
+    reg_a = m.register(io.a, init=5, reset_type=m.Reset, has_enable=True)
+    reg_b = m.register(io.a, init=7, reset_type=m.Reset)
+    io.y0 @= reg_a
+    io.y1 @= reg_b
+
+
 class counter(m.Circuit):
     T = m.UInt[16]
     io = m.IO(y=m.Out(T)) + m.ClockIO()
@@ -305,6 +346,33 @@ class simple_redefinition(m.Circuit):
     io.y @= i1(i0(io.a))
 
 
+def _make_duplicate_leaf(index: int) -> m.DefineCircuitKind:
+
+    class _duplicate_leaf(m.Circuit):
+        name = f"duplicate_leaf{index}"
+        io = m.IO(a=m.In(m.Bits[8]), b=m.In(m.Bits[8]), y=m.Out(m.Bits[8]))
+        io.y @= io.a ^ io.b
+
+    return _duplicate_leaf
+
+
+def _make_duplicate_middle(index: int) -> m.DefineCircuitKind:
+
+    class _duplicate_middle(m.Circuit):
+        name = f"duplicate_middle{index}"
+        io = m.IO(a=m.In(m.Bits[8]), y=m.Out(m.Bits[8]))
+        io.y @= _make_duplicate_leaf(index)(name="leaf")(io.a, ~io.a)
+
+    return _duplicate_middle
+
+
+class simple_duplicate_modules(m.Circuit):
+    io = m.IO(a=m.In(m.Bits[8]), y=m.Out(m.Bits[8]))
+    y0 = _make_duplicate_middle(0)()(io.a)
+    y1 = _make_duplicate_middle(1)()(io.a)
+    io.y @= _make_duplicate_leaf(2)()(y0, y1)
+
+
 class simple_lut(m.Circuit):
     T = m.Bits[8]
     io = m.IO(a=m.In(m.Bits[2]), y=m.Out(T))
@@ -0,0 +1,44 @@
+hw.module @complex_aggregates_nested_array(%a: !hw.array<2x!hw.array<3xi4>>) -> (y: !hw.array<2x!hw.array<3xi4>>) {
+    %0 = hw.bitcast %a : (!hw.array<2x!hw.array<3xi4>>) -> i24
+    %2 = hw.constant 1 : i1
+    %1 = hw.array_get %a[%2] : !hw.array<2x!hw.array<3xi4>>
+    %4 = hw.constant 2 : i2
+    %3 = hw.array_get %1[%4] : !hw.array<3xi4>
+    %5 = comb.extract %3 from 3 : (i4) -> i1
+    %6 = comb.extract %3 from 2 : (i4) -> i1
+    %7 = comb.extract %3 from 1 : (i4) -> i1
+    %8 = comb.extract %3 from 0 : (i4) -> i1
+    %10 = hw.constant 1 : i2
+    %9 = hw.array_get %1[%10] : !hw.array<3xi4>
+    %11 = comb.extract %9 from 3 : (i4) -> i1
+    %12 = comb.extract %9 from 2 : (i4) -> i1
+    %13 = comb.extract %9 from 1 : (i4) -> i1
+    %14 = comb.extract %9 from 0 : (i4) -> i1
+    %16 = hw.constant 0 : i2
+    %15 = hw.array_get %1[%16] : !hw.array<3xi4>
+    %17 = comb.extract %15 from 3 : (i4) -> i1
+    %18 = comb.extract %15 from 2 : (i4) -> i1
+    %19 = comb.extract %15 from 1 : (i4) -> i1
+    %20 = comb.extract %15 from 0 : (i4) -> i1
+    %22 = hw.constant 0 : i1
+    %21 = hw.array_get %a[%22] : !hw.array<2x!hw.array<3xi4>>
+    %23 = hw.array_get %21[%4] : !hw.array<3xi4>
+    %24 = comb.extract %23 from 3 : (i4) -> i1
+    %25 = comb.extract %23 from 2 : (i4) -> i1
+    %26 = comb.extract %23 from 1 : (i4) -> i1
+    %27 = comb.extract %23 from 0 : (i4) -> i1
+    %28 = hw.array_get %21[%10] : !hw.array<3xi4>
+    %29 = comb.extract %28 from 3 : (i4) -> i1
+    %30 = comb.extract %28 from 2 : (i4) -> i1
+    %31 = comb.extract %28 from 1 : (i4) -> i1
+    %32 = comb.extract %28 from 0 : (i4) -> i1
+    %33 = hw.array_get %21[%16] : !hw.array<3xi4>
+    %34 = comb.extract %33 from 3 : (i4) -> i1
+    %35 = comb.extract %33 from 2 : (i4) -> i1
+    %36 = comb.extract %33 from 1 : (i4) -> i1
+    %37 = comb.extract %33 from 0 : (i4) -> i1
+    %38 = comb.concat %37, %36, %35, %34, %32, %31, %30, %29, %27, %26, %25, %24, %20, %19, %18, %17, %14, %13, %12, %11, %8, %7, %6, %5 : i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1
+    %39 = comb.or %0, %38 : i24
+    %40 = hw.bitcast %39 : (i24) -> !hw.array<2x!hw.array<3xi4>>
+    hw.output %40 : !hw.array<2x!hw.array<3xi4>>
+}
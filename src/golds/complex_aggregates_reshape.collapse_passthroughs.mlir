@@ -0,0 +1,5 @@
+hw.module @complex_aggregates_reshape(%a: !hw.array<2x!hw.array<2xi4>>, %b: i16) -> (y: i16, z: !hw.array<2x!hw.array<2xi4>>, w: !hw.array<2x!hw.array<2xi4>>) {
+    %0 = hw.bitcast %a : (!hw.array<2x!hw.array<2xi4>>) -> i16
+    %1 = hw.bitcast %b : (i16) -> !hw.array<2x!hw.array<2xi4>>
+    hw.output %0, %1, %a : i16, !hw.array<2x!hw.array<2xi4>>, !hw.array<2x!hw.array<2xi4>>
+}
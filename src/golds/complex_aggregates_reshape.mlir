@@ -0,0 +1,51 @@
+hw.module @complex_aggregates_reshape(%a: !hw.array<2x!hw.array<2xi4>>, %b: i16) -> (y: i16, z: !hw.array<2x!hw.array<2xi4>>, w: !hw.array<2x!hw.array<2xi4>>) {
+    %1 = hw.constant 0 : i1
+    %0 = hw.array_get %a[%1] : !hw.array<2x!hw.array<2xi4>>
+    %2 = hw.array_get %0[%1] : !hw.array<2xi4>
+    %3 = comb.extract %2 from 0 : (i4) -> i1
+    %4 = comb.extract %2 from 1 : (i4) -> i1
+    %5 = comb.extract %2 from 2 : (i4) -> i1
+    %6 = comb.extract %2 from 3 : (i4) -> i1
+    %8 = hw.constant 1 : i1
+    %7 = hw.array_get %0[%8] : !hw.array<2xi4>
+    %9 = comb.extract %7 from 0 : (i4) -> i1
+    %10 = comb.extract %7 from 1 : (i4) -> i1
+    %11 = comb.extract %7 from 2 : (i4) -> i1
+    %12 = comb.extract %7 from 3 : (i4) -> i1
+    %13 = hw.array_get %a[%8] : !hw.array<2x!hw.array<2xi4>>
+    %14 = hw.array_get %13[%1] : !hw.array<2xi4>
+    %15 = comb.extract %14 from 0 : (i4) -> i1
+    %16 = comb.extract %14 from 1 : (i4) -> i1
+    %17 = comb.extract %14 from 2 : (i4) -> i1
+    %18 = comb.extract %14 from 3 : (i4) -> i1
+    %19 = hw.array_get %13[%8] : !hw.array<2xi4>
+    %20 = comb.extract %19 from 0 : (i4) -> i1
+    %21 = comb.extract %19 from 1 : (i4) -> i1
+    %22 = comb.extract %19 from 2 : (i4) -> i1
+    %23 = comb.extract %19 from 3 : (i4) -> i1
+    %24 = comb.concat %23, %22, %21, %20, %18, %17, %16, %15, %12, %11, %10, %9, %6, %5, %4, %3 : i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1, i1
+    %25 = comb.extract %b from 0 : (i16) -> i1
+    %26 = comb.extract %b from 1 : (i16) -> i1
+    %27 = comb.extract %b from 2 : (i16) -> i1
+    %28 = comb.extract %b from 3 : (i16) -> i1
+    %29 = comb.concat %28, %27, %26, %25 : i1, i1, i1, i1
+    %30 = comb.extract %b from 4 : (i16) -> i1
+    %31 = comb.extract %b from 5 : (i16) -> i1
+    %32 = comb.extract %b from 6 : (i16) -> i1
+    %33 = comb.extract %b from 7 : (i16) -> i1
+    %34 = comb.concat %33, %32, %31, %30 : i1, i1, i1, i1
+    %35 = hw.array_create %34, %29 : i4
+    %36 = comb.extract %b from 8 : (i16) -> i1
+    %37 = comb.extract %b from 9 : (i16) -> i1
+    %38 = comb.extract %b from 10 : (i16) -> i1
+    %39 = comb.extract %b from 11 : (i16) -> i1
+    %40 = comb.concat %39, %38, %37, %36 : i1, i1, i1, i1
+    %41 = comb.extract %b from 12 : (i16) -> i1
+    %42 = comb.extract %b from 13 : (i16) -> i1
+    %43 = comb.extract %b from 14 : (i16) -> i1
+    %44 = comb.extract %b from 15 : (i16) -> i1
+    %45 = comb.concat %44, %43, %42, %41 : i1, i1, i1, i1
+    %46 = hw.array_create %45, %40 : i4
+    %47 = hw.array_create %46, %35 : !hw.array<2xi4>
+    hw.output %24, %47, %a : i16, !hw.array<2x!hw.array<2xi4>>, !hw.array<2x!hw.array<2xi4>>
+}
@@ -0,0 +1,36 @@
+hw.module @complex_bitwise(%a: i4, %b: !hw.array<2xi4>) -> (y0: i4, y1: i4, y2: i2) {
+    %0 = comb.extract %a from 0 : (i4) -> i1
+    %2 = hw.constant 0 : i1
+    %1 = hw.array_get %b[%2] : !hw.array<2xi4>
+    %3 = comb.extract %1 from 3 : (i4) -> i1
+    %4 = comb.xor %0, %3 : i1
+    %6 = hw.constant 1 : i1
+    %5 = hw.array_get %b[%6] : !hw.array<2xi4>
+    %7 = comb.extract %5 from 0 : (i4) -> i1
+    %8 = comb.and %4, %7 : i1
+    %9 = comb.extract %a from 1 : (i4) -> i1
+    %10 = comb.extract %1 from 2 : (i4) -> i1
+    %11 = comb.xor %9, %10 : i1
+    %12 = comb.extract %5 from 1 : (i4) -> i1
+    %13 = comb.and %11, %12 : i1
+    %14 = comb.extract %a from 2 : (i4) -> i1
+    %15 = comb.extract %1 from 1 : (i4) -> i1
+    %16 = comb.xor %14, %15 : i1
+    %17 = hw.constant 1 : i1
+    %18 = comb.and %16, %17 : i1
+    %19 = comb.extract %a from 3 : (i4) -> i1
+    %20 = comb.extract %1 from 0 : (i4) -> i1
+    %21 = comb.xor %19, %20 : i1
+    %22 = hw.constant 0 : i1
+    %23 = comb.and %21, %22 : i1
+    %24 = comb.concat %23, %18, %13, %8 : i1, i1, i1, i1
+    %25 = comb.or %0, %7 : i1
+    %26 = comb.or %9, %12 : i1
+    %27 = comb.extract %5 from 2 : (i4) -> i1
+    %28 = comb.or %14, %27 : i1
+    %29 = comb.concat %19, %28, %26, %25 : i1, i1, i1, i1
+    %30 = comb.xor %0, %9 : i1
+    %31 = comb.xor %30, %20 : i1
+    %32 = comb.concat %31, %30 : i1, i1
+    hw.output %24, %29, %32 : i4, i4, i2
+}
@@ -0,0 +1,32 @@
+hw.module @complex_bitwise(%a: i4, %b: !hw.array<2xi4>) -> (y0: i4, y1: i4, y2: i2) {
+    %1 = hw.constant 0 : i1
+    %0 = hw.array_get %b[%1] : !hw.array<2xi4>
+    %2 = comb.extract %0 from 3 : (i4) -> i1
+    %3 = comb.extract %0 from 2 : (i4) -> i1
+    %4 = comb.extract %0 from 1 : (i4) -> i1
+    %5 = comb.extract %0 from 0 : (i4) -> i1
+    %6 = comb.concat %5, %4, %3, %2 : i1, i1, i1, i1
+    %7 = comb.xor %a, %6 : i4
+    %8 = hw.bitcast %b : (!hw.array<2xi4>) -> i8
+    %9 = comb.extract %8 from 4 : (i8) -> i2
+    %10 = hw.constant 1 : i2
+    %11 = comb.concat %10, %9 : i2, i2
+    %12 = comb.and %7, %11 : i4
+    %13 = comb.extract %a from 0 : (i4) -> i1
+    %15 = hw.constant 1 : i1
+    %14 = hw.array_get %b[%15] : !hw.array<2xi4>
+    %16 = comb.extract %14 from 0 : (i4) -> i1
+    %17 = comb.or %13, %16 : i1
+    %18 = comb.extract %a from 1 : (i4) -> i1
+    %19 = comb.extract %14 from 1 : (i4) -> i1
+    %20 = comb.or %18, %19 : i1
+    %21 = comb.extract %a from 2 : (i4) -> i1
+    %22 = comb.extract %14 from 2 : (i4) -> i1
+    %23 = comb.or %21, %22 : i1
+    %24 = comb.extract %a from 3 : (i4) -> i1
+    %25 = comb.concat %24, %23, %20, %17 : i1, i1, i1, i1
+    %26 = comb.xor %13, %18 : i1
+    %27 = comb.xor %26, %5 : i1
+    %28 = comb.concat %27, %26 : i1, i1
+    hw.output %12, %25, %28 : i4, i4, i2
+}
@@ -0,0 +1,58 @@
+hw.module @LUT(%I: i2) -> (O: !hw.array<2x!hw.struct<x: i8, y: i1>>) {
+    %1 = hw.constant 14 : i4
+    %2 = hw.bitcast %1 : (i4) -> !hw.array<4xi1>
+    %0 = hw.array_get %2[%I] : !hw.array<4xi1>
+    %4 = hw.constant 15 : i4
+    %5 = hw.bitcast %4 : (i4) -> !hw.array<4xi1>
+    %3 = hw.array_get %5[%I] : !hw.array<4xi1>
+    %7 = hw.constant 13 : i4
+    %8 = hw.bitcast %7 : (i4) -> !hw.array<4xi1>
+    %6 = hw.array_get %8[%I] : !hw.array<4xi1>
+    %10 = hw.bitcast %4 : (i4) -> !hw.array<4xi1>
+    %9 = hw.array_get %10[%I] : !hw.array<4xi1>
+    %12 = hw.constant 1 : i4
+    %13 = hw.bitcast %12 : (i4) -> !hw.array<4xi1>
+    %11 = hw.array_get %13[%I] : !hw.array<4xi1>
+    %15 = hw.constant 4 : i4
+    %16 = hw.bitcast %15 : (i4) -> !hw.array<4xi1>
+    %14 = hw.array_get %16[%I] : !hw.array<4xi1>
+    %18 = hw.constant 6 : i4
+    %19 = hw.bitcast %18 : (i4) -> !hw.array<4xi1>
+    %17 = hw.array_get %19[%I] : !hw.array<4xi1>
+    %21 = hw.constant 0 : i4
+    %22 = hw.bitcast %21 : (i4) -> !hw.array<4xi1>
+    %20 = hw.array_get %22[%I] : !hw.array<4xi1>
+    %23 = comb.concat %20, %17, %14, %11, %9, %6, %3, %0 : i1, i1, i1, i1, i1, i1, i1, i1
+    %25 = hw.constant 7 : i4
+    %26 = hw.bitcast %25 : (i4) -> !hw.array<4xi1>
+    %24 = hw.array_get %26[%I] : !hw.array<4xi1>
+    %27 = hw.struct_create (%23, %24) : !hw.struct<x: i8, y: i1>
+    %29 = hw.bitcast %1 : (i4) -> !hw.array<4xi1>
+    %28 = hw.array_get %29[%I] : !hw.array<4xi1>
+    %31 = hw.bitcast %7 : (i4) -> !hw.array<4xi1>
+    %30 = hw.array_get %31[%I] : !hw.array<4xi1>
+    %33 = hw.bitcast %21 : (i4) -> !hw.array<4xi1>
+    %32 = hw.array_get %33[%I] : !hw.array<4xi1>
+    %35 = hw.constant 10 : i4
+    %36 = hw.bitcast %35 : (i4) -> !hw.array<4xi1>
+    %34 = hw.array_get %36[%I] : !hw.array<4xi1>
+    %38 = hw.bitcast %12 : (i4) -> !hw.array<4xi1>
+    %37 = hw.array_get %38[%I] : !hw.array<4xi1>
+    %40 = hw.bitcast %21 : (i4) -> !hw.array<4xi1>
+    %39 = hw.array_get %40[%I] : !hw.array<4xi1>
+    %42 = hw.bitcast %18 : (i4) -> !hw.array<4xi1>
+    %41 = hw.array_get %42[%I] : !hw.array<4xi1>
+    %44 = hw.bitcast %1 : (i4) -> !hw.array<4xi1>
+    %43 = hw.array_get %44[%I] : !hw.array<4xi1>
+    %45 = comb.concat %43, %41, %39, %37, %34, %32, %30, %28 : i1, i1, i1, i1, i1, i1, i1, i1
+    %47 = hw.constant 3 : i4
+    %48 = hw.bitcast %47 : (i4) -> !hw.array<4xi1>
+    %46 = hw.array_get %48[%I] : !hw.array<4xi1>
+    %49 = hw.struct_create (%45, %46) : !hw.struct<x: i8, y: i1>
+    %50 = hw.array_create %49, %27 : !hw.struct<x: i8, y: i1>
+    hw.output %50 : !hw.array<2x!hw.struct<x: i8, y: i1>>
+}
+hw.module @complex_lut(%a: i2) -> (y: !hw.array<2x!hw.struct<x: i8, y: i1>>) {
+    %0 = hw.instance "LUT_inst0" @LUT(I: %a: i2) -> (O: !hw.array<2x!hw.struct<x: i8, y: i1>>)
+    hw.output %0 : !hw.array<2x!hw.struct<x: i8, y: i1>>
+}
@@ -0,0 +1,40 @@
+hw.module @complex_register_wrapper(%a: !hw.struct<x: i8, y: i1>, %b: !hw.array<6xi16>, %CLK: i1, %CE: i1, %ASYNCRESET: i1) -> (y: !hw.struct<u: !hw.struct<x: i8, y: i1>, v: !hw.array<6xi16>>) {
+    %1 = sv.reg {name = "Register_inst0"} : !hw.inout<!hw.struct<x: i8, y: i1>>
+    sv.alwaysff(posedge %CLK) {
+        sv.if %CE {
+            sv.passign %1, %a : !hw.struct<x: i8, y: i1>
+        }
+    } (asyncreset : posedge %ASYNCRESET) {
+        sv.passign %1, %2 : !hw.struct<x: i8, y: i1>
+    }
+    %3 = hw.constant 21 : i9
+    %2 = hw.bitcast %3 : (i9) -> !hw.struct<x: i8, y: i1>
+    sv.initial {
+        sv.bpassign %1, %2 : !hw.struct<x: i8, y: i1>
+    }
+    %0 = sv.read_inout %1 : !hw.inout<!hw.struct<x: i8, y: i1>>
+    %5 = sv.reg {name = "Register_inst1"} : !hw.inout<!hw.array<6xi16>>
+    sv.alwaysff(posedge %CLK) {
+        sv.passign %5, %b : !hw.array<6xi16>
+    }
+    %7 = hw.constant 12089405771787748463738880 : i96
+    %6 = hw.bitcast %7 : (i96) -> !hw.array<6xi16>
+    sv.initial {
+        sv.bpassign %5, %6 : !hw.array<6xi16>
+    }
+    %4 = sv.read_inout %5 : !hw.inout<!hw.array<6xi16>>
+    %8 = hw.struct_create (%0, %4) : !hw.struct<u: !hw.struct<x: i8, y: i1>, v: !hw.array<6xi16>>
+    %9 = hw.struct_extract %a["x"] : !hw.struct<x: i8, y: i1>
+    %11 = sv.reg {name = "Register_inst2"} : !hw.inout<i8>
+    sv.alwaysff(posedge %CLK) {
+        sv.if %CE {
+            sv.passign %11, %9 : i8
+        }
+    }
+    %12 = hw.constant 0 : i8
+    sv.initial {
+        sv.bpassign %11, %12 : i8
+    }
+    %10 = sv.read_inout %11 : !hw.inout<i8>
+    hw.output %8 : !hw.struct<u: !hw.struct<x: i8, y: i1>, v: !hw.array<6xi16>>
+}
@@ -0,0 +1,14 @@
+hw.module @complex_wire(%I0: i8, %I1: i1, %I2: !hw.array<4xi8>) -> (O0: i8, O1: i1, O2: !hw.array<4xi8>) {
+    %1 = sv.wire sym @complex_wire.tmp0 {name="tmp0"} : !hw.inout<i8>
+    sv.assign %1, %I0 : i8
+    %0 = sv.read_inout %1 : !hw.inout<i8>
+    %3 = sv.wire sym @complex_wire.tmp1 {name="tmp1"} : !hw.inout<i1>
+    sv.assign %3, %I1 : i1
+    %2 = sv.read_inout %3 : !hw.inout<i1>
+    %4 = hw.bitcast %I2 : (!hw.array<4xi8>) -> i32
+    %6 = sv.wire sym @complex_wire.tmp2 {name="tmp2"} : !hw.inout<i32>
+    sv.assign %6, %4 : i32
+    %5 = sv.read_inout %6 : !hw.inout<i32>
+    %7 = hw.bitcast %5 : (i32) -> !hw.array<4xi8>
+    hw.output %0, %2, %7 : i8, i1, !hw.array<4xi8>
+}
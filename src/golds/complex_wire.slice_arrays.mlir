@@ -0,0 +1,26 @@
+hw.module @complex_wire(%I0: i8, %I1: i1, %I2: !hw.array<4xi8>) -> (O0: i8, O1: i1, O2: !hw.array<4xi8>) {
+    %1 = sv.wire sym @complex_wire.tmp0 {name="tmp0"} : !hw.inout<i8>
+    sv.assign %1, %I0 : i8
+    %0 = sv.read_inout %1 : !hw.inout<i8>
+    %3 = sv.wire sym @complex_wire.tmp1 {name="tmp1"} : !hw.inout<i1>
+    sv.assign %3, %I1 : i1
+    %2 = sv.read_inout %3 : !hw.inout<i1>
+    %5 = hw.constant 0 : i2
+    %4 = hw.array_get %I2[%5] : !hw.array<4xi8>
+    %7 = hw.constant 1 : i2
+    %6 = hw.array_get %I2[%7] : !hw.array<4xi8>
+    %9 = hw.constant 2 : i2
+    %8 = hw.array_get %I2[%9] : !hw.array<4xi8>
+    %11 = hw.constant 3 : i2
+    %10 = hw.array_get %I2[%11] : !hw.array<4xi8>
+    %12 = comb.concat %10, %8, %6, %4 : i8, i8, i8, i8
+    %14 = sv.wire sym @complex_wire.tmp2 {name="tmp2"} : !hw.inout<i32>
+    sv.assign %14, %12 : i32
+    %13 = sv.read_inout %14 : !hw.inout<i32>
+    %15 = comb.extract %13 from 0 : (i32) -> i8
+    %16 = comb.extract %13 from 8 : (i32) -> i8
+    %17 = comb.extract %13 from 16 : (i32) -> i8
+    %18 = comb.extract %13 from 24 : (i32) -> i8
+    %19 = hw.array_create %18, %17, %16, %15 : i8
+    hw.output %0, %2, %19 : i8, i1, !hw.array<4xi8>
+}
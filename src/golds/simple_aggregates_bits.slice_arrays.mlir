@@ -0,0 +1,6 @@
+hw.module @simple_aggregates_bits(%a: i16) -> (y: i16) {
+    %0 = comb.extract %a from 8 : (i16) -> i8
+    %1 = comb.extract %a from 0 : (i16) -> i8
+    %2 = comb.concat %1, %0 : i8, i8
+    hw.output %2 : i16
+}
@@ -0,0 +1,16 @@
+hw.module @duplicate_leaf1(%a: i8, %b: i8) -> (y: i8) {
+    %0 = comb.xor %a, %b : i8
+    hw.output %0 : i8
+}
+hw.module @duplicate_middle1(%a: i8) -> (y: i8) {
+    %1 = hw.constant -1 : i8
+    %0 = comb.xor %1, %a : i8
+    %2 = hw.instance "leaf" @duplicate_leaf1(a: %a: i8, b: %0: i8) -> (y: i8)
+    hw.output %2 : i8
+}
+hw.module @simple_duplicate_modules(%a: i8) -> (y: i8) {
+    %0 = hw.instance "duplicate_middle0_inst0" @duplicate_middle1(a: %a: i8) -> (y: i8)
+    %1 = hw.instance "duplicate_middle1_inst0" @duplicate_middle1(a: %a: i8) -> (y: i8)
+    %2 = hw.instance "duplicate_leaf2_inst0" @duplicate_leaf1(a: %0: i8, b: %1: i8) -> (y: i8)
+    hw.output %2 : i8
+}
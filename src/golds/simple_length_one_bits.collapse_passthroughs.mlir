@@ -0,0 +1,3 @@
+hw.module @simple_length_one_bits(%I: i1) -> (O: i1) {
+    hw.output %I : i1
+}
@@ -0,0 +1,30 @@
+hw.module @LUT(%I: i2) -> (O: i8) {
+    %1 = hw.constant 5 : i4
+    %2 = hw.bitcast %1 : (i4) -> !hw.array<4xi1>
+    %0 = hw.array_get %2[%I] : !hw.array<4xi1>
+    %4 = hw.constant 11 : i4
+    %5 = hw.bitcast %4 : (i4) -> !hw.array<4xi1>
+    %3 = hw.array_get %5[%I] : !hw.array<4xi1>
+    %7 = hw.constant 15 : i4
+    %8 = hw.bitcast %7 : (i4) -> !hw.array<4xi1>
+    %6 = hw.array_get %8[%I] : !hw.array<4xi1>
+    %10 = hw.bitcast %7 : (i4) -> !hw.array<4xi1>
+    %9 = hw.array_get %10[%I] : !hw.array<4xi1>
+    %12 = hw.constant 10 : i4
+    %13 = hw.bitcast %12 : (i4) -> !hw.array<4xi1>
+    %11 = hw.array_get %13[%I] : !hw.array<4xi1>
+    %15 = hw.constant 7 : i4
+    %16 = hw.bitcast %15 : (i4) -> !hw.array<4xi1>
+    %14 = hw.array_get %16[%I] : !hw.array<4xi1>
+    %18 = hw.constant 9 : i4
+    %19 = hw.bitcast %18 : (i4) -> !hw.array<4xi1>
+    %17 = hw.array_get %19[%I] : !hw.array<4xi1>
+    %21 = hw.bitcast %7 : (i4) -> !hw.array<4xi1>
+    %20 = hw.array_get %21[%I] : !hw.array<4xi1>
+    %22 = comb.concat %20, %17, %14, %11, %9, %6, %3, %0 : i1, i1, i1, i1, i1, i1, i1, i1
+    hw.output %22 : i8
+}
+hw.module @simple_lut(%a: i2) -> (y: i8) {
+    %0 = hw.instance "LUT_inst0" @LUT(I: %a: i2) -> (O: i8)
+    hw.output %0 : i8
+}
@@ -0,0 +1,27 @@
+hw.module @sync_reset_register_wrapper(%a: i8, %CLK: i1, %CE: i1, %RESET: i1) -> (y0: i8, y1: i8) {
+    %1 = sv.reg {name = "Register_inst0"} : !hw.inout<i8>
+    sv.alwaysff(posedge %CLK) {
+        sv.if %CE {
+            sv.passign %1, %a : i8
+        }
+    } (syncreset : posedge %RESET) {
+        sv.passign %1, %2 : i8
+    }
+    %2 = hw.constant 5 : i8
+    sv.initial {
+        sv.bpassign %1, %2 : i8
+    }
+    %0 = sv.read_inout %1 : !hw.inout<i8>
+    %4 = sv.reg {name = "Register_inst1"} : !hw.inout<i8>
+    sv.alwaysff(posedge %CLK) {
+        sv.passign %4, %a : i8
+    } (syncreset : posedge %RESET) {
+        sv.passign %4, %5 : i8
+    }
+    %5 = hw.constant 7 : i8
+    sv.initial {
+        sv.bpassign %4, %5 : i8
+    }
+    %3 = sv.read_inout %4 : !hw.inout<i8>
+    hw.output %0, %3 : i8, i8
+}
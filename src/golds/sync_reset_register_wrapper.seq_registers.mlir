@@ -0,0 +1,8 @@
+hw.module @sync_reset_register_wrapper(%a: i8, %CLK: i1, %CE: i1, %RESET: i1) -> (y0: i8, y1: i8) {
+    %1 = comb.mux %CE, %a, %0 : i8
+    %2 = hw.constant 5 : i8
+    %0 = seq.compreg %1, %CLK, %RESET, %2 {name = "Register_inst0"} : i8
+    %4 = hw.constant 7 : i8
+    %3 = seq.compreg %a, %CLK, %RESET, %4 {name = "Register_inst1"} : i8
+    hw.output %0, %3 : i8, i8
+}
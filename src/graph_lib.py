@@ -1,15 +1,217 @@
-import networkx as nx
-from typing import Any, Callable, Iterable, List, Mapping, Tuple, Union
+import array
+import collections
+import dataclasses
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Set,
+    Tuple, Union)
 
 
-Graph = nx.MultiDiGraph
 Node = Any
-Edge = Union[Tuple[Node, Node], Tuple[Node, Node, Mapping]]
+Edge = Union[Tuple[Node, Node], Tuple[Node, Node, Any, Any]]
+
+
+def _make_index_array(size: int = 0) -> array.array:
+    return array.array("q", bytes(8 * size))
+
+
+class _Adjacency:
+    """
+    CSR-style adjacency in one direction. Edges incident to node @n (by
+    integer id) are @edges[offsets[n]:offsets[n + 1]] and its distinct
+    neighbors are @neighbors[neighbor_offsets[n]:neighbor_offsets[n + 1]].
+
+    To match the iteration order of a dict-of-dicts multigraph, neighbors are
+    ordered by first appearance, and a node's edges are grouped by neighbor
+    (in that order) and then ordered by insertion.
+    """
+    __slots__ = ("offsets", "edges", "neighbor_offsets", "neighbors")
+
+    def __init__(
+            self, num_nodes: int, keys: array.array, others: array.array):
+        offsets = _make_index_array(num_nodes + 1)
+        for key in keys:
+            offsets[key + 1] += 1
+        for n in range(num_nodes):
+            offsets[n + 1] += offsets[n]
+        positions = offsets[:-1]
+        edges = _make_index_array(len(keys))
+        for edge, key in enumerate(keys):
+            edges[positions[key]] = edge
+            positions[key] += 1
+        neighbor_offsets = _make_index_array(num_nodes + 1)
+        neighbors = array.array("q")
+        for n in range(num_nodes):
+            lo, hi = offsets[n], offsets[n + 1]
+            if hi - lo == 1:
+                neighbors.append(others[edges[lo]])
+            elif hi - lo > 1:
+                groups = {}
+                for edge in edges[lo:hi]:
+                    groups.setdefault(others[edge], []).append(edge)
+                if len(groups) < hi - lo:
+                    grouped = (e for group in groups.values() for e in group)
+                    edges[lo:hi] = array.array("q", grouped)
+                neighbors.extend(groups)
+            neighbor_offsets[n + 1] = len(neighbors)
+        self.offsets = offsets
+        self.edges = edges
+        self.neighbor_offsets = neighbor_offsets
+        self.neighbors = neighbors
+
+
+class Graph:
+    """
+    Compact directed multigraph.
+
+    Nodes are mapped to dense integer ids; edges are stored as parallel arrays
+    of (source id, destination id), plus parallel lists of their payloads: the
+    source and destination ports they connect. Adjacency is built lazily, in
+    CSR form, the first time it is queried after a modification.
+    """
+    def __init__(self):
+        self._node_ids: Dict[Node, int] = {}
+        self._nodes: List[Node] = []
+        self._edge_src = array.array("q")
+        self._edge_dst = array.array("q")
+        self._edge_src_port: List[Any] = []
+        self._edge_dst_port: List[Any] = []
+        self._pred = None
+        self._succ = None
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node: Node) -> bool:
+        return node in self._node_ids
+
+    def __iter__(self) -> Iterator[Node]:
+        return iter(self._nodes)
+
+    def nodes(self) -> List[Node]:
+        return list(self._nodes)
+
+    def number_of_edges(self) -> int:
+        return len(self._edge_src)
+
+    def add_node(self, node: Node) -> int:
+        try:
+            return self._node_ids[node]
+        except KeyError:
+            pass
+        self._node_ids[node] = node_id = len(self._nodes)
+        self._nodes.append(node)
+        self._pred = self._succ = None
+        return node_id
+
+    def add_edge(
+            self, u: Node, v: Node, src_port: Any = None,
+            dst_port: Any = None):
+        self._edge_src.append(self.add_node(u))
+        self._edge_dst.append(self.add_node(v))
+        self._edge_src_port.append(src_port)
+        self._edge_dst_port.append(dst_port)
+        self._pred = self._succ = None
+
+    def _in_adjacency(self) -> _Adjacency:
+        if self._pred is None:
+            self._pred = _Adjacency(
+                len(self._nodes), self._edge_dst, self._edge_src)
+        return self._pred
+
+    def _out_adjacency(self) -> _Adjacency:
+        if self._succ is None:
+            self._succ = _Adjacency(
+                len(self._nodes), self._edge_src, self._edge_dst)
+        return self._succ
+
+    def _neighbors(self, adjacency: _Adjacency, node: Node) -> Iterator[Node]:
+        try:
+            n = self._node_ids[node]
+        except KeyError:
+            return iter(())
+        offsets = adjacency.neighbor_offsets
+        lo, hi = offsets[n], offsets[n + 1]
+        nodes = self._nodes
+        return (nodes[i] for i in adjacency.neighbors[lo:hi])
+
+    def predecessors(self, node: Node) -> Iterator[Node]:
+        return self._neighbors(self._in_adjacency(), node)
+
+    def successors(self, node: Node) -> Iterator[Node]:
+        return self._neighbors(self._out_adjacency(), node)
+
+    def _incident_edges(
+            self, adjacency: _Adjacency, node: Node,
+            data: bool) -> Iterator[Edge]:
+        try:
+            n = self._node_ids[node]
+        except KeyError:
+            return
+        nodes, src, dst = self._nodes, self._edge_src, self._edge_dst
+        src_port, dst_port = self._edge_src_port, self._edge_dst_port
+        lo, hi = adjacency.offsets[n], adjacency.offsets[n + 1]
+        for edge in adjacency.edges[lo:hi]:
+            if data:
+                yield (nodes[src[edge]], nodes[dst[edge]], src_port[edge],
+                       dst_port[edge])
+            else:
+                yield nodes[src[edge]], nodes[dst[edge]]
+
+    def in_edges(self, node: Node, data: bool = False) -> Iterator[Edge]:
+        """
+        Yields (src, @node) pairs for every edge into @node, or (src, @node,
+        src_port, dst_port) tuples if @data is set.
+        """
+        return self._incident_edges(self._in_adjacency(), node, data)
+
+    def out_edges(self, node: Node, data: bool = False) -> Iterator[Edge]:
+        return self._incident_edges(self._out_adjacency(), node, data)
+
+    def edges(self, data: bool = False) -> Iterator[Edge]:
+        nodes = self._nodes
+        edges = zip(
+            self._edge_src, self._edge_dst, self._edge_src_port,
+            self._edge_dst_port)
+        for u, v, src_port, dst_port in edges:
+            if data:
+                yield nodes[u], nodes[v], src_port, dst_port
+            else:
+                yield nodes[u], nodes[v]
+
+    def successor_ids(self) -> List[array.array]:
+        """Returns the distinct successor ids of every node, by node id."""
+        adjacency = self._out_adjacency()
+        offsets, neighbors = adjacency.neighbor_offsets, adjacency.neighbors
+        return [
+            neighbors[offsets[n]:offsets[n + 1]]
+            for n in range(len(self._nodes))
+        ]
+
+    def node_from_id(self, node_id: int) -> Node:
+        return self._nodes[node_id]
+
+
 NodeOrderer = Callable[[Graph], Iterable[Any]]
 
 
 def topological_sort(g: Graph) -> Iterable[Node]:
-    return nx.algorithms.dag.topological_sort(g)
+    successors = g.successor_ids()
+    indegree = [0] * len(g)
+    for nbrs in successors:
+        for n in nbrs:
+            indegree[n] += 1
+    ready = collections.deque(n for n, d in enumerate(indegree) if d == 0)
+    num_sorted = 0
+    while ready:
+        n = ready.popleft()
+        num_sorted += 1
+        yield g.node_from_id(n)
+        for m in successors[n]:
+            indegree[m] -= 1
+            if indegree[m] == 0:
+                ready.append(m)
+    if num_sorted != len(g):
+        raise ValueError("Graph contains a cycle")
 
 
 def reverse_topological_sort(g: Graph) -> Iterable[Node]:
@@ -17,7 +219,13 @@ def reverse_topological_sort(g: Graph) -> Iterable[Node]:
 
 
 def write_to_dot(g: Graph, filename: str):
-    nx.drawing.nx_pydot.write_dot(g, filename)
+    # networkx (and pydot) are only needed for DOT export.
+    import networkx as nx
+    nx_graph = nx.MultiDiGraph()
+    nx_graph.add_nodes_from(g)
+    for u, v, src_port, dst_port in g.edges(data=True):
+        nx_graph.add_edge(u, v, src=src_port, dst=dst_port)
+    nx.drawing.nx_pydot.write_dot(nx_graph, filename)
 
 
 def _sort_cycle(
@@ -41,6 +249,188 @@ def _sort_cycle(
     return [cycle[i] for i in order]
 
 
+def _strongly_connected_components(
+        successors: Mapping[int, Iterable[int]]) -> List[List[int]]:
+    """
+    Returns the strongly connected components of the graph with adjacency
+    @successors (over integer node ids), using an iterative version of Tarjan's
+    algorithm. Components are returned in reverse topological order.
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    next_index = 0
+    for root in successors:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = next_index
+        next_index += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors[root]))]
+        while work:
+            n, it = work[-1]
+            for m in it:
+                if m not in index:
+                    index[m] = lowlink[m] = next_index
+                    next_index += 1
+                    stack.append(m)
+                    on_stack.add(m)
+                    work.append((m, iter(successors[m])))
+                    break
+                if m in on_stack:
+                    lowlink[n] = min(lowlink[n], index[m])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[n])
+                if lowlink[n] != index[n]:
+                    continue
+                component = []
+                while True:
+                    m = stack.pop()
+                    on_stack.discard(m)
+                    component.append(m)
+                    if m == n:
+                        break
+                components.append(component)
+    return components
+
+
+def _unblock(node: int, blocked: Set[int], B: Mapping[int, Set[int]]):
+    stack = {node}
+    while stack:
+        node = stack.pop()
+        if node in blocked:
+            blocked.remove(node)
+            stack.update(B[node])
+            B[node].clear()
+
+
+def _simple_cycle_ids(successors: List[array.array]) -> Iterator[List[int]]:
+    """Johnson's algorithm over integer node ids."""
+    adjacency = {n: set(nbrs) for n, nbrs in enumerate(successors)}
+    for n, nbrs in adjacency.items():
+        if n in nbrs:
+            yield [n]
+            nbrs.discard(n)
+
+    def _subgraph(nodes):
+        nodes = set(nodes)
+        return {n: adjacency[n] & nodes for n in nodes}
+
+    sccs = [
+        scc for scc in _strongly_connected_components(adjacency)
+        if len(scc) > 1
+    ]
+    while sccs:
+        scc = sccs.pop()
+        scc_graph = _subgraph(scc)
+        start = scc.pop()
+        path = [start]
+        blocked = {start}
+        closed = set()
+        B = collections.defaultdict(set)
+        stack = [(start, list(scc_graph[start]))]
+        while stack:
+            n, nbrs = stack[-1]
+            if nbrs:
+                m = nbrs.pop()
+                if m == start:
+                    yield path[:]
+                    closed.update(path)
+                elif m not in blocked:
+                    path.append(m)
+                    stack.append((m, list(scc_graph[m])))
+                    closed.discard(m)
+                    blocked.add(m)
+                    continue
+            if not nbrs:
+                if n in closed:
+                    _unblock(n, blocked, B)
+                else:
+                    for nbr in scc_graph[n]:
+                        B[nbr].add(n)
+                stack.pop()
+                path.pop()
+        remainder = _subgraph(scc)
+        sccs.extend(
+            c for c in _strongly_connected_components(remainder) if len(c) > 1)
+
+
+@dataclasses.dataclass(frozen=True)
+class Loop:
+    # Nodes of a strongly connected component which contains a cycle.
+    component: List[Node]
+    # A shortest cycle through the first node of @component (the earliest
+    # added to the graph), starting from it.
+    witness: List[Node]
+
+
+def _shortest_cycle(
+        start: int, successors: Mapping[int, Iterable[int]]) -> List[int]:
+    """
+    Returns a shortest cycle through @start (which must be on one), found by
+    breadth-first search.
+    """
+    parents = {start: None}
+    queue = collections.deque((start,))
+    while queue:
+        n = queue.popleft()
+        for m in successors[n]:
+            if m == start:
+                cycle = []
+                while n is not None:
+                    cycle.append(n)
+                    n = parents[n]
+                return cycle[::-1]
+            if m not in parents:
+                parents[m] = n
+                queue.append(m)
+    raise ValueError(f"Node {start} is not on a cycle")
+
+
+def find_loops(
+        g: Graph,
+        breaks_loops: Optional[Callable[[Node], bool]] = None) -> List[Loop]:
+    """
+    Returns the loops of @g: its strongly connected components which contain a
+    cycle, ignoring nodes for which @breaks_loops (if given) returns True (e.g.
+    registers). Loops are ordered by their first node. Unlike simple_cycles(),
+    this takes linear time in the size of @g. Each node is taken to connect
+    all of its inputs to all of its outputs, so a node standing for a whole
+    module (e.g. an instance) may give loops which its internals do not have.
+    """
+    successor_ids = g.successor_ids()
+    nodes = range(len(g))
+    if breaks_loops is not None:
+        nodes = [n for n in nodes if not breaks_loops(g.node_from_id(n))]
+    kept = set(nodes)
+    successors = {
+        n: [m for m in successor_ids[n] if m in kept] for n in nodes}
+    loops = []
+    for component in _strongly_connected_components(successors):
+        component.sort()
+        start = component[0]
+        if len(component) == 1 and start not in successors[start]:
+            continue
+        members = set(component)
+        component_successors = {
+            n: [m for m in successors[n] if m in members] for n in component}
+        witness = _shortest_cycle(start, component_successors)
+        loops.append((start, component, witness))
+    loops.sort()
+    return [
+        Loop([g.node_from_id(n) for n in component],
+             [g.node_from_id(n) for n in witness])
+        for _, component, witness in loops
+    ]
+
+
 def simple_cycles(g: Graph) -> Iterable[List[Node]]:
-    cycles = nx.algorithms.cycles.simple_cycles(g)
+    cycles = _simple_cycle_ids(g.successor_ids())
+    cycles = ([g.node_from_id(n) for n in cycle] for cycle in cycles)
     return map(_sort_cycle, cycles)
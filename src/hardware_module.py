@@ -6,11 +6,11 @@ import weakref
 
 import magma as m
 
-from build_magma_graph import build_magma_graph
+from build_magma_graph import build_magma_graph, is_vectorizable_instance
 from builtin import builtin
 from comb import comb
 from common import wrap_with_not_implemented_error
-from graph_lib import Graph
+from graph_lib import Graph, find_loops
 from hw import hw
 from magma_common import (
     ModuleLike as MagmaModuleLike,
@@ -19,13 +19,17 @@ from magma_common import (
     value_or_type_to_string as magma_value_or_type_to_string,
     visit_value_by_direction as visit_magma_value_by_direction,
     visit_value_wrapper_by_direction as visit_magma_value_wrapper_by_direction)
-from mlir import MlirType, MlirValue, MlirSymbol, push_block
+from mlir import MlirBlock, MlirType, MlirValue, MlirSymbol, push_block
 from printer_base import PrinterBase
 from scoped_name_generator import ScopedNameGenerator
+from seq import seq
 from sv import sv
+import tracing
 
 
 MlirValueList = List[MlirValue]
+# Primitives (by coreir name) which hold state, and therefore break loops.
+_SEQUENTIAL_PRIMITIVES = frozenset(("reg", "reg_arst", "mem"))
 
 
 def _get_defn_or_decl_output_name(defn_or_decl: m.circuit.CircuitKind) -> str:
@@ -108,6 +112,16 @@ def make_hw_instance_op(
     return op
 
 
+def make_signature(op: hw.ModuleOpBase) -> hw.ModuleExternOp:
+    """
+    Returns a detached op holding only the symbol and ports of @op, which is
+    all that is needed to instantiate it.
+    """
+    with push_block(MlirBlock()):
+        return hw.ModuleExternOp(
+            name=op.name, operands=op.operands, results=op.results)
+
+
 @dataclasses.dataclass(frozen=True)
 class ModuleWrapper:
     module: MagmaModuleLike
@@ -132,20 +146,73 @@ class ModuleWrapper:
         return ModuleWrapper(module, operands, results)
 
 
+def pack_constant(T: m.Kind, value: Optional[Any] = None) -> int:
+    """
+    Returns the bits of the constant @value (zero if None) of type @T as an
+    integer, laid out as by hw.bitcast: element 0 of arrays and the last field
+    of products in the least significant bits.
+    """
+    if value is None:
+        return 0
+    if isinstance(T, (m.DigitalMeta, m.BitsMeta)):
+        return int(value) & ((1 << T.flat_length()) - 1)
+    packed = 0
+    if isinstance(T, m.ArrayMeta):
+        width = T.T.flat_length()
+        for v in reversed(list(value)):
+            packed = (packed << width) | pack_constant(T.T, v)
+        return packed
+    if isinstance(T, m.ProductMeta):
+        for k, t in T.field_dict.items():
+            packed = (packed << t.flat_length()) | pack_constant(t, value[k])
+        return packed
+    raise TypeError(T)
+
+
+@dataclasses.dataclass
+class _RegisterGroup:
+    """Blocks shared by registers with the same clock and reset."""
+    always: sv.AlwaysFFOp
+    initial: Optional[sv.InitialOp] = None
+
+
 class ModuleVisitor:
     def __init__(self, graph: Graph, ctx):
         self._graph = graph
         self._ctx = ctx
         self._visited = set()
+        self._register_groups = None
+        self._seq_registers = False
+        self._compact_luts = False
+        self._pack_constants = False
+        self._check_loops = True
+        self._vectorize_bitwise = False
+        if ctx is not None:
+            options = ctx.parent.options
+            if options.group_registers:
+                self._register_groups = {}
+            self._seq_registers = options.seq_registers
+            self._compact_luts = options.compact_luts
+            self._pack_constants = options.pack_constants
+            self._check_loops = not options.skip_loop_check
+            self._vectorize_bitwise = options.vectorize_bitwise
+        # NOTE: The cache is per-visitor (rather than lru_cache on the method)
+        # so that it does not keep every visitor, and its values, alive.
+        self.make_constant = functools.lru_cache()(self._make_constant)
 
-    @functools.lru_cache()
-    def make_constant(
+    def _make_constant(
             self, T: m.Kind, value: Optional[Any] = None) -> MlirValue:
         result = self._ctx.new_value(T)
         if isinstance(T, (m.DigitalMeta, m.BitsMeta)):
             value = value if value is not None else 0
             hw.ConstantOp(value=int(value), results=[result])
             return result
+        if self._pack_constants:
+            # Identical bits are shared through the cache, whatever their type.
+            packed = self.make_constant(
+                m.Bits[T.flat_length()], pack_constant(T, value))
+            hw.BitcastOp(operands=[packed], results=[result])
+            return result
         if isinstance(T, m.ArrayMeta):
             value = value if value is not None else (None for _ in range(T.N))
             operands = [self.make_constant(T.T, v) for v in value]
@@ -176,31 +243,23 @@ class ModuleVisitor:
         inst = module.module
         defn = type(inst)
         assert defn.coreir_name == "reg" or defn.coreir_name == "reg_arst"
-        reg = self._ctx.new_value(
-            hw.InOutType(magma_type_to_mlir_type(type(defn.O))))
-        sv.RegOp(name=inst.name, results=[reg])
-        clock_edge = "posedge"
         has_reset = (defn.coreir_name == "reg_arst")
-        operands = [module.operands[1]]
-        attrs = dict(clock_edge=clock_edge)
+        reset = None
+        attrs = dict(clock_edge="posedge")
         if has_reset:
-            reset_type = "asyncreset"
+            reset = module.operands[2]
             arst_posedge = defn.coreir_configargs["arst_posedge"]
             reset_edge = "posedge" if arst_posedge else "negedge"
-            operands.append(module.operands[2])
-            attrs.update(dict(reset_type=reset_type, reset_edge=reset_edge))
-        always = sv.AlwaysFFOp(operands=operands, **attrs)
-        init = defn.coreir_configargs["init"].value
-        const = self.make_constant(type(defn.I), init)
-        with push_block(always.body_block):
-            sv.PAssignOp(operands=[reg, module.operands[0]])
-        if has_reset:
-            always.operands.append(module.operands[1])
-            with push_block(always.reset_block):
-                sv.PAssignOp(operands=[reg, const])
-        with push_block(sv.InitialOp()):
-            sv.BPAssignOp(operands=[reg, const])
-        sv.ReadInOutOp(operands=[reg], results=module.results.copy())
+            attrs.update(dict(reset_type="asyncreset", reset_edge=reset_edge))
+        self._emit_register(
+            module,
+            name=inst.name,
+            T=type(defn.I),
+            init=defn.coreir_configargs["init"].value,
+            data=module.operands[0],
+            clock=module.operands[1],
+            reset=reset,
+            **attrs)
         return True
 
     @wrap_with_not_implemented_error
@@ -302,12 +361,22 @@ class ModuleVisitor:
         defn = type(inst)
         assert defn.coreir_name == "lutN"
         init = defn.coreir_configargs["init"]
-        consts = [self.make_constant(m.Bit, b) for b in init]
         mlir_type = hw.ArrayType((len(init),), builtin.IntegerType(1))
-        array = self._ctx.new_value(mlir_type)
-        hw.ArrayCreateOp(
-            operands=consts,
-            results=array)
+        if self._compact_luts:
+            # Element i of the array holds init[N - 1 - i], as with the
+            # hw.array_create below (whose first operand, init[0], is its last
+            # element), so the bits of init are packed in reverse.
+            width = len(init)
+            packed = int(format(int(init), f"0{width}b")[::-1], 2)
+            table = self.make_constant(m.Bits[width], packed)
+            array = self._ctx.new_value(mlir_type)
+            hw.BitcastOp(operands=[table], results=[array])
+        else:
+            consts = [self.make_constant(m.Bit, b) for b in init]
+            array = self._ctx.new_value(mlir_type)
+            hw.ArrayCreateOp(
+                operands=consts,
+                results=[array])
         hw.ArrayGetOp(
             operands=[array, module.operands[0]],
             results=module.results)
@@ -354,6 +423,26 @@ class ModuleVisitor:
             results=module.results)
         return True
 
+    @wrap_with_not_implemented_error
+    def visit_array_slice(self, module: ModuleWrapper) -> bool:
+        inst_wrapper = module.module
+        T = inst_wrapper.attrs["T"]
+        lo = inst_wrapper.attrs["lo"]
+        if isinstance(T, m.BitsMeta) or issubclass(T.T, m.Bit):
+            comb.ExtractOp(
+                operands=module.operands,
+                results=module.results,
+                lo=lo)
+            return True
+        # Slices are at least 2 elements long (see build_magma_graph.py), so
+        # T.N >= 2 and the index is at least 1 bit wide.
+        num_sel_bits = m.bitutils.clog2(T.N)
+        index = self.make_constant(m.Bits[num_sel_bits], lo)
+        hw.ArraySliceOp(
+            operands=(module.operands + [index]),
+            results=module.results)
+        return True
+
     @wrap_with_not_implemented_error
     def visit_primitive(self, module: ModuleWrapper) -> bool:
         inst = module.module
@@ -389,43 +478,132 @@ class ModuleVisitor:
     def visit_magma_register(self, module: ModuleWrapper) -> bool:
         inst = module.module
         defn = type(inst)
-        reg = self._ctx.new_value(
-            hw.InOutType(magma_type_to_mlir_type(type(defn.O))))
-        sv.RegOp(name=inst.name, results=[reg])
-        clock_edge = "posedge"
         has_reset = defn.reset_type is not None
         # NOTE(resetaluri): This is a hack until
         # magma/primitives/register.py:Register is updated to store this
         # generator parameter directly.
         has_enable = "CE" in defn.interface.ports
-        data = module.operands[0]
+        enable = None
         if has_enable:
             enable = module.operands[1]
-            clk = module.operands[2]
+            clock = module.operands[2]
         else:
-            clk = module.operands[1]
-        always_operands = [clk]
-        attrs = dict(clock_edge=clock_edge)
+            clock = module.operands[1]
+        reset = None
+        attrs = dict(clock_edge="posedge")
         if has_reset:
             reset = module.operands[-1]
-            always_operands.append(reset)
             reset_type, reset_edge = parse_reset_type(defn.reset_type)
             attrs.update(dict(reset_type=reset_type, reset_edge=reset_edge))
-        always = sv.AlwaysFFOp(operands=always_operands, **attrs)
-        const = self.make_constant(type(defn.I), defn.init)
+        self._emit_register(
+            module,
+            name=inst.name,
+            T=type(defn.I),
+            init=defn.init,
+            data=module.operands[0],
+            clock=clock,
+            reset=reset,
+            enable=enable,
+            **attrs)
+        return True
+
+    def _emit_register(
+            self,
+            module: ModuleWrapper,
+            name: str,
+            T: m.Kind,
+            init: Any,
+            data: MlirValue,
+            clock: MlirValue,
+            reset: Optional[MlirValue] = None,
+            enable: Optional[MlirValue] = None,
+            **attrs):
+        """
+        Emits a register named @name driven by @data (when @enable, if given)
+        on @clock, and reset (by @reset, if given) and initialized to @init.
+        @attrs are those of sv.AlwaysFFOp (edges and reset type).
+
+        If CompileOptions.seq_registers is set, registers with a synchronous
+        reset are emitted as seq.compreg ops (see _emit_seq_register()); others
+        are expanded as below, since seq.compreg can not express asynchronous
+        resets, and (having no initial value) would drop the @init of registers
+        without a reset. Otherwise, if CompileOptions.group_registers is
+        set, registers with the same clock and reset (and edges) share a single
+        sv.alwaysff and sv.initial, created along with the first of them;
+        otherwise each register gets its own.
+        """
+        if (self._seq_registers and attrs["clock_edge"] == "posedge" and
+                reset is not None and attrs["reset_type"] == "syncreset"):
+            self._emit_seq_register(
+                module, name, T, init, data, clock, reset, enable,
+                attrs.get("reset_edge"))
+            return
+        reg = self._ctx.new_value(hw.InOutType(magma_type_to_mlir_type(T)))
+        sv.RegOp(name=name, results=[reg])
+        operands = [clock] if reset is None else [clock, reset]
+        if self._register_groups is None:
+            group = _RegisterGroup(sv.AlwaysFFOp(operands=operands, **attrs))
+        else:
+            key = (tuple(operands), tuple(sorted(attrs.items())))
+            group = self._register_groups.get(key)
+            if group is None:
+                group = self._register_groups[key] = _RegisterGroup(
+                    sv.AlwaysFFOp(operands=operands, **attrs))
+        always = group.always
+        const = self.make_constant(T, init)
         with push_block(always.body_block):
             ctx = contextlib.nullcontext()
-            if has_enable:
+            if enable is not None:
                 ctx = push_block(sv.IfOp(operands=[enable]).then_block)
             with ctx:
                 sv.PAssignOp(operands=[reg, data])
-        if has_reset:
+        if reset is not None:
             with push_block(always.reset_block):
                 sv.PAssignOp(operands=[reg, const])
-        with push_block(sv.InitialOp()):
+        if group.initial is None:
+            group.initial = sv.InitialOp()
+        with push_block(group.initial):
             sv.BPAssignOp(operands=[reg, const])
         sv.ReadInOutOp(operands=[reg], results=module.results.copy())
-        return True
+
+    def _emit_seq_register(
+            self,
+            module: ModuleWrapper,
+            name: str,
+            T: m.Kind,
+            init: Any,
+            data: MlirValue,
+            clock: MlirValue,
+            reset: Optional[MlirValue],
+            enable: Optional[MlirValue],
+            reset_edge: Optional[str]):
+        """
+        Emits a register as a seq.compreg (lowered to sv by circt-opt's
+        --lower-seq-to-sv). The enable is a mux feeding back the output, and
+        active low resets are inverted. Note that seq.compreg has no initial
+        value, so @init is only used as the reset value (and hence @reset is
+        required).
+        """
+        output = module.results[0]
+        if enable is not None:
+            next_value = self._ctx.new_value(T)
+            comb.BaseOp(
+                op_name="mux",
+                operands=[enable, data, output],
+                results=[next_value])
+            data = next_value
+        operands = [data, clock]
+        if reset is not None:
+            if reset_edge == "negedge":
+                neg_one = self.make_constant(m.Bit, -1)
+                inverted = self._ctx.new_value(m.Bit)
+                comb.BaseOp(
+                    op_name="xor",
+                    operands=[neg_one, reset],
+                    results=[inverted])
+                reset = inverted
+            operands += [reset, self.make_constant(T, init)]
+        seq.CompRegOp(operands=operands, results=[output], name=name)
 
     @wrap_with_not_implemented_error
     def visit_inline_verilog(self, module: ModuleWrapper) -> bool:
@@ -489,6 +667,16 @@ class ModuleVisitor:
                     lo=inst_wrapper.attrs["index"])
                 return True
             return self.visit_array_get(module)
+        if inst_wrapper.name.startswith("magma_array_slice_op_"):
+            return self.visit_array_slice(module)
+        if inst_wrapper.name.startswith("magma_array_concat_op_"):
+            T = inst_wrapper.attrs["T"]
+            operands = list(reversed(module.operands))
+            if isinstance(T, m.BitsMeta) or issubclass(T.T, m.Bit):
+                comb.ConcatOp(operands=operands, results=module.results)
+                return True
+            hw.ArrayConcatOp(operands=operands, results=module.results)
+            return True
         if inst_wrapper.name.startswith("magma_array_create_op"):
             T = inst_wrapper.attrs["T"]
             if isinstance(T, m.BitsMeta) or issubclass(T.T, m.Bit):
@@ -500,6 +688,15 @@ class ModuleVisitor:
                 operands=list(reversed(module.operands)),
                 results=module.results)
             return True
+        if inst_wrapper.name.startswith("magma_bitwise_op_"):
+            comb.BaseOp(
+                op_name=inst_wrapper.attrs["op_name"],
+                operands=module.operands,
+                results=module.results)
+            return True
+        if inst_wrapper.name.startswith("magma_bitcast_op_"):
+            hw.BitcastOp(operands=module.operands, results=module.results)
+            return True
         if inst_wrapper.name.startswith("magma_product_get_op"):
             index = inst_wrapper.attrs["index"]
             hw.StructExtractOp(
@@ -529,25 +726,103 @@ class ModuleVisitor:
         if isinstance(module.module, MagmaInstanceWrapper):
             return self.visit_instance_wrapper(module)
 
+    @staticmethod
+    def _breaks_loops(module: MagmaModuleLike) -> bool:
+        """
+        Returns whether a loop through @module may be legal, i.e. whether
+        @module may hold state. The module being compiled (whose node stands
+        for both its inputs and outputs), and instances of non-primitive
+        modules, are assumed to. The latter are opaque here: each instance is
+        a single node, connecting all of its inputs to all of its outputs, so
+        treating it as combinational would report loops which only exist at
+        instance granularity (e.g. the "twizzle" example). Hence loops through
+        (combinational) submodule instances are not detected.
+        """
+        if isinstance(module, MagmaInstanceWrapper):
+            return False
+        if not isinstance(module, m.circuit.AnonymousCircuitType):
+            return True
+        defn = type(module)
+        if isinstance(defn, m.Mux):
+            return False
+        if isinstance(defn, m.Register):
+            return True
+        if getattr(defn, "inline_verilog_strs", []):
+            return True
+        if m.isprimitive(defn):
+            return defn.coreir_name in _SEQUENTIAL_PRIMITIVES
+        return True
+
+    def check_loops(self):
+        """
+        Raises a ValueError if the graph has a combinational loop, naming the
+        modules of a shortest cycle in (the first) such loop. Takes linear time
+        in the size of the graph (see graph_lib.find_loops()). Loops through
+        instances of non-primitive modules are not detected (see
+        _breaks_loops()).
+        """
+        loops = find_loops(self._graph, self._breaks_loops)
+        if not loops:
+            return
+        witness = loops[0].witness
+        names = [getattr(module, "name", str(module)) for module in witness]
+        cycle = " -> ".join(names + names[:1])
+        raise ValueError(
+            f"Found {len(loops)} combinational loop(s), e.g.: {cycle}")
+
+    def _emit(self, module: MagmaModuleLike):
+        edges = self._graph.in_edges(module, data=True)
+        for _, _, src_port, dst_port in edges:
+            src_value = self._ctx.get_or_make_mapped_value(src_port)
+            self._ctx.set_mapped_value(dst_port, src_value)
+        assert self.visit_module(ModuleWrapper.make(module, self._ctx))
+
     def visit(self, module: MagmaModuleLike):
+        """
+        Emits @module after (recursively) emitting all of its predecessors,
+        and then visits its instances (if any).
+
+        The traversal uses an explicit stack rather than recursion so that
+        long dependency chains do not hit the recursion limit. Each stack
+        frame holds a module, an iterator over the modules still to be
+        visited from it, and whether the module itself has been emitted: first
+        its predecessors are visited, then it is emitted, and then its
+        instances are visited.
+
+        Unless disabled (see CompileOptions.skip_loop_check), the graph is
+        first checked for combinational loops (see check_loops()), which the
+        traversal would otherwise emit as cyclic IR.
+        """
         if module in self._visited:
             raise RuntimeError(f"Can not re-visit module")
+        if self._check_loops:
+            self.check_loops()
         self._visited.add(module)
-        for predecessor in self._graph.predecessors(module):
-            if predecessor in self._visited:
-                continue
-            self.visit(predecessor)
-        for src, _, data in self._graph.in_edges(module, data=True):
-            info = data["info"]
-            src_port, dst_port = info["src"], info["dst"]
-            src_value = self._ctx.get_or_make_mapped_value(src_port)
-            self._ctx.set_mapped_value(dst_port, src_value)
-        assert self.visit_module(ModuleWrapper.make(module, self._ctx))
-        instances = getattr(module, "instances", [])
-        for inst in instances:
-            if inst in self._visited:
+        stack = [(module, iter(self._graph.predecessors(module)), False)]
+        while stack:
+            module, it, emitted = stack[-1]
+            for next_module in it:
+                if next_module not in self._visited:
+                    break
+            else:
+                stack.pop()
+                if emitted:
+                    continue
+                self._emit(module)
+                instances = getattr(module, "instances", [])
+                if self._vectorize_bitwise:
+                    # Instances merged into wide ops (see build_magma_graph())
+                    # are not in the graph, and are not emitted on their own.
+                    instances = [
+                        inst for inst in instances
+                        if inst in self._graph or
+                        not is_vectorizable_instance(inst)
+                    ]
+                stack.append((module, iter(instances), True))
                 continue
-            self.visit(inst)
+            self._visited.add(next_module)
+            predecessors = iter(self._graph.predecessors(next_module))
+            stack.append((next_module, predecessors, False))
 
 
 def treat_as_primitive(defn_or_decl: m.circuit.CircuitKind) -> bool:
@@ -678,13 +953,25 @@ class HardwareModule:
             mlir_type = magma_type_to_mlir_type(value_or_type.T)
         else:
             raise TypeError(value_or_type)
-        name = self._name_gen(**kwargs)
-        return MlirValue(mlir_type, name)
+        return MlirValue(mlir_type, *self._name_gen.allocate(**kwargs))
+
+    def release(self):
+        """
+        Drops the compiled IR and value map of this module, keeping only its
+        signature (see make_signature()).
+        """
+        self._value_map = {}
+        if self._hw_module is not None:
+            self._hw_module = make_signature(self._hw_module)
 
-    def compile(self):
-        self._hw_module = self._compile()
+    def compile(self, signature_only: bool = False):
+        if signature_only or treat_as_primitive(self._magma_defn_or_decl):
+            self._hw_module = self._compile(signature_only)
+            return
+        with tracing.span("hardware_module", self.name):
+            self._hw_module = self._compile(signature_only)
 
-    def _compile(self) -> hw.ModuleOpBase:
+    def _compile(self, signature_only: bool) -> hw.ModuleOpBase:
         if treat_as_primitive(self._magma_defn_or_decl):
             return
     
@@ -702,24 +989,36 @@ class HardwareModule:
         name = self.parent.get_or_make_mapped_symbol(
             self._magma_defn_or_decl,
             name=defn_or_decl_output_name, force=True)
-        if not treat_as_definition(self._magma_defn_or_decl):
+        # Instances only need the symbol and port names of the module they
+        # instantiate, so when @signature_only is set we stop here and skip
+        # building (and visiting) the module body.
+        if signature_only or not treat_as_definition(self._magma_defn_or_decl):
             return hw.ModuleExternOp(
                 name=name,
                 operands=inputs,
                 results=named_outputs)
         bind_processor = BindProcessor(self, self._magma_defn_or_decl)
-        bind_processor.preprocess()
+        with tracing.span("bind", self.name):
+            bind_processor.preprocess()
         op = hw.ModuleOp(
             name=name,
             operands=inputs,
             results=named_outputs)
-        graph = build_magma_graph(self._magma_defn_or_decl)
+        with tracing.span("build_magma_graph", self.name):
+            graph = build_magma_graph(
+                self._magma_defn_or_decl, self.parent.options)
         visitor = ModuleVisitor(graph, self)
         with push_block(op):
-            visitor.visit(self._magma_defn_or_decl)
-            bind_processor.process()
+            with tracing.span("visit", self.name):
+                visitor.visit(self._magma_defn_or_decl)
+            with tracing.span("bind", self.name):
+                bind_processor.process()
             output_values = new_values(self.get_or_make_mapped_value, i)
             if named_outputs:
                 hw.OutputOp(operands=output_values)
-        bind_processor.post_process()
+        with tracing.span("bind", self.name):
+            bind_processor.post_process()
+        if self.parent.pass_manager:
+            with tracing.span("passes", self.name):
+                self.parent.pass_manager.run(op)
         return op
@@ -1,11 +1,12 @@
 import dataclasses
-from typing import ClassVar, List, Optional, Tuple
+from typing import ClassVar, Dict, List, Optional, Tuple
 
 from mlir import (
     MlirDialect, MlirOp,  MlirValue, MlirType, MlirSymbol, MlirAttribute,
     begin_dialect, end_dialect)
 from mlir_printer_utils import (
-    print_names, print_types, print_signature, print_attr_dict)
+    emit_string, emit_string_array, print_names, print_types, print_signature,
+    print_attr_dict)
 from printer_base import PrinterBase
 
 
@@ -13,7 +14,7 @@ hw = MlirDialect("hw")
 begin_dialect(hw)
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, eq=False, slots=True)
 class ArrayType(MlirType):
     dims: Tuple[int]
     T: MlirType
@@ -23,7 +24,7 @@ class ArrayType(MlirType):
         return f"!hw.array<{dim_str}x{self.T.emit()}>"
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, eq=False, slots=True)
 class StructType(MlirType):
     fields: Tuple[Tuple[str, MlirType]]
 
@@ -32,7 +33,7 @@ class StructType(MlirType):
         return f"!hw.struct<{field_str}>"
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, eq=False, slots=True)
 class InOutType(MlirType):
     T: MlirType
 
@@ -49,12 +50,14 @@ class InnerRefAttr(MlirAttribute):
         return f"#hw.innerNameRef<{self.module.name}::{self.name.name}>"
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class ModuleOpBase(MlirOp):
     operands: List[MlirValue]
     results: List[MlirValue]
     name: MlirSymbol
 
+    isolated_from_above: ClassVar[bool] = True
+
     def print_op(self, printer: PrinterBase):
         printer.print(f"hw.{self.op_name} {self.name.name}(")
         print_signature(self.operands, printer)
@@ -62,27 +65,49 @@ class ModuleOpBase(MlirOp):
         print_signature(self.results, printer, raw_names=True)
         printer.print(")")
 
+    # Ports are attributes (and inputs block arguments) in the generic form,
+    # rather than operands and results.
+    def generic_operands(self) -> List[MlirValue]:
+        return []
+
+    def generic_results(self) -> List[MlirValue]:
+        return []
+
+    def generic_attributes(self) -> Dict[str, str]:
+        inputs = ", ".join(v.type.emit() for v in self.operands)
+        outputs = ", ".join(v.type.emit() for v in self.results)
+        return {
+            "sym_name": emit_string(self.name.raw_name),
+            "function_type": f"({inputs}) -> ({outputs})",
+            "argNames": emit_string_array(v.raw_name for v in self.operands),
+            "resultNames": emit_string_array(
+                v.raw_name for v in self.results),
+            "parameters": "[]",
+        }
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(slots=True)
 class ModuleOp(ModuleOpBase):
     op_name: ClassVar[str] = "module"
 
     def __post_init__(self):
-        self._block = self.new_region().new_block()
+        self.new_region().new_block().arguments = self.operands
 
     def add_operation(self, operation: MlirOp):
-        self._block.add_operation(operation)
+        self.regions[0].blocks[0].add_operation(operation)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class ModuleExternOp(ModuleOpBase):
     op_name: ClassVar[str] = "module.extern"
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class OutputOp(MlirOp):
     operands: List[MlirValue]
 
+    op_name: ClassVar[str] = "output"
+
     def print_op(self, printer: PrinterBase):
         printer.print(f"hw.output ")
         print_names(self.operands, printer)
@@ -90,18 +115,23 @@ class OutputOp(MlirOp):
         print_types(self.operands, printer)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class ConstantOp(MlirOp):
     results: List[MlirValue]
     value: int
 
+    op_name: ClassVar[str] = "constant"
+
     def print_op(self, printer: PrinterBase):
         print_names(self.results, printer)
         printer.print(f" = hw.constant {self.value} : ")
         print_types(self.results, printer)
 
+    def generic_attributes(self) -> Dict[str, str]:
+        return {"value": f"{self.value} : {self.results[0].type.emit()}"}
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(slots=True)
 class InstanceOp(MlirOp):
     operands: List[MlirValue]
     results: List[MlirValue]
@@ -109,6 +139,8 @@ class InstanceOp(MlirOp):
     module: ModuleOpBase
     sym: Optional[MlirSymbol] = None
 
+    op_name: ClassVar[str] = "instance"
+
     def print_op(self, printer: PrinterBase):
         if self.results:
             print_names(self.results, printer)
@@ -133,12 +165,28 @@ class InstanceOp(MlirOp):
             printer.print(" ")
             print_attr_dict(self.attr_dict, printer)
 
+    def generic_attributes(self) -> Dict[str, str]:
+        attrs = {
+            "instanceName": emit_string(self.name),
+            "moduleName": self.module.name.name,
+            "argNames": emit_string_array(
+                v.raw_name for v in self.module.operands),
+            "resultNames": emit_string_array(
+                v.raw_name for v in self.module.results),
+            "parameters": "[]",
+        }
+        if self.sym is not None:
+            attrs["inner_sym"] = emit_string(self.sym.raw_name)
+        return attrs
+
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class ArrayGetOp(MlirOp):
     operands: List[MlirValue]
     results: List[MlirValue]
 
+    op_name: ClassVar[str] = "array_get"
+
     def print_op(self, printer: PrinterBase):
         print_names(self.results, printer)
         printer.print(" = hw.array_get ")
@@ -149,11 +197,32 @@ class ArrayGetOp(MlirOp):
         print_types(self.operands[0], printer)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
+class ArraySliceOp(MlirOp):
+    operands: List[MlirValue]
+    results: List[MlirValue]
+
+    op_name: ClassVar[str] = "array_slice"
+
+    def print_op(self, printer: PrinterBase):
+        print_names(self.results, printer)
+        printer.print(" = hw.array_slice ")
+        print_names(self.operands[0], printer)
+        printer.print(" at ")
+        print_names(self.operands[1], printer)
+        printer.print(" : (")
+        print_types(self.operands[0], printer)
+        printer.print(") -> ")
+        print_types(self.results, printer)
+
+
+@dataclasses.dataclass(slots=True)
 class ArrayCreateOp(MlirOp):
     operands: List[MlirValue]
     results: List[MlirValue]
 
+    op_name: ClassVar[str] = "array_create"
+
     def print_op(self, printer: PrinterBase):
         print_names(self.results, printer)
         printer.print(" = hw.array_create ")
@@ -162,11 +231,13 @@ class ArrayCreateOp(MlirOp):
         print_types(self.operands[0], printer)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class ArrayConcatOp(MlirOp):
     operands: List[MlirValue]
     results: List[MlirValue]
 
+    op_name: ClassVar[str] = "array_concat"
+
     def print_op(self, printer: PrinterBase):
         print_names(self.results, printer)
         printer.print(" = hw.array_concat ")
@@ -175,12 +246,31 @@ class ArrayConcatOp(MlirOp):
         print_types(self.operands, printer)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
+class BitcastOp(MlirOp):
+    operands: List[MlirValue]
+    results: List[MlirValue]
+
+    op_name: ClassVar[str] = "bitcast"
+
+    def print_op(self, printer: PrinterBase):
+        print_names(self.results, printer)
+        printer.print(" = hw.bitcast ")
+        print_names(self.operands, printer)
+        printer.print(" : (")
+        print_types(self.operands, printer)
+        printer.print(") -> ")
+        print_types(self.results, printer)
+
+
+@dataclasses.dataclass(slots=True)
 class StructExtractOp(MlirOp):
     operands: List[MlirValue]
     results: List[MlirValue]
     field: str
 
+    op_name: ClassVar[str] = "struct_extract"
+
     def print_op(self, printer: PrinterBase):
         print_names(self.results, printer)
         printer.print(" = hw.struct_extract ")
@@ -188,12 +278,17 @@ class StructExtractOp(MlirOp):
         printer.print(f"[\"{self.field}\"] : ")
         print_types(self.operands, printer)
 
+    def generic_attributes(self) -> Dict[str, str]:
+        return {"field": emit_string(self.field)}
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(slots=True)
 class StructCreateOp(MlirOp):
     operands: List[MlirValue]
     results: List[MlirValue]
 
+    op_name: ClassVar[str] = "struct_create"
+
     def print_op(self, printer: PrinterBase):
         print_names(self.results, printer)
         printer.print(" = hw.struct_create (")
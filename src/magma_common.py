@@ -1,32 +1,74 @@
 import dataclasses
-from typing import Any, Callable, Mapping, Union
+from typing import Any, Callable, Dict, Mapping, Tuple, Union
 
 import magma as m
 
-from common import make_unique_name, replace_all
+from common import make_unique_name
 
 
 ModuleLike = Union[m.DefineCircuitKind, m.Circuit]
 
 
-_VALUE_OR_TYPE_TO_STRING_REPLACEMENTS = {
+_VALUE_OR_TYPE_TO_STRING_TABLE = str.maketrans({
     "(": "_",
-    ")": "",
+    ")": None,
     "[": "_",
-    "]": "",
-    " ": "",
+    "]": None,
+    " ": None,
     ",": "_",
     "=": "_",
     ".": "_",
-}
-
-
-def value_or_type_to_string(value_or_type: Union[m.Type, m.Kind]):
+})
+# Memoized value_or_type_to_string() results, keyed by the id() of the kind (or
+# of the value's ref), along with the key object itself to keep it alive (and
+# its id unique) and, for refs, the names the string was built from (see
+# _ref_names()). Kinds can't be used as keys directly since they compare equal
+# regardless of direction, which is part of their string. Cleared once it grows
+# past _VALUE_OR_TYPE_TO_STRING_CACHE_SIZE entries.
+_value_or_type_to_string_cache: Dict[int, Tuple[Any, Any, str]] = {}
+_VALUE_OR_TYPE_TO_STRING_CACHE_SIZE = 1 << 16
+
+
+def _ref_names(ref: m.ref.Ref) -> Tuple[Any, Any]:
+    """
+    Returns the names (of the root value, and the instance or definition which
+    owns it) which the qualified name of @ref depends on, besides indices,
+    which are fixed. These change when any part of the name is renamed.
+    """
+    while isinstance(ref, (m.ref.ArrayRef, m.ref.TupleRef)):
+        parent = ref.array if isinstance(ref, m.ref.ArrayRef) else ref.tuple
+        ref = parent.name
+    owner = getattr(ref, "inst", None)
+    if owner is not None:
+        return owner.name, ref.name
+    owner = getattr(ref, "defn", None)
+    return getattr(owner, "__name__", None), getattr(ref, "name", None)
+
+
+def value_or_type_to_string(value_or_type: Union[m.Type, m.Kind]) -> str:
+    if isinstance(value_or_type, m.Type):
+        key = value_or_type.name
+        names = _ref_names(key)
+    else:
+        key = value_or_type
+        names = None
+    try:
+        cached_key, cached_names, s = _value_or_type_to_string_cache[id(key)]
+    except KeyError:
+        pass
+    else:
+        if cached_key is key and cached_names == names:
+            return s
     if isinstance(value_or_type, m.Type):
-        s = value_or_type.name.qualifiedname("_")
+        s = key.qualifiedname("_")
     else:
-        s = str(value_or_type)
-    return replace_all(s, _VALUE_OR_TYPE_TO_STRING_REPLACEMENTS)
+        s = str(key)
+    s = s.translate(_VALUE_OR_TYPE_TO_STRING_TABLE)
+    if len(_value_or_type_to_string_cache) >= (
+            _VALUE_OR_TYPE_TO_STRING_CACHE_SIZE):
+        _value_or_type_to_string_cache.clear()
+    _value_or_type_to_string_cache[id(key)] = key, names, s
+    return s
 
 
 def visit_value_by_direction(
@@ -1,4 +1,4 @@
-from typing import Union
+from typing import List, Union
 
 import magma as m
 
@@ -15,20 +15,36 @@ def MagmaArrayGetOp(T: m.ArrayMeta, index: str):
     return InstanceWrapper(name, ports, attrs)
 
 
-class MagmaArraySliceOp(m.Generator2):
-    def __init__(self, T: m.ArrayMeta, lo: int, hi: int):
-        assert isinstance(T, m.ArrayMeta)
-        T = T.undirected_t
-        type_string = value_or_type_to_string(T)
-        self.name = f"magma_array_slice_op_{type_string}_{lo}_{hi}"
-        self.primitive = True
+def sized_array_type(T: m.ArrayMeta, n: int) -> m.ArrayMeta:
+    """Returns the array type with the same element type as @T of size @n."""
+    if issubclass(T, m.Bits):
+        return m.Bits[n]
+    return m.Array[n, T.T]
 
-        T_out = T.unsized_t[hi - lo]
-        self.io = m.IO(I=m.In(T), O=m.Out(T_out))
 
-        self.T = T
-        self.lo = lo
-        self.hi = hi
+def MagmaArraySliceOp(T: m.ArrayMeta, lo: int, hi: int):
+    assert isinstance(T, m.ArrayMeta)
+    T = T.undirected_t
+    type_string = value_or_type_to_string(T)
+    name = f"magma_array_slice_op_{type_string}_{lo}_{hi}"
+    T_out = sized_array_type(T, hi - lo)
+    ports = dict(I=m.In(T), O=m.Out(T_out))
+    attrs = dict(T=T, lo=lo, hi=hi)
+    return InstanceWrapper(name, ports, attrs)
+
+
+def MagmaArrayConcatOp(T: m.ArrayMeta, Ts: List[m.Kind]):
+    """
+    Concatenates values of types @Ts (in increasing index order) into a value
+    of type @T.
+    """
+    assert isinstance(T, m.ArrayMeta)
+    T = T.undirected_t
+    name = f"magma_array_concat_op_{value_or_type_to_string(T)}"
+    ports = dict(**{f"I{i}": m.In(t) for i, t in enumerate(Ts)})
+    ports.update(dict(O=m.Out(T)))
+    attrs = dict(T=T)
+    return InstanceWrapper(name, ports, attrs)
 
 
 def MagmaArrayCreateOp(T: m.ArrayMeta):
@@ -41,6 +57,27 @@ def MagmaArrayCreateOp(T: m.ArrayMeta):
     return InstanceWrapper(name, ports, attrs)
 
 
+def MagmaBitwiseOp(op_name: str, T: m.BitsMeta, arity: int):
+    """Applies the comb op @op_name (and, or or xor) to @arity values of @T."""
+    assert isinstance(T, m.BitsMeta)
+    T = T.undirected_t
+    name = f"magma_bitwise_op_{op_name}_{value_or_type_to_string(T)}"
+    ports = dict(**{f"I{i}": m.In(T) for i in range(arity)})
+    ports.update(dict(O=m.Out(T)))
+    attrs = dict(T=T, op_name=op_name)
+    return InstanceWrapper(name, ports, attrs)
+
+
+def MagmaBitcastOp(T_in: m.Kind, T_out: m.Kind):
+    assert T_in.flat_length() == T_out.flat_length()
+    T_in, T_out = T_in.undirected_t, T_out.undirected_t
+    type_strings = map(value_or_type_to_string, (T_in, T_out))
+    name = "magma_bitcast_op_{}_{}".format(*type_strings)
+    ports = dict(I=m.In(T_in), O=m.Out(T_out))
+    attrs = dict(T_in=T_in, T_out=T_out)
+    return InstanceWrapper(name, ports, attrs)
+
+
 def MagmaProductGetOp(T: m.ProductMeta, index: Union[int, str]):
     assert isinstance(T, m.ProductMeta)
     T = T.undirected_t
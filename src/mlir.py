@@ -1,14 +1,20 @@
 import abc
 import contextlib
 import dataclasses
-from typing import List, Mapping, Optional, Tuple
-import weakref
+import functools
+import itertools
+from typing import Callable, ClassVar, Dict, List, Optional, Tuple
 
-from common import Stack, WithId, default_field, constant
+from common import Stack
 from printer_base import PrinterBase
 
 
-OptionalWeakRef = Optional[weakref.ReferenceType]
+def _is_slotted_copy(dct: Dict) -> bool:
+    """
+    Returns whether @dct is that of a class being re-created by
+    dataclass(slots=True) from an existing dataclass (which it replaces).
+    """
+    return "__dataclass_fields__" in dct
 
 
 class DialectKind(abc.ABCMeta):
@@ -20,30 +26,116 @@ class DialectKind(abc.ABCMeta):
             return cls
         dialect = maybe_peek_dialect()
         if dialect is not None:
-            cls._register_(dialect)
+            cls._register_(dialect, replace=_is_slotted_copy(dct))
+            cls.dialect = dialect
         return cls
 
 
+def _memoize_emit(emit: Callable[['MlirType'], str]):
+
+    @functools.wraps(emit)
+    def wrapped(self) -> str:
+        try:
+            return self._emitted
+        except AttributeError:
+            pass
+        text = emit(self)
+        object.__setattr__(self, "_emitted", text)
+        return text
+
+    return wrapped
+
+
+# Maps (type class, field values...) to the canonical instance of each type.
+_type_table = {}
+_type_field_names = {}
+
+
+def _type_key(obj: 'MlirType') -> Tuple:
+    cls = type(obj)
+    try:
+        names = _type_field_names[cls]
+    except KeyError:
+        names = tuple(f.name for f in dataclasses.fields(cls))
+        _type_field_names[cls] = names
+    return (cls,) + tuple(getattr(obj, name) for name in names)
+
+
 class MlirTypeMeta(DialectKind):
-    def _register_(cls, dialect):
-        dialect.register_type(cls)
+    def __new__(metacls, name, bases, dct):
+        emit = dct.get("emit")
+        if (emit is not None and not _is_slotted_copy(dct) and
+                not getattr(emit, "__isabstractmethod__", 0)):
+            dct["emit"] = _memoize_emit(emit)
+        return super().__new__(metacls, name, bases, dct)
+
+    def _register_(cls, dialect, replace: bool = False):
+        dialect.register_type(cls, replace)
+
+    def __call__(cls, *args, **kwargs):
+        obj = super().__call__(*args, **kwargs)
+        return _type_table.setdefault(_type_key(obj), obj)
 
 
 class MlirType(metaclass=MlirTypeMeta):
+    """
+    Base class of types. Subclasses are frozen, slotted dataclasses with
+    eq=False: types are interned on construction (each distinct type has a
+    single canonical instance), so identity comparison and hashing are exact,
+    and O(1) regardless of nesting. emit() is memoized per instance (in
+    @_emitted).
+    """
+    __slots__ = ("_emitted",)
     @abc.abstractmethod
     def emit(self) -> str:
         raise NotImplementedError()
 
+    def __reduce__(self):
+        # Re-intern on unpickling.
+        return type(self), _type_key(self)[1:]
+
 
-@dataclasses.dataclass(frozen=True)
 class MlirValue:
-    type: MlirType
-    raw_name: str
+    """
+    Value of type @type named @raw_name or, if @index is given, @raw_name
+    followed by @index. In the latter case the name is only formatted once it
+    is first needed (i.e. when printed). Values compare (and hash) by type,
+    @raw_name and @index, without formatting their names, so
+    MlirValue(T, "x", 2) != MlirValue(T, "x2") even though both print as %x2;
+    names allocated by a ScopedNameGenerator are unique either way.
+    """
+    __slots__ = ("type", "_prefix", "_index", "_raw_name")
+
+    def __init__(
+            self, type: MlirType, raw_name: str, index: Optional[int] = None):
+        self.type = type
+        self._prefix = raw_name
+        self._index = index
+        self._raw_name = raw_name if index is None else None
+
+    @property
+    def raw_name(self) -> str:
+        raw_name = self._raw_name
+        if raw_name is None:
+            raw_name = self._raw_name = f"{self._prefix}{self._index}"
+        return raw_name
 
     @property
     def name(self) -> str:
         return f"%{self.raw_name}"
 
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, MlirValue):
+            return NotImplemented
+        return (self.type == other.type and self._prefix == other._prefix and
+                self._index == other._index)
+
+    def __hash__(self) -> int:
+        return hash((self.type, self._prefix, self._index))
+
+    def __repr__(self) -> str:
+        return f"MlirValue(type={self.type!r}, raw_name={self.raw_name!r})"
+
 
 @dataclasses.dataclass(frozen=True)
 class MlirSymbol:
@@ -55,8 +147,8 @@ class MlirSymbol:
 
 
 class MlirAttributeMeta(DialectKind):
-    def _register_(cls, dialect):
-        dialect.register_attribute(cls)
+    def _register_(cls, dialect, replace: bool = False):
+        dialect.register_attribute(cls, replace)
 
 
 class MlirAttribute(metaclass=MlirAttributeMeta):
@@ -65,19 +157,26 @@ class MlirAttribute(metaclass=MlirAttributeMeta):
         raise NotImplementedError()
 
 
-@dataclasses.dataclass
-class MlirBlock(WithId):
-    operations: List['MlirOp'] = default_field(list, init=False)
-    arguments: List[MlirValue] = default_field(list, init=False)
-    # parent is of type MlirRegion.
-    parent: OptionalWeakRef = default_field(constant(None), init=False)
+# Ids are only used to identify IR objects (e.g. by passes) within a process.
+_next_id = itertools.count().__next__
+
+
+class MlirBlock:
+    __slots__ = ("id", "operations", "arguments", "parent")
+
+    def __init__(self):
+        self.id = _next_id()
+        self.operations: List['MlirOp'] = []
+        self.arguments: List[MlirValue] = []
+        # @parent is of type MlirRegion.
+        self.parent: Optional['MlirRegion'] = None
 
     def add_operation(self, operation: 'MlirOp'):
         operation.set_parent(self)
         self.operations.append(operation)
 
     def set_parent(self, parent: 'MlirRegion'):
-        self.parent = weakref.ref(parent)
+        self.parent = parent
 
     def print(self, printer: PrinterBase):
         for operation in self.operations:
@@ -101,11 +200,14 @@ def push_block(block):
         get_block_stack().pop()
 
 
-@dataclasses.dataclass
-class MlirRegion(WithId):
-    blocks: List[MlirBlock] = default_field(list, init=False)
-    # @parent is of type MlirOp.
-    parent: OptionalWeakRef = default_field(constant(None), init=False)
+class MlirRegion:
+    __slots__ = ("id", "blocks", "parent")
+
+    def __init__(self):
+        self.id = _next_id()
+        self.blocks: List[MlirBlock] = []
+        # @parent is of type MlirOp.
+        self.parent: Optional['MlirOp'] = None
 
     def new_block(self) -> MlirBlock:
         block = MlirBlock()
@@ -114,7 +216,7 @@ class MlirRegion(WithId):
         return block
 
     def set_parent(self, parent: 'MlirOp'):
-        self.parent = weakref.ref(parent)
+        self.parent = parent
 
     def print(self, printer: PrinterBase):
         for block in self.blocks:
@@ -122,8 +224,8 @@ class MlirRegion(WithId):
 
 
 class MlirOpMeta(DialectKind):
-    def _register_(cls, dialect):
-        dialect.register_op(cls)
+    def _register_(cls, dialect, replace: bool = False):
+        dialect.register_op(cls, replace)
 
     def __call__(cls, *args, **kwargs):
         obj = super().__call__(*args, **kwargs)
@@ -136,23 +238,69 @@ class MlirOpMeta(DialectKind):
         return obj
 
 
-@dataclasses.dataclass
-class MlirOp(WithId, metaclass=MlirOpMeta):
-    regions: List[MlirRegion] = default_field(list, init=False)
-    operands: List[MlirValue] = default_field(list, init=False)
-    results: List[MlirValue] = default_field(list, init=False)
-    attr_dict: Mapping = default_field(dict, init=False)
-    # @parent is of type MlirBlock.
-    parent: OptionalWeakRef = default_field(constant(None), init=False)
+_NO_REGIONS = ()
+
+
+class MlirOp(metaclass=MlirOpMeta):
+    """
+    Base class of ops. Subclasses are slotted dataclasses (i.e. declared with
+    dataclass(slots=True)) whose fields are the operands, results and
+    attributes of the op, so ops have no __dict__: any other state must be
+    derived from the fields, regions, or attribute dictionary.
+
+    The common state is slotted too, and regions and the attribute dictionary
+    are only allocated once used, since most ops have neither. Parent pointers
+    are plain references rather than weakrefs, so the IR of a module with
+    regions forms reference cycles, which are left to the cyclic GC.
+    """
+    __slots__ = (
+        "id", "_regions", "operands", "results", "_attr_dict", "parent")
+
+    # Name of the op (without the dialect prefix) in MLIR.
+    op_name: ClassVar[str]
+    # Whether the op's regions may not use values defined outside of it.
+    isolated_from_above: ClassVar[bool] = False
+    # Number of regions of the op in its generic form. Regions which are
+    # allocated lazily here (e.g. else blocks) are missing from @regions until
+    # then, but always present (possibly empty) in the generic form.
+    num_generic_regions: ClassVar[int] = 0
+
+    def __new__(cls, *args, **kwargs):
+        obj = super().__new__(cls)
+        obj.id = _next_id()
+        obj._regions = _NO_REGIONS
+        obj._attr_dict = None
+        # @parent is of type MlirBlock.
+        obj.parent = None
+        # Operands and results are set by __init__() if they are fields of the
+        # op, and otherwise default to empty.
+        fields = getattr(cls, "__dataclass_fields__", {})
+        if "operands" not in fields:
+            obj.operands = []
+        if "results" not in fields:
+            obj.results = []
+        return obj
+
+    @property
+    def regions(self) -> List[MlirRegion]:
+        return self._regions
+
+    @property
+    def attr_dict(self) -> Dict:
+        if self._attr_dict is None:
+            self._attr_dict = {}
+        return self._attr_dict
 
     def new_region(self) -> MlirRegion:
         region = MlirRegion()
         region.set_parent(self)
-        self.regions.append(region)
+        if self._regions is _NO_REGIONS:
+            self._regions = []
+        self._regions.append(region)
         return region
 
     def set_parent(self, parent: MlirBlock):
-        self.parent = weakref.ref(parent)
+        self.parent = parent
 
     def print(self, printer: PrinterBase):
         self.print_op(printer)
@@ -171,6 +319,35 @@ class MlirOp(WithId, metaclass=MlirOpMeta):
     def print_op(self, printer: PrinterBase):
         raise NotImplementedError()
 
+    def generic_name(self) -> str:
+        return f"{self.dialect.name}.{self.op_name}"
+
+    def generic_operands(self) -> List['MlirValue']:
+        return self.operands
+
+    def generic_results(self) -> List['MlirValue']:
+        return self.results
+
+    def generic_attributes(self) -> Dict[str, str]:
+        """
+        Returns the attributes of the generic form of the op (other than
+        those in attr_dict), mapping names to values in MLIR syntax.
+        """
+        return {}
+
+    def generic_attr_dict(self) -> str:
+        """
+        Returns the attribute dictionary of the generic form of the op in
+        MLIR syntax (with sorted keys), or "" if it is empty.
+        """
+        attrs = self.generic_attributes()
+        if self._attr_dict:
+            attrs.update((k, str(v)) for k, v in self._attr_dict.items())
+        if not attrs:
+            return ""
+        entries = ", ".join(f"{k} = {attrs[k]}" for k in sorted(attrs))
+        return f"{{{entries}}}"
+
 
 class MlirDialect:
     def __init__(self, name: str):
@@ -181,23 +358,24 @@ class MlirDialect:
     def name(self) -> str:
         return self._name
 
-    def _register(self, cls: type, arg_name: str, base: type):
+    def _register(
+            self, cls: type, arg_name: str, base: type, replace: bool):
         if not issubclass(cls, base):
             raise TypeError(f"{arg_name} must be subclass of {base.__name__}")
         name = cls.__name__
-        if name in self._klasses:
+        if name in self._klasses and not replace:
             raise RuntimeError(f"{name} already part of {self.name} dialect")
         self._klasses[name] = cls
         setattr(self, name, cls)
 
-    def register_op(self, op: type):
-        self._register(op, "op", MlirOp)
+    def register_op(self, op: type, replace: bool = False):
+        self._register(op, "op", MlirOp, replace)
 
-    def register_type(self, t: type):
-        self._register(t, "t", MlirType)
+    def register_type(self, t: type, replace: bool = False):
+        self._register(t, "t", MlirType, replace)
 
-    def register_attribute(self, attr: type):
-        self._register(attr, "attr", MlirAttribute)
+    def register_attribute(self, attr: type, replace: bool = False):
+        self._register(attr, "attr", MlirAttribute, replace)
 
 
 _dialect_stack = Stack()
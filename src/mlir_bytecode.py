@@ -0,0 +1,279 @@
+"""
+Writer of MLIR's portable bytecode format (see
+https://mlir.llvm.org/docs/BytecodeFormat/) for the IR in mlir.py.
+
+Ops are written in their generic form (see MlirOp.generic_attributes() etc.),
+and attributes and types in their textual ("raw") encoding, which is supported
+for every dialect. Strings, attributes and types are each deduplicated into a
+table and referenced by index. Version 0 of the format is written, which every
+bytecode reader supports.
+"""
+import io
+from typing import Dict, List, Tuple
+
+from mlir import MlirOp, MlirRegion, MlirType, MlirValue
+
+
+_MAGIC = b"ML\xefR"
+_VERSION = 0
+_PRODUCER = "magma-mlir"
+
+# Section ids.
+_STRING_SECTION = 0
+_DIALECT_SECTION = 1
+_ATTR_TYPE_SECTION = 2
+_ATTR_TYPE_OFFSET_SECTION = 3
+_IR_SECTION = 4
+
+# Bits of the mask following the name of each op, marking which of its parts
+# are present.
+_OP_HAS_ATTRS = 0x01
+_OP_HAS_RESULTS = 0x02
+_OP_HAS_OPERANDS = 0x04
+_OP_HAS_INLINE_REGIONS = 0x10
+
+# Only the unknown location is written (for ops and block arguments).
+_UNKNOWN_LOC = "loc(unknown)"
+
+# Encodings of the varints which fit in a single byte.
+_SMALL_VARINTS = [bytes(((value << 1) | 1,)) for value in range(128)]
+
+
+def encode_varint(value: int) -> bytes:
+    """
+    Returns the "prefix varint" encoding of @value: the number of trailing
+    zeros of the first byte (plus one) is the length of the encoding, and the
+    remaining bits hold @value in little-endian order.
+    """
+    if value < 128:
+        return _SMALL_VARINTS[value]
+    for num_bytes in range(2, 9):
+        if value >> (7 * num_bytes) == 0:
+            encoded = ((value << 1) | 1) << (num_bytes - 1)
+            return encoded.to_bytes(num_bytes, "little")
+    return b"\x00" + value.to_bytes(8, "little")
+
+
+def _emit_section(out: bytearray, section_id: int, data: bytes):
+    out.append(section_id)
+    out += encode_varint(len(data))
+    out += data
+
+
+class _Table:
+    """
+    Entries (e.g. attributes) numbered in order of first use, each owned by a
+    dialect (numbered by the writer).
+    """
+    def __init__(self):
+        self.indices: Dict[str, int] = {}
+        self.dialects: List[int] = []
+
+    def get(self, entry: str, dialect: int) -> int:
+        try:
+            return self.indices[entry]
+        except KeyError:
+            pass
+        index = self.indices[entry] = len(self.dialects)
+        self.dialects.append(dialect)
+        return index
+
+    def groups(self) -> List[Tuple[int, List[str]]]:
+        """
+        Returns the entries in order, grouped into runs owned by the same
+        dialect. The format groups entries by dialect, but allows a dialect to
+        own several groups, which lets entries be numbered in a single pass.
+        """
+        groups = []
+        for entry, dialect in zip(self.indices, self.dialects):
+            if not groups or groups[-1][0] != dialect:
+                groups.append((dialect, []))
+            groups[-1][1].append(entry)
+        return groups
+
+
+class BytecodeWriter:
+    def __init__(self):
+        self._strings = {}
+        self._dialects = {}
+        self._op_names = _Table()
+        self._attrs = _Table()
+        self._types = _Table()
+        self._builtin = self._dialect("builtin")
+        self._unknown_loc = self._attrs.get(_UNKNOWN_LOC, self._builtin)
+
+    def _string(self, s: str) -> int:
+        return self._strings.setdefault(s, len(self._strings))
+
+    def _dialect(self, name: str) -> int:
+        try:
+            return self._dialects[name]
+        except KeyError:
+            pass
+        self._string(name)
+        return self._dialects.setdefault(name, len(self._dialects))
+
+    def _type(self, t: MlirType) -> int:
+        return self._types.get(t.emit(), self._dialect(t.dialect.name))
+
+    def _write_op(
+            self,
+            out: bytearray,
+            op: MlirOp,
+            ids: Dict[MlirValue, int],
+            next_id: int):
+        """
+        Writes @op, whose operands are numbered by @ids, and whose regions (if
+        not isolated from above) number their values from @next_id.
+        """
+        try:
+            name = op.generic_name()
+        except AttributeError:
+            raise TypeError(f"{type(op).__name__} has no generic form")
+        dialect = name.partition(".")[0]
+        out += encode_varint(self._op_names.get(name, self._dialect(dialect)))
+        mask_offset = len(out)
+        out.append(0)
+        out += _SMALL_VARINTS[self._unknown_loc]
+        mask = 0
+        attr_dict = op.generic_attr_dict()
+        if attr_dict:
+            mask |= _OP_HAS_ATTRS
+            out += encode_varint(self._attrs.get(attr_dict, self._builtin))
+        results = op.generic_results()
+        if results:
+            mask |= _OP_HAS_RESULTS
+            out += encode_varint(len(results))
+            for result in results:
+                out += encode_varint(self._type(result.type))
+        operands = op.generic_operands()
+        if operands:
+            mask |= _OP_HAS_OPERANDS
+            out += encode_varint(len(operands))
+            try:
+                for operand in operands:
+                    out += encode_varint(ids[operand])
+            except KeyError as e:
+                raise ValueError(
+                    f"Operand {e.args[0].name} of {name} is not defined in "
+                    f"its scope") from None
+        regions = op.regions
+        num_regions = max(len(regions), op.num_generic_regions)
+        if num_regions:
+            mask |= _OP_HAS_INLINE_REGIONS
+        out[mask_offset] = mask
+        if not num_regions:
+            return
+        isolated = op.isolated_from_above
+        out += encode_varint((num_regions << 1) | isolated)
+        # Values are numbered per region, following those of the enclosing
+        # regions, except in isolated ops which start a new scope. Sibling
+        # regions reuse the same numbers; entries of @ids for values of a
+        # previous sibling are left behind, but never looked up again.
+        if isolated:
+            ids, next_id = {}, 0
+        for region in regions:
+            self._write_region(out, region, ids, next_id)
+        for _ in range(num_regions - len(regions)):
+            out += _SMALL_VARINTS[0]
+
+    def _write_region(
+            self,
+            out: bytearray,
+            region: MlirRegion,
+            ids: Dict[MlirValue, int],
+            first_id: int):
+        if not region.blocks:
+            out += _SMALL_VARINTS[0]
+            return
+        # All values of the region are numbered up front, since (graph
+        # region) ops may use values defined after them.
+        next_id = first_id
+        for block in region.blocks:
+            for value in block.arguments:
+                ids[value] = next_id
+                next_id += 1
+            for op in block.operations:
+                for result in op.generic_results():
+                    ids[result] = next_id
+                    next_id += 1
+        out += encode_varint(len(region.blocks))
+        out += encode_varint(next_id - first_id)
+        for block in region.blocks:
+            arguments = block.arguments
+            num_ops = len(block.operations)
+            out += encode_varint((num_ops << 1) | bool(arguments))
+            if arguments:
+                out += encode_varint(len(arguments))
+                for value in arguments:
+                    out += encode_varint(self._type(value.type))
+                    out += _SMALL_VARINTS[self._unknown_loc]
+            for op in block.operations:
+                self._write_op(out, op, ids, next_id)
+
+    def _string_section(self) -> bytes:
+        out = bytearray(encode_varint(len(self._strings)))
+        encoded = [s.encode() + b"\x00" for s in self._strings]
+        for data in reversed(encoded):
+            out += encode_varint(len(data))
+        for data in encoded:
+            out += data
+        return bytes(out)
+
+    def _dialect_section(self) -> bytes:
+        out = bytearray(encode_varint(len(self._dialects)))
+        for name in self._dialects:
+            out += encode_varint(self._strings[name])
+        for dialect, op_names in self._op_names.groups():
+            out += encode_varint(dialect)
+            out += encode_varint(len(op_names))
+            for name in op_names:
+                op_name = name.partition(".")[2]
+                out += encode_varint(self._string(op_name))
+        return bytes(out)
+
+    def _attr_type_sections(self) -> Tuple[bytes, bytes]:
+        data = bytearray()
+        offsets = bytearray()
+        offsets += encode_varint(len(self._attrs.dialects))
+        offsets += encode_varint(len(self._types.dialects))
+        for table in (self._attrs, self._types):
+            for dialect, entries in table.groups():
+                offsets += encode_varint(dialect)
+                offsets += encode_varint(len(entries))
+                for entry in entries:
+                    encoded = entry.encode() + b"\x00"
+                    data += encoded
+                    # The low bit marks custom (non-textual) encodings.
+                    offsets += encode_varint(len(encoded) << 1)
+        return bytes(data), bytes(offsets)
+
+    def write(self, op: MlirOp, fout: io.RawIOBase):
+        """Writes @op (typically a builtin.module) to @fout as bytecode."""
+        ir = bytearray()
+        # The IR section is a block holding just @op.
+        ir += encode_varint(1 << 1)
+        self._write_op(ir, op, {}, 0)
+        # Op names are added to the string table while writing the dialect
+        # section, so it has to be built before the string section.
+        dialect_section = self._dialect_section()
+        attr_type_section, attr_type_offset_section = (
+            self._attr_type_sections())
+        out = bytearray(_MAGIC)
+        out += encode_varint(_VERSION)
+        out += _PRODUCER.encode() + b"\x00"
+        _emit_section(out, _STRING_SECTION, self._string_section())
+        _emit_section(out, _DIALECT_SECTION, dialect_section)
+        _emit_section(out, _ATTR_TYPE_SECTION, attr_type_section)
+        _emit_section(
+            out, _ATTR_TYPE_OFFSET_SECTION, attr_type_offset_section)
+        _emit_section(out, _IR_SECTION, bytes(ir))
+        fout.write(out)
+
+
+def write_bytecode(op: MlirOp, fout: io.RawIOBase):
+    BytecodeWriter().write(op, fout)
+
+
+def is_bytecode(data: bytes) -> bool:
+    return data.startswith(_MAGIC)
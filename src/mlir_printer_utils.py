@@ -1,4 +1,4 @@
-from typing import Callable, List, Mapping, Union
+from typing import Callable, Iterable, List, Mapping, Union
 
 from mlir import MlirValue
 from printer_base import PrinterBase
@@ -25,15 +25,23 @@ def print_names(
         value_or_value_list: MlirValueOrMlirValueList,
         printer: PrinterBase,
         raw_names: bool = False):
-    value_list = _maybe_wrap_value_or_value_list(value_or_value_list)
-    get_name = get_name_fn(raw_names)
-    printer.print(", ".join(get_name(v) for v in value_list))
+    if isinstance(value_or_value_list, MlirValue):
+        value = value_or_value_list
+        printer.print(value.raw_name if raw_names else value.name)
+        return
+    if raw_names:
+        names = [v.raw_name for v in value_or_value_list]
+    else:
+        names = [v.name for v in value_or_value_list]
+    printer.print(", ".join(names))
 
 
 def print_types(
         value_or_value_list: MlirValueOrMlirValueList, printer: PrinterBase):
-    value_list = _maybe_wrap_value_or_value_list(value_or_value_list)
-    printer.print(", ".join(v.type.emit() for v in value_list))
+    if isinstance(value_or_value_list, MlirValue):
+        printer.print(value_or_value_list.type.emit())
+        return
+    printer.print(", ".join([v.type.emit() for v in value_or_value_list]))
 
 
 def print_signature(
@@ -42,10 +50,31 @@ def print_signature(
         raw_names: bool = False):
     value_list = _maybe_wrap_value_or_value_list(value_or_value_list)
     get_name = get_name_fn(raw_names)
-    signatures = (f"{get_name(v)}: {v.type.emit()}" for v in value_list)
+    signatures = [f"{get_name(v)}: {v.type.emit()}" for v in value_list]
     printer.print(", ".join(signatures))
 
 
 def print_attr_dict(attr_dict: Mapping, printer: PrinterBase):
     attr_dict_to_string = ", ".join(f"{k} = {v}" for k, v in attr_dict.items())
     printer.print(f"{{{attr_dict_to_string}}}")
+
+
+# Escapes of each byte in MLIR string literals, as printed by MLIR itself:
+# printable characters other than '"' and '\' as is, others as two hex digits.
+_STRING_ESCAPES = [
+    chr(b) if 0x20 <= b < 0x7f and chr(b) not in "\"\\" else f"\\{b:02X}"
+    for b in range(256)
+]
+_STRING_ESCAPES[ord("\\")] = "\\\\"
+
+
+def emit_string(s: str) -> str:
+    """Returns @s as an MLIR string literal (e.g. of a string attribute)."""
+    if s.isascii() and s.isprintable() and "\"" not in s and "\\" not in s:
+        return f"\"{s}\""
+    escaped = "".join(_STRING_ESCAPES[b] for b in s.encode())
+    return f"\"{escaped}\""
+
+
+def emit_string_array(strings: Iterable[str]) -> str:
+    return f"[{', '.join(map(emit_string, strings))}]"
@@ -1,11 +1,35 @@
+import codecs
+import concurrent.futures
+import contextlib
 import io
 import os
 import pathlib
+import re
 import subprocess
 import sys
-from typing import List, Optional
+import threading
+from typing import IO, ContextManager, Iterator, List, Optional, Sequence
 
 from common import try_call
+from mlir_bytecode import is_bytecode
+import tracing
+
+
+# Each input of a batch is followed by a chunk holding only an empty module
+# named with this prefix and the index of the input, which marks where the
+# output for the input ends. Keeping it in a separate chunk leaves the line
+# numbers (and hence locations) of the input itself unchanged, and ensures that
+# anything emitted after the modules of the input (e.g. bind files) precedes
+# it.
+_SENTINEL_PREFIX = "mlir_to_verilog_batch_end_"
+_SENTINEL_RE = re.compile(
+    rb"^module " + _SENTINEL_PREFIX.encode() + rb"(\d+)\(", re.MULTILINE)
+_SPLIT_MARKER = b"// -----\n"
+_COPY_CHUNK_SIZE = 1 << 16
+# With --split-input-file, each chunk is parsed as its own buffer, named after
+# the input and the line the chunk starts at. Line numbers are relative to the
+# chunk, so dropping the suffix gives the locations a standalone run would.
+_SPLIT_BUFFER_NAME_RE = re.compile(rb"<stdin> split at line #\d+")
 
 
 def get_circt_home() -> pathlib.Path:
@@ -21,22 +45,114 @@ def make_opt_cmd(circt_home: pathlib.Path) -> List[str]:
     ]
 
 
-def _subprocess_run(args, stdin, stdout):
-    stdin_pipe = (
-        try_call(lambda: stdin.fileno(), io.UnsupportedOperation) is None
-    )
-    stdout_pipe = (
-        try_call(lambda: stdout.fileno(), io.UnsupportedOperation) is None
-    )
-    stdin_actual = subprocess.PIPE if stdin_pipe else stdin
-    stdout_actual = subprocess.PIPE if stdout_pipe else stdout
-    proc = subprocess.Popen(args, stdin=stdin_actual, stdout=stdout_actual)
-    if stdin_pipe:
-        proc.stdin.write(stdin.read())
-        proc.stdin.close()
-    proc.wait()
-    if stdout_pipe:
-        stdout.write(proc.stdout.read())
+def _has_fileno(stream) -> bool:
+    fileno = try_call(lambda: stream.fileno(), io.UnsupportedOperation)
+    return fileno is not None
+
+
+def _copy_stream(src, dst, close_dst: bool = False):
+    """
+    Copies @src to @dst in chunks, converting between text and bytes as
+    needed. Stops early (without raising) if @dst is a pipe whose reader has
+    exited.
+    """
+    decoder = None
+    if isinstance(dst, io.TextIOBase):
+        decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        while True:
+            chunk = src.read(_COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            if isinstance(chunk, str) and decoder is None:
+                chunk = chunk.encode()
+            elif isinstance(chunk, bytes) and decoder is not None:
+                chunk = decoder.decode(chunk)
+            dst.write(chunk)
+        if close_dst:
+            dst.close()
+    except BrokenPipeError:
+        pass
+
+
+class _OutputDrainer:
+    """
+    Copies the stdout of @proc into @stdout on a separate thread (if @stdout
+    can not be handed to @proc directly), so that @proc never blocks on a
+    full pipe while its stdin is being written.
+    """
+    def __init__(self, stdout):
+        self._stdout = stdout
+        self._thread = None
+
+    @property
+    def popen_arg(self):
+        return self._stdout if _has_fileno(self._stdout) else subprocess.PIPE
+
+    def start(self, proc: subprocess.Popen):
+        if proc.stdout is None:
+            return
+        self._thread = threading.Thread(
+            target=_copy_stream, args=(proc.stdout, self._stdout))
+        self._thread.start()
+
+    def join(self):
+        if self._thread is not None:
+            self._thread.join()
+
+
+def _subprocess_run(args, stdin, stdout) -> int:
+    """
+    Runs @args with @stdin as input and @stdout as output. Streams with file
+    descriptors are handed to the process directly; others are copied through
+    pipes, concurrently and in chunks, without holding either side in memory.
+    Raises subprocess.CalledProcessError if the process fails (e.g. exits
+    while its input is still being written).
+    """
+    with tracing.span("circt-opt"):
+        drainer = _OutputDrainer(stdout)
+        stdin_pipe = not _has_fileno(stdin)
+        stdin_actual = subprocess.PIPE if stdin_pipe else stdin
+        proc = subprocess.Popen(
+            args, stdin=stdin_actual, stdout=drainer.popen_arg)
+        drainer.start(proc)
+        if stdin_pipe:
+            _copy_stream(stdin, proc.stdin, close_dst=True)
+        drainer.join()
+        returncode = proc.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, args)
+    return returncode
+
+
+@contextlib.contextmanager
+def _open_subprocess_pipe(
+        args: List[str], stdout, binary: bool = False) -> Iterator[IO]:
+    with tracing.span("circt-opt"):
+        drainer = _OutputDrainer(stdout)
+        proc = subprocess.Popen(
+            args, stdin=subprocess.PIPE, stdout=drainer.popen_arg)
+        drainer.start(proc)
+        stdin = proc.stdin if binary else io.TextIOWrapper(proc.stdin)
+        broken_pipe = None
+        try:
+            yield stdin
+        except BrokenPipeError as e:
+            # The process exited early; its return code (below) tells why.
+            broken_pipe = e
+        finally:
+            try:
+                stdin.close()
+            except BrokenPipeError as e:
+                broken_pipe = e
+            drainer.join()
+            returncode = proc.wait()
+    # Only reached if the body did not raise (other than because the process
+    # exited), so that other errors are not masked.
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, args)
+    if broken_pipe is not None:
+        raise broken_pipe
 
 
 def mlir_to_verilog(istream: io.RawIOBase, ostream: io.RawIOBase = sys.stdout):
@@ -45,6 +161,134 @@ def mlir_to_verilog(istream: io.RawIOBase, ostream: io.RawIOBase = sys.stdout):
     _subprocess_run(opt_cmd, istream, ostream)
 
 
+def mlir_file_to_verilog(
+        path: os.PathLike, ostream: io.RawIOBase = sys.stdout):
+    """
+    Like mlir_to_verilog(), but circt-opt reads the input from @path directly.
+    Note that locations in the output then refer to @path rather than <stdin>.
+    """
+    circt_home = get_circt_home()
+    opt_cmd = make_opt_cmd(circt_home)
+    _subprocess_run(opt_cmd + [str(path)], subprocess.DEVNULL, ostream)
+
+
+def open_mlir_to_verilog_pipe(
+        ostream: io.RawIOBase = sys.stdout,
+        binary: bool = False) -> ContextManager[IO]:
+    """
+    Returns a context manager yielding a text stream which is piped into
+    circt-opt as it is written, so that conversion overlaps with generating
+    the MLIR (e.g. with compile_to_mlir(..., stream=True)). The output is
+    written to @ostream concurrently, and conversion is complete once the
+    context exits, which raises subprocess.CalledProcessError if circt-opt
+    failed. If @binary is set, the stream is a binary one instead (e.g. for
+    bytecode).
+    """
+    circt_home = get_circt_home()
+    opt_cmd = make_opt_cmd(circt_home)
+    return _open_subprocess_pipe(opt_cmd, ostream, binary)
+
+
+def _make_batch_input(inputs: Sequence[bytes], start: int) -> bytes:
+    chunks = []
+    for index, mlir in enumerate(inputs, start):
+        if not mlir.endswith(b"\n"):
+            mlir += b"\n"
+        sentinel = f"hw.module @{_SENTINEL_PREFIX}{index}() -> () {{\n}}\n"
+        chunks += [mlir, sentinel.encode()]
+    return _SPLIT_MARKER.join(chunks)
+
+
+def _split_batch_output(
+        output: bytes, start: int, size: int) -> List[Optional[bytes]]:
+    """
+    Splits the verilog produced for a batch of @size inputs (numbered from
+    @start) back into the output of each input. Entries are None for inputs
+    whose output could not be found, or is empty (e.g. because circt-opt failed
+    on them).
+    """
+    results = [None] * size
+    pos = 0
+    for match in _SENTINEL_RE.finditer(output):
+        index = int(match.group(1)) - start
+        if not 0 <= index < size or results[index] is not None:
+            return [None] * size
+        text = output[pos:match.start()]
+        if text:
+            results[index] = _SPLIT_BUFFER_NAME_RE.sub(b"<stdin>", text)
+        end = output.find(b"endmodule\n", match.end())
+        if end < 0:
+            return [None] * size
+        pos = end + len(b"endmodule\n")
+        # Skip the blank line emitted after every module.
+        if output.startswith(b"\n", pos):
+            pos += 1
+    return results
+
+
+def _run_batch(
+        opt_cmd: List[str],
+        inputs: Sequence[bytes],
+        start: int) -> List[bytes]:
+    results = [None] * len(inputs)
+    # Bytecode inputs can not be split, so they are left to be converted on
+    # their own below.
+    indices = [i for i, mlir in enumerate(inputs) if not is_bytecode(mlir)]
+    if indices:
+        args = opt_cmd + ["--split-input-file"]
+        batch = [inputs[i] for i in indices]
+        with tracing.span("circt-opt"):
+            proc = subprocess.run(
+                args, input=_make_batch_input(batch, start),
+                stdout=subprocess.PIPE)
+        # circt-opt carries on past a chunk which fails (still emitting the
+        # sentinels after it), so on failure none of the outputs are trusted.
+        if not proc.returncode:
+            outputs = _split_batch_output(proc.stdout, start, len(batch))
+            for index, output in zip(indices, outputs):
+                results[index] = output
+    # Re-run inputs whose output is missing (or whose batch failed) on their
+    # own, so that any errors are reported against the offending input.
+    for index, result in enumerate(results):
+        if result is not None:
+            continue
+        with tracing.span("circt-opt"):
+            proc = subprocess.run(
+                opt_cmd, input=inputs[index], stdout=subprocess.PIPE)
+        if proc.returncode:
+            raise subprocess.CalledProcessError(
+                proc.returncode, opt_cmd, output=proc.stdout)
+        results[index] = proc.stdout
+    return results
+
+
+def mlir_to_verilog_batch(
+        inputs: Sequence[bytes],
+        batch_size: int = 64,
+        jobs: int = 1) -> List[bytes]:
+    """
+    Converts each of @inputs (MLIR text or bytecode) to verilog, returning the
+    verilog for each input in order.
+
+    Rather than starting circt-opt once per input, inputs are grouped into
+    batches of up to @batch_size which are each converted by a single
+    circt-opt process (using --split-input-file), running up to @jobs
+    processes at once. The output is the same as that of mlir_to_verilog() on
+    each input separately. Raises subprocess.CalledProcessError if circt-opt
+    fails on any input.
+    """
+    circt_home = get_circt_home()
+    opt_cmd = make_opt_cmd(circt_home)
+    starts = range(0, len(inputs), batch_size)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(
+                _run_batch, opt_cmd, inputs[start:start + batch_size], start)
+            for start in starts
+        ]
+        return [result for f in futures for result in f.result()]
+
+
 def main(infile: Optional[str] = None, outfile: Optional[str] = None):
     if infile is None:
         istream = sys.stdin
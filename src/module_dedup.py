@@ -0,0 +1,116 @@
+"""
+Structural de-duplication of compiled hw.modules (see
+CompileOptions.dedup_modules).
+
+Two modules are structurally identical if their generic forms (see
+MlirOp.generic_attributes() etc.) only differ in their own symbol and the names
+of their values. Modules are compiled children first, and each duplicate is
+replaced by the first (canonical) module with the same structure, so parents
+instantiate canonical modules and are themselves compared after their children
+have been merged.
+"""
+import hashlib
+from typing import Any, Dict, Iterator, Mapping
+
+from hw import hw
+from mlir import MlirOp, MlirValue
+from passes import walk_blocks, walk_ops
+
+
+def _module_attributes(op: hw.ModuleOp) -> str:
+    attrs = op.generic_attributes()
+    # The symbol of the module itself is all that duplicates differ in.
+    del attrs["sym_name"]
+    attrs.update((k, str(v)) for k, v in op.attr_dict.items())
+    return ", ".join(f"{k} = {attrs[k]}" for k in sorted(attrs))
+
+
+def _structure(op: hw.ModuleOp) -> Iterator[str]:
+    # Values are numbered up front (in pre-order) since graph regions may use
+    # values defined after their use.
+    ids: Dict[MlirValue, int] = {}
+    for block in walk_blocks(op):
+        for value in block.arguments:
+            ids[value] = len(ids)
+        for child in block.operations:
+            for result in child.generic_results():
+                ids[result] = len(ids)
+    yield _module_attributes(op)
+    # Blocks are visited in pre-order, and each op records the shape of its
+    # regions, which determines where the blocks that follow are nested.
+    for block in walk_blocks(op):
+        types = ", ".join(value.type.emit() for value in block.arguments)
+        yield f"^({types}) {len(block.operations)}"
+        for child in block.operations:
+            operands = ", ".join(
+                str(ids[value]) for value in child.generic_operands())
+            results = ", ".join(
+                value.type.emit() for value in child.generic_results())
+            regions = ", ".join(
+                str(len(region.blocks)) for region in child.regions)
+            yield (f"{child.generic_name()}({operands}) "
+                   f"{child.generic_attr_dict()} -> ({results}) [{regions}]")
+
+
+def _is_mergeable(op: MlirOp) -> bool:
+    """
+    Returns whether @op may be replaced by an identical module. Modules holding
+    inner symbols are kept, since these are referenced (e.g. by binds) through
+    the symbol of the module.
+    """
+    if not isinstance(op, hw.ModuleOp):
+        return False
+    return all(getattr(child, "sym", None) is None for child in walk_ops(op))
+
+
+def structural_hash(op: hw.ModuleOp) -> str:
+    """
+    Returns a hash of @op which is independent of its symbol and the names of
+    its values, but covers the symbols of the modules it instantiates.
+    """
+    h = hashlib.sha256()
+    for line in _structure(op):
+        h.update(line.encode())
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+class ModuleDeduplicator:
+    """
+    Tracks the canonical module for each structure seen so far, and which
+    modules were replaced by which.
+    """
+    def __init__(self):
+        self._canonical = {}
+        self._mapping = {}
+
+    @property
+    def mapping(self) -> Mapping[str, str]:
+        """Maps the symbol of each replaced module to its canonical one."""
+        return self._mapping
+
+    def find_canonical(self, op: MlirOp, value: Any) -> Any:
+        """
+        Returns the value (e.g. hardware module) recorded for the first module
+        identical to @op, or None if there is none, in which case @value is
+        recorded for @op. Only the symbol of canonical modules is kept, so
+        their IR may be dropped once printed.
+        """
+        if not _is_mergeable(op):
+            return None
+        key = structural_hash(op)
+        entry = (op.name.raw_name, value)
+        name, canonical = self._canonical.setdefault(key, entry)
+        if canonical is value:
+            return None
+        self._mapping[op.name.raw_name] = name
+        return canonical
+
+    def report(self) -> str:
+        """Returns a table of the replaced modules and their replacements."""
+        lines = [f"{'module':<40} canonical"]
+        for duplicate, canonical in self._mapping.items():
+            lines.append(f"{duplicate:<40} {canonical}")
+        lines.append(f"{len(self._mapping)} module(s) replaced")
+        return "\n".join(lines) + "\n"
+
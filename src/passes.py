@@ -0,0 +1,247 @@
+import abc
+import collections
+import dataclasses
+import time
+from typing import Iterator, Mapping, Sequence, Tuple
+
+from comb import comb
+from hw import hw
+from mlir import MlirBlock, MlirOp, MlirValue
+from sv import sv
+
+
+# Ops which have no side effects, and can therefore be erased if none of their
+# results are used.
+_PURE_OPS = (
+    hw.ConstantOp,
+    hw.ArrayGetOp,
+    hw.ArraySliceOp,
+    hw.ArrayCreateOp,
+    hw.ArrayConcatOp,
+    hw.BitcastOp,
+    hw.StructExtractOp,
+    hw.StructCreateOp,
+    comb.BaseOp,
+    comb.ConcatOp,
+    comb.ExtractOp,
+    comb.ICmpOp,
+    comb.ParityOp,
+    sv.ReadInOutOp,
+)
+# Pure ops whose results only depend on their operands and attributes, and can
+# therefore be de-duplicated. sv.read_inout is excluded since its result
+# depends on where it is inside procedural regions.
+_CSE_OPS = tuple(op for op in _PURE_OPS if op is not sv.ReadInOutOp)
+# Dataclass fields of ops which are not part of their "attributes" for the
+# purpose of comparing ops.
+_NON_ATTRIBUTE_FIELDS = frozenset(("operands", "results"))
+
+
+def walk_blocks(op: MlirOp) -> Iterator[MlirBlock]:
+    """Yields every block nested (at any depth) under @op, in pre-order."""
+    stack = [op]
+    while stack:
+        op = stack.pop()
+        for region in reversed(op.regions):
+            for block in reversed(region.blocks):
+                yield block
+                stack.extend(reversed(block.operations))
+
+
+def walk_ops(op: MlirOp) -> Iterator[MlirOp]:
+    """Yields every op nested (at any depth) under @op, in pre-order."""
+    for block in walk_blocks(op):
+        yield from block.operations
+
+
+class Pass(abc.ABC):
+    """
+    Transformation of the ops nested under a single (isolated) op, typically an
+    hw.module. Value names are only unique within such an op, so passes must
+    not look beyond it.
+    """
+    name: str
+
+    @abc.abstractmethod
+    def run(self, op: MlirOp) -> int:
+        """Runs the pass on @op and returns the number of ops erased."""
+        raise NotImplementedError()
+
+
+class DeadCodeEliminationPass(Pass):
+    name = "dce"
+
+    def run(self, op: MlirOp) -> int:
+        uses = collections.Counter()
+        defining_ops = {}
+        for child in walk_ops(op):
+            uses.update(child.operands)
+            if isinstance(child, _PURE_OPS):
+                for result in child.results:
+                    defining_ops[result] = child
+        worklist = [
+            child for child in defining_ops.values()
+            if not any(uses[result] for result in child.results)
+        ]
+        dead = set()
+        while worklist:
+            child = worklist.pop()
+            if child.id in dead:
+                continue
+            dead.add(child.id)
+            for operand in child.operands:
+                uses[operand] -= 1
+                if uses[operand]:
+                    continue
+                try:
+                    defining_op = defining_ops[operand]
+                except KeyError:
+                    continue
+                if not any(uses[result] for result in defining_op.results):
+                    worklist.append(defining_op)
+        if not dead:
+            return 0
+        for block in walk_blocks(op):
+            block.operations[:] = (
+                child for child in block.operations if child.id not in dead)
+        return len(dead)
+
+
+def _cse_key(op: MlirOp, replacements: Mapping[MlirValue, MlirValue]):
+    attrs = tuple(
+        getattr(op, field.name) for field in dataclasses.fields(op)
+        if field.name not in _NON_ATTRIBUTE_FIELDS
+    )
+    if op._attr_dict:
+        attrs += tuple(sorted(op._attr_dict.items()))
+    operands = tuple(replacements.get(v, v) for v in op.operands)
+    result_types = tuple(result.type for result in op.results)
+    return type(op), attrs, operands, result_types
+
+
+class CommonSubexpressionEliminationPass(Pass):
+    """
+    Replaces each pure op with a previous identical op (same type, attributes
+    (including its attribute dictionary), operands and result types) in the
+    same block or an enclosing block.
+
+    Nested regions are visited as soon as their op is reached, so they only see
+    the ops of enclosing blocks which precede their op.
+    """
+    name = "cse"
+
+    def run(self, op: MlirOp) -> int:
+        replacements = {}
+        erased = 0
+        # Each entry is a block to visit, the table of available ops
+        # (inherited from the enclosing block), and the ops kept so far; an
+        # entry is revisited (to resume after a nested region) while
+        # @operations still has ops left.
+        stack = [
+            (block, {}, iter(block.operations), [])
+            for region in reversed(op.regions)
+            for block in reversed(region.blocks)
+        ]
+        while stack:
+            block, available, operations, kept = stack[-1]
+            for child in operations:
+                if child.regions:
+                    kept.append(child)
+                    # The nested blocks are visited before the rest of this
+                    # block, in order.
+                    stack.extend(
+                        (nested, collections.ChainMap({}, available),
+                         iter(nested.operations), [])
+                        for region in reversed(child.regions)
+                        for nested in reversed(region.blocks)
+                    )
+                    break
+                if not isinstance(child, _CSE_OPS):
+                    kept.append(child)
+                    continue
+                key = _cse_key(child, replacements)
+                try:
+                    existing = available.setdefault(key, child)
+                except TypeError:  # unhashable attribute
+                    kept.append(child)
+                    continue
+                if existing is child:
+                    kept.append(child)
+                    continue
+                for old, new in zip(child.results, existing.results):
+                    replacements[old] = new
+                erased += 1
+            else:
+                stack.pop()
+                block.operations[:] = kept
+        if replacements:
+            for child in walk_ops(op):
+                child.operands = [
+                    replacements.get(v, v) for v in child.operands]
+        return erased
+
+
+_PASSES = {
+    cls.name: cls
+    for cls in (DeadCodeEliminationPass, CommonSubexpressionEliminationPass)
+}
+
+
+@dataclasses.dataclass
+class PassStats:
+    runs: int = 0
+    seconds: float = 0.0
+    erased: int = 0
+
+
+class PassManager:
+    """
+    Runs a pipeline of passes (by name, see available_passes()) over ops, and
+    accumulates the time spent in (and ops erased by) each pass.
+    """
+    def __init__(self, pass_names: Sequence[str] = ()):
+        try:
+            self._passes = [_PASSES[name]() for name in pass_names]
+        except KeyError as e:
+            raise ValueError(f"Unknown pass {e.args[0]!r}") from None
+        self._stats = {p.name: PassStats() for p in self._passes}
+
+    @property
+    def stats(self) -> Mapping[str, PassStats]:
+        return self._stats
+
+    def __bool__(self) -> bool:
+        return bool(self._passes)
+
+    def merge_stats(self, stats: Mapping[str, PassStats]):
+        """Adds @stats (e.g. from another process) to the stats of this."""
+        for name, other in stats.items():
+            ours = self._stats[name]
+            ours.runs += other.runs
+            ours.seconds += other.seconds
+            ours.erased += other.erased
+
+    def run(self, op: MlirOp):
+        for p in self._passes:
+            stats = self._stats[p.name]
+            start = time.perf_counter()
+            erased = p.run(op)
+            stats.seconds += time.perf_counter() - start
+            stats.runs += 1
+            stats.erased += erased
+
+    def timing_report(self) -> str:
+        total = sum(stats.seconds for stats in self._stats.values())
+        lines = [f"{'pass':<8} {'runs':>6} {'time (ms)':>10} {'%':>6} "
+                 f"{'erased':>8}"]
+        for name, stats in self._stats.items():
+            percent = 100 * stats.seconds / total if total else 0.0
+            lines.append(
+                f"{name:<8} {stats.runs:>6} {1000 * stats.seconds:>10.3f} "
+                f"{percent:>6.1f} {stats.erased:>8}")
+        lines.append(f"{'total':<8} {'':>6} {1000 * total:>10.3f}")
+        return "\n".join(lines) + "\n"
+
+
+def available_passes() -> Tuple[str, ...]:
+    return tuple(_PASSES)
@@ -1,16 +1,26 @@
+import functools
 import io
 import sys
+from typing import List, Union
+
+
+_DEFAULT_BUFSIZE = 64 * 1024
+_AVERAGE_CHUNK_SIZE = 8
+_ENCODING = "utf-8"
 
 
 class PrinterBase:
     def __init__(self, tab: int = 4, sout: io.TextIOBase = sys.stdout):
         self._tab = tab
         self._indent = 0
+        self._indents = [""]
         self._sout = sout
         self._flushed = True
 
     def push(self):
         self._indent += 1
+        if self._indent == len(self._indents):
+            self._indents.append(" " * (self._indent * self._tab))
 
     def pop(self):
         if self._indent == 0:
@@ -18,17 +28,110 @@ class PrinterBase:
         self._indent -= 1
 
     def _make_indent(self) -> str:
-        return f"{' ' * (self._indent * self._tab)}"
+        return self._indents[self._indent]
+
+    def _write(self, s: str):
+        self._sout.write(s)
 
     def flush(self):
-        self._sout.write("\n")
+        self._write("\n")
         self._flushed = True
 
     def print(self, s: str):
-        tab = self._make_indent() if self._flushed else ""
-        self._sout.write(f"{tab}{s}")
+        tab = self._indents[self._indent] if self._flushed else ""
+        self._write(f"{tab}{s}")
         self._flushed = False
 
     def print_line(self, line: str):
-        self._sout.write(f"{self._make_indent()}{line}\n")
-        self._flusehd = True
+        self._write(f"{self._indents[self._indent]}{line}\n")
+        self._flushed = True
+
+
+Target = Union[io.TextIOBase, io.BufferedIOBase, io.RawIOBase, bytearray,
+               memoryview]
+
+
+class BufferedPrinter(PrinterBase):
+    """
+    PrinterBase which accumulates chunks and writes them to @sout in blocks of
+    roughly @bufsize characters, rather than once per token.
+
+    @sout may be a text stream, a binary stream, a bytearray (which is
+    extended), or a writable memoryview (which is filled from the start; a
+    BufferError is raised if it overflows). Output is only guaranteed to reach
+    @sout after drain() (or on exit, when used as a context manager).
+    """
+    def __init__(
+            self,
+            tab: int = 4,
+            sout: Target = sys.stdout,
+            bufsize: int = _DEFAULT_BUFSIZE):
+        super().__init__(tab, sout)
+        # Chunks are mostly single tokens, so bound the number of chunks
+        # rather than tracking their total length on every call.
+        self._max_chunks = max(1, bufsize // _AVERAGE_CHUNK_SIZE)
+        self._chunks: List[str] = []
+        self._offset = 0
+        self._write_block = self._make_block_writer(sout)
+
+    def __enter__(self) -> 'BufferedPrinter':
+        return self
+
+    def __exit__(self, *_):
+        self.drain()
+
+    @property
+    def bytes_written(self) -> int:
+        """Number of bytes written so far to a bytes-like target."""
+        return self._offset
+
+    def _make_block_writer(self, sout: Target):
+        if isinstance(sout, bytearray):
+            return functools.partial(self._write_encoded, sout.extend)
+        if isinstance(sout, memoryview):
+            return functools.partial(
+                self._write_encoded, self._fill_memoryview)
+        if isinstance(sout, (io.BufferedIOBase, io.RawIOBase)):
+            return functools.partial(self._write_encoded, sout.write)
+        return sout.write
+
+    def _write_encoded(self, write, block: str):
+        data = block.encode(_ENCODING)
+        write(data)
+        self._offset += len(data)
+
+    def _fill_memoryview(self, data: bytes):
+        end = self._offset + len(data)
+        if end > len(self._sout):
+            raise BufferError("Printer target memoryview is too small")
+        self._sout[self._offset:end] = data
+
+    def _write(self, s: str):
+        chunks = self._chunks
+        chunks.append(s)
+        if len(chunks) >= self._max_chunks:
+            self.drain()
+
+    def print(self, s: str):
+        chunks = self._chunks
+        if self._flushed:
+            chunks.append(self._indents[self._indent])
+        chunks.append(s)
+        self._flushed = False
+        if len(chunks) >= self._max_chunks:
+            self.drain()
+
+    def print_line(self, line: str):
+        chunks = self._chunks
+        chunks += (self._indents[self._indent], line, "\n")
+        self._flushed = True
+        if len(chunks) >= self._max_chunks:
+            self.drain()
+
+    def drain(self):
+        """Writes all buffered output to @sout."""
+        if not self._chunks:
+            return
+        block = "".join(self._chunks)
+        self._chunks.clear()
+        self._write_block(block)
@@ -1,6 +1,6 @@
 import abc
 import collections
-from typing import Optional
+from typing import Optional, Tuple
 
 
 class ScopedNameGeneratorBase(abc.ABC):
@@ -14,15 +14,25 @@ class ScopedNameGenerator(ScopedNameGeneratorBase):
         self._indices = collections.Counter()
 
     def __call__(self, name: Optional[str] = None, force: bool = False) -> str:
+        prefix, index = self.allocate(name, force)
+        if index is None:
+            return prefix
+        return prefix + str(index)
+
+    def allocate(
+            self, name: Optional[str] = None,
+            force: bool = False) -> Tuple[str, Optional[int]]:
+        """
+        Like __call__(), but returns the name as a prefix and an index (None
+        if @force is set) to be appended to it, deferring the formatting.
+        """
         if name is None:
             name = ""
-        return self._call_impl(name, force)
-
-    def _call_impl(self, name: str, force: bool) -> str:
-        index = self._indices[name]
-        self._indices[name] += 1
+        indices = self._indices
+        index = indices[name]
+        indices[name] = index + 1
         if force:
             if index != 0:
                 raise RuntimeError()
-            return name
-        return name + str(index)
+            return name, None
+        return name, index
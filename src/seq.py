@@ -0,0 +1,37 @@
+import dataclasses
+from typing import ClassVar, Dict, List
+
+from mlir import MlirDialect, MlirOp, MlirValue, begin_dialect, end_dialect
+from mlir_printer_utils import emit_string, print_names, print_types
+from printer_base import PrinterBase
+
+
+seq = MlirDialect("seq")
+begin_dialect(seq)
+
+
+@dataclasses.dataclass(slots=True)
+class CompRegOp(MlirOp):
+    """
+    Register clocked on the rising edge of its clock. Operands are the input
+    and the clock, optionally followed by a (synchronous, active high) reset
+    and the value it resets to.
+    """
+    operands: List[MlirValue]
+    results: List[MlirValue]
+    name: str
+
+    op_name: ClassVar[str] = "compreg"
+
+    def print_op(self, printer: PrinterBase):
+        print_names(self.results, printer)
+        printer.print(" = seq.compreg ")
+        print_names(self.operands, printer)
+        printer.print(f" {{name = \"{self.name}\"}} : ")
+        print_types(self.results, printer)
+
+    def generic_attributes(self) -> Dict[str, str]:
+        return {"name": emit_string(self.name)}
+
+
+end_dialect()
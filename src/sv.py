@@ -1,11 +1,11 @@
 import dataclasses
-from typing import List, Optional
+from typing import ClassVar, Dict, List, Optional
 
 from hw import hw
 from mlir import (
     MlirDialect, MlirOp, MlirBlock, MlirValue, MlirSymbol,
     begin_dialect, end_dialect)
-from mlir_printer_utils import print_names, print_types
+from mlir_printer_utils import emit_string, print_names, print_types
 from printer_base import PrinterBase
 
 
@@ -13,22 +13,34 @@ sv = MlirDialect("sv")
 begin_dialect(sv)
 
 
-@dataclasses.dataclass
+# EventControl and ResetType values, in order of their encoding.
+_EVENT_CONTROLS = ("posedge", "negedge", "edge")
+_RESET_TYPES = ("noreset", "syncreset", "asyncreset")
+
+
+@dataclasses.dataclass(slots=True)
 class RegOp(MlirOp):
     results: List[MlirValue]
     name: str
 
+    op_name: ClassVar[str] = "reg"
+
     def print_op(self, printer: PrinterBase):
         print_names(self.results, printer)
         printer.print(f" = sv.reg {{name = \"{self.name}\"}} : ")
         print_types(self.results, printer)
 
+    def generic_attributes(self) -> Dict[str, str]:
+        return {"name": emit_string(self.name)}
+
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class ReadInOutOp(MlirOp):
     operands: List[MlirValue]
     results: List[MlirValue]
 
+    op_name: ClassVar[str] = "read_inout"
+
     def print_op(self, printer: PrinterBase):
         print_names(self.results, printer)
         printer.print(f" = sv.read_inout ")
@@ -37,10 +49,12 @@ class ReadInOutOp(MlirOp):
         print_types(self.operands, printer)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class AssignOp(MlirOp):
     operands: List[MlirValue]
 
+    op_name: ClassVar[str] = "assign"
+
     def print_op(self, printer: PrinterBase):
         printer.print(f"sv.assign ")
         print_names(self.operands, printer)
@@ -48,10 +62,12 @@ class AssignOp(MlirOp):
         print_types(self.operands[1], printer)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class PAssignOp(MlirOp):
     operands: List[MlirValue]
 
+    op_name: ClassVar[str] = "passign"
+
     def print_op(self, printer: PrinterBase):
         printer.print(f"sv.passign ")
         print_names(self.operands, printer)
@@ -59,10 +75,12 @@ class PAssignOp(MlirOp):
         print_types(self.operands[1], printer)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class BPAssignOp(MlirOp):
     operands: List[MlirValue]
 
+    op_name: ClassVar[str] = "bpassign"
+
     def print_op(self, printer: PrinterBase):
         printer.print(f"sv.bpassign ")
         print_names(self.operands, printer)
@@ -70,26 +88,29 @@ class BPAssignOp(MlirOp):
         print_types(self.operands[1], printer)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class AlwaysFFOp(MlirOp):
     operands: List[MlirValue]
     clock_edge: str
     reset_type: str = None
     reset_edge: str = None
 
+    op_name: ClassVar[str] = "alwaysff"
+    num_generic_regions: ClassVar[int] = 2
+
     def __post_init__(self):
-        self._body_block = self.new_region().new_block()
+        self.new_region().new_block()
         if self.reset_type is None:
             return
-        self._reset_block = self.new_region().new_block()
+        self.new_region().new_block()
 
     @property
     def body_block(self) -> MlirBlock:
-        return self._body_block
+        return self.regions[0].blocks[0]
 
     @property
     def reset_block(self) -> MlirBlock:
-        return self._reset_block
+        return self.regions[1].blocks[0]
 
     def print(self, printer: PrinterBase):
         printer.print(f"sv.alwaysff({self.clock_edge} ")
@@ -115,25 +136,39 @@ class AlwaysFFOp(MlirOp):
     def print_op(self, printer: PrinterBase):
         raise NotImplementedError()
 
+    def generic_attributes(self) -> Dict[str, str]:
+        clock_edge = _EVENT_CONTROLS.index(self.clock_edge)
+        attrs = {"clockEdge": f"{clock_edge} : i32"}
+        if self.reset_type is not None:
+            reset_type = _RESET_TYPES.index(self.reset_type)
+            reset_edge = _EVENT_CONTROLS.index(self.reset_edge)
+            attrs["resetStyle"] = f"{reset_type} : i32"
+            attrs["resetEdge"] = f"{reset_edge} : i32"
+        return attrs
+
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class InitialOp(MlirOp):
+    op_name: ClassVar[str] = "initial"
+
     def __post_init__(self):
-        self._block = self.new_region().new_block()
+        self.new_region().new_block()
 
     def add_operation(self, operation: MlirOp):
-        self._block.add_operation(operation)
+        self.regions[0].blocks[0].add_operation(operation)
 
     def print_op(self, printer: PrinterBase):
         printer.print("sv.initial")
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class WireOp(MlirOp):
     results: List[MlirValue]
     name: str
     sym: Optional[MlirSymbol] = None
 
+    op_name: ClassVar[str] = "wire"
+
     def print_op(self, printer: PrinterBase):
         print_names(self.results, printer)
         printer.print(" = sv.wire ")
@@ -142,12 +177,20 @@ class WireOp(MlirOp):
         printer.print(f"{{name=\"{self.name}\"}} : ")
         print_types(self.results, printer)
 
+    def generic_attributes(self) -> Dict[str, str]:
+        attrs = {"name": emit_string(self.name)}
+        if self.sym is not None:
+            attrs["inner_sym"] = emit_string(self.sym.raw_name)
+        return attrs
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(slots=True)
 class VerbatimOp(MlirOp):
     operands: List[MlirOp]
     string: str
 
+    op_name: ClassVar[str] = "verbatim"
+
     def print_op(self, printer: PrinterBase):
         # NOTE(rsetaluri): This is a hack to "double-escape" escape characters
         # like `\n`, `\t`.
@@ -161,71 +204,96 @@ class VerbatimOp(MlirOp):
             printer.print(") : ")
             print_types(self.operands, printer)
 
+    def generic_attributes(self) -> Dict[str, str]:
+        return {"string": emit_string(self.string)}
+
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class BindOp(MlirOp):
     instance: hw.InnerRefAttr
 
+    op_name: ClassVar[str] = "bind"
+
     def print_op(self, printer: PrinterBase):
         printer.print(f"sv.bind {self.instance.emit()}")
 
+    def generic_attributes(self) -> Dict[str, str]:
+        return {"instance": self.instance.emit()}
+
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class IfDefOp(MlirOp):
     cond: str
 
+    op_name: ClassVar[str] = "ifdef"
+    num_generic_regions: ClassVar[int] = 2
+
     def __post_init__(self):
-        self._then_block = self.new_region().new_block()
-        self._else_block = None
+        self.new_region().new_block()
 
     @property
     def then_block(self) -> MlirBlock:
-        return self._then_block
+        return self.regions[0].blocks[0]
+
+    @property
+    def has_else_block(self) -> bool:
+        return len(self.regions) > 1
 
     @property
     def else_block(self) -> MlirBlock:
-        if self._else_block is None:
-            self._else_block = self.new_region().new_block()
-        return self._else_block
+        """The else block, which is created on first use."""
+        if not self.has_else_block:
+            self.new_region().new_block()
+        return self.regions[1].blocks[0]
 
     def print(self, printer: PrinterBase):
         printer.print(f"sv.ifdef \"{self.cond}\" {{")
         printer.flush()
         printer.push()
-        self._then_block.print(printer)
+        self.then_block.print(printer)
         printer.pop()
         printer.print("}")
-        if self._else_block is None:
+        if not self.has_else_block:
             printer.flush()
             return
         printer.print(" else {")
         printer.flush()
         printer.push()
-        self._else_block.print(printer)
+        self.else_block.print(printer)
         printer.pop()
         printer.print_line("}")
 
     def print_op(self, printer: PrinterBase):
         raise NotImplementedError()
 
+    def generic_attributes(self) -> Dict[str, str]:
+        return {"cond": emit_string(self.cond)}
+
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class IfOp(MlirOp):
     operands: List[MlirOp]
 
+    op_name: ClassVar[str] = "if"
+    num_generic_regions: ClassVar[int] = 2
+
     def __post_init__(self):
-        self._then_block = self.new_region().new_block()
-        self._else_block = None
+        self.new_region().new_block()
 
     @property
     def then_block(self) -> MlirBlock:
-        return self._then_block
+        return self.regions[0].blocks[0]
+
+    @property
+    def has_else_block(self) -> bool:
+        return len(self.regions) > 1
 
     @property
     def else_block(self) -> MlirBlock:
-        if self._else_block is None:
-            self._else_block = self.new_region().new_block()
-        return self._else_block
+        """The else block, which is created on first use."""
+        if not self.has_else_block:
+            self.new_region().new_block()
+        return self.regions[1].blocks[0]
 
     def print(self, printer: PrinterBase):
         printer.print(f"sv.if ")
@@ -233,16 +301,16 @@ class IfOp(MlirOp):
         printer.print(" {")
         printer.flush()
         printer.push()
-        self._then_block.print(printer)
+        self.then_block.print(printer)
         printer.pop()
         printer.print("}")
-        if self._else_block is None:
+        if not self.has_else_block:
             printer.flush()
             return
         printer.print(" else {")
         printer.flush()
         printer.push()
-        self._else_block.print(printer)
+        self.else_block.print(printer)
         printer.pop()
         printer.print_line("}")
 
@@ -0,0 +1,55 @@
+import pytest
+
+from benchmark_suite import (
+    FAMILIES, MICROBENCHMARKS, Regression, compare_results, measure_point,
+    point_key, run_microbenchmarks)
+
+
+@pytest.mark.parametrize("family", list(FAMILIES))
+def test_measure_point(family):
+    params = FAMILIES[family].sweep[0]
+    metrics = measure_point(family, params, "mlir")
+    assert metrics["seconds"] > 0
+    assert metrics["peak_rss_bytes"] > 0
+    assert metrics["op_count"] > 0
+    assert metrics["output_bytes"] > 0
+
+
+
+def test_measure_point_vectorize():
+    params = FAMILIES["bitwise"].sweep[0]
+    scalar = measure_point("bitwise", params, "mlir")
+    vectorized = measure_point("bitwise", params, "mlirvec")
+    assert vectorized["op_count"] < scalar["op_count"] // 4
+
+def test_compare_results():
+    key = point_key("mlir", "width", dict(width=8))
+    assert key == "mlir/width/width=8"
+    baseline = dict(results={
+        key: dict(seconds=1.0, peak_rss_bytes=100 << 20, op_count=10,
+                  output_bytes=1000),
+    })
+    results = dict(results={
+        key: dict(seconds=1.2, peak_rss_bytes=120 << 20, op_count=10,
+                  output_bytes=999),
+        "mlir/width/width=16": dict(seconds=9.0, peak_rss_bytes=0,
+                                    op_count=0, output_bytes=0),
+    })
+    assert compare_results(results, baseline) == [
+        Regression(key, "peak_rss_bytes", 100 << 20, 120 << 20)]
+    # Increases smaller than the minimum delta are not flagged.
+    baseline["results"][key]["seconds"] = 0.001
+    results["results"][key]["seconds"] = 0.005
+    assert len(compare_results(results, baseline)) == 1
+
+
+def test_run_microbenchmarks():
+    results = run_microbenchmarks(repeats=1)
+    assert set(results) == {f"micro/{name}" for name in MICROBENCHMARKS}
+    assert all(point["seconds"] > 0 for point in results.values())
+    # Microbenchmark points only have a time, which is all that's compared.
+    key = "micro/value_names"
+    baseline = dict(results={key: dict(results[key], seconds=0.001)})
+    slower = dict(results={key: dict(results[key], seconds=1.0)})
+    assert compare_results(slower, baseline) == [
+        Regression(key, "seconds", 0.001, 1.0)]
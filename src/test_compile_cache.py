@@ -0,0 +1,52 @@
+import io
+
+import magma as m
+
+from compile_cache import CompileCache
+from compile_to_mlir import compile_to_mlir
+import examples
+
+
+def _compile(ckt: m.DefineCircuitKind, cache: CompileCache) -> str:
+    sout = io.StringIO()
+    compile_to_mlir(ckt, sout, cache=cache)
+    return sout.getvalue()
+
+
+def test_compile_cache_hit(tmp_path):
+    ckt = examples.simple_hierarchy
+    cache = CompileCache(tmp_path)
+    out = _compile(ckt, cache)
+    assert cache.stats.hits == 0
+    assert cache.stats.misses == cache.stats.stores == 2
+    cache = CompileCache(tmp_path)
+    assert _compile(ckt, cache) == out
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 0
+    with open(f"golds/{ckt.name}.mlir") as gold:
+        assert out == gold.read()
+
+
+def test_compile_cache_eviction(tmp_path):
+    cache = CompileCache(tmp_path, max_bytes=1000)
+    for i in range(10):
+        cache.put(str(i), "x" * 300)
+    assert cache.stats.evictions == 7
+    assert cache.get("0") is None
+    assert cache.get("9") == "x" * 300
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+
+
+def test_compile_cache_size(tmp_path):
+    # Sizes are in bytes (as written), and replacing an entry does not grow
+    # the cache.
+    cache = CompileCache(tmp_path, max_bytes=1000)
+    for _ in range(10):
+        cache.put("0", "\u00e9" * 300)
+    cache.put("1", "x" * 400)
+    assert cache.stats.evictions == 0
+    cache.put("2", "x")
+    assert cache.stats.evictions == 1
+    assert cache.get("0") is None
+    assert cache.get("1") == "x" * 400
@@ -1,8 +1,71 @@
+import gc
+import io
+import weakref
+
+import magma as m
 import pytest
 
-from test_utils import get_local_examples, run_test_compile_to_mlir
+import examples
+import hardware_module
+from compile_to_mlir import compile_to_mlir
+from hw import hw
+from printer_base import PrinterBase
+from test_utils import get_local_examples, run_test_local_example
+from translation_unit import TranslationUnit
+
+
+def _compile_to_text(ckt, **kwargs) -> str:
+    m.passes.clock.WireClockPass(ckt).run()
+    sout = io.StringIO()
+    compile_to_mlir(ckt, sout, **kwargs)
+    return sout.getvalue()
+
+
+@pytest.mark.parametrize("ckt", get_local_examples())
+def test_compile_to_mlir(ckt, request):
+    run_test_local_example(ckt, request)
+
+
+@pytest.mark.parametrize(
+    "ckt",
+    (
+        examples.simple_hierarchy,
+        examples.simple_duplicate_modules,
+        examples.simple_bind,
+        examples.complex_bind,
+        examples.simple_compile_guard,
+        examples.complex_lut,
+    ),
+    ids=lambda ckt: ckt.name,
+)
+def test_compile_to_mlir_jobs(ckt):
+    # Parallel output must be byte-identical to (and in the order of) the
+    # serial output.
+    assert _compile_to_text(ckt, jobs=2) == _compile_to_text(ckt)
 
 
 @pytest.mark.parametrize("ckt", get_local_examples())
-def test_compile_to_mlir(ckt):
-    run_test_compile_to_mlir(ckt)
+def test_compile_to_mlir_stream(ckt):
+    assert _compile_to_text(ckt, stream=True) == _compile_to_text(ckt)
+
+
+def test_stream_releases_modules(monkeypatch):
+    ckt = examples.simple_hierarchy
+    graphs = []
+
+    def build_magma_graph(*args, **kwargs):
+        graph = build(*args, **kwargs)
+        graphs.append(weakref.ref(graph))
+        return graph
+
+    build = hardware_module.build_magma_graph
+    monkeypatch.setattr(
+        hardware_module, "build_magma_graph", build_magma_graph)
+    translation_unit = TranslationUnit(ckt)
+    translation_unit.compile(printer=PrinterBase(sout=io.StringIO()))
+    gc.collect()
+    assert graphs and all(graph() is None for graph in graphs)
+    for defn in (examples.simple_comb, ckt):
+        released = translation_unit.get_hardware_module(defn)
+        assert released._value_map == {}
+        assert isinstance(released.hw_module, hw.ModuleExternOp)
@@ -1,8 +1,11 @@
 import pytest
 
-from test_utils import get_magma_examples, run_test_compile_to_mlir
+from test_utils import get_magma_example_modules, run_test_magma_example_module
 
 
-@pytest.mark.parametrize("ckt", get_magma_examples())
-def test_compile_to_mlir(ckt):
-    run_test_compile_to_mlir(ckt)
+pytest.importorskip("magma_examples")
+
+
+@pytest.mark.parametrize("module_name", get_magma_example_modules())
+def test_compile_to_mlir(module_name, request):
+    run_test_magma_example_module(module_name, request)
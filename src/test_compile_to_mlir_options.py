@@ -0,0 +1,75 @@
+import pytest
+
+import examples
+from compile_options import CompileOptions
+from test_utils import run_test_compile_to_mlir
+
+
+_SLICE_ARRAYS = CompileOptions(slice_arrays=True)
+_COLLAPSE_PASSTHROUGHS = CompileOptions(collapse_passthroughs=True)
+_VECTORIZE_BITWISE = CompileOptions(vectorize_bitwise=True)
+_CSE_DCE = CompileOptions(passes=("cse", "dce"))
+_DEDUP_MODULES = CompileOptions(dedup_modules=True)
+_GROUP_REGISTERS = CompileOptions(group_registers=True)
+_SEQ_REGISTERS = CompileOptions(seq_registers=True)
+_COMPACT_LUTS = CompileOptions(compact_luts=True)
+_PACK_CONSTANTS = CompileOptions(pack_constants=True)
+
+# Each entry compiles an example with non-default options and checks the
+# output against golds/<example>.<suffix>.mlir.
+_OPTION_EXAMPLES = (
+    ("slice_arrays", _SLICE_ARRAYS, examples.simple_aggregates_bits),
+    ("slice_arrays", _SLICE_ARRAYS, examples.simple_aggregates_array),
+    ("slice_arrays", _SLICE_ARRAYS, examples.simple_aggregates_nested_array),
+    ("slice_arrays", _SLICE_ARRAYS, examples.complex_wire),
+    (
+        "collapse_passthroughs",
+        _COLLAPSE_PASSTHROUGHS,
+        examples.complex_aggregates_reshape
+    ),
+    (
+        "collapse_passthroughs",
+        _COLLAPSE_PASSTHROUGHS,
+        examples.simple_length_one_bits
+    ),
+    ("collapse_passthroughs", _COLLAPSE_PASSTHROUGHS, examples.complex_wire),
+    (
+        "vectorize_bitwise",
+        _VECTORIZE_BITWISE,
+        examples.complex_aggregates_nested_array
+    ),
+    ("vectorize_bitwise", _VECTORIZE_BITWISE, examples.complex_bitwise),
+    ("cse_dce", _CSE_DCE, examples.complex_register_wrapper),
+    ("cse_dce", _CSE_DCE, examples.complex_mixed_direction_ports),
+    ("cse_dce", _CSE_DCE, examples.complex_lut),
+    ("dedup_modules", _DEDUP_MODULES, examples.simple_duplicate_modules),
+    ("dedup_modules", _DEDUP_MODULES, examples.simple_compile_guard),
+    (
+        "group_registers",
+        _GROUP_REGISTERS,
+        examples.complex_register_wrapper
+    ),
+    (
+        "seq_registers",
+        _SEQ_REGISTERS,
+        examples.sync_reset_register_wrapper
+    ),
+    ("compact_luts", _COMPACT_LUTS, examples.simple_lut),
+    ("compact_luts", _COMPACT_LUTS, examples.complex_lut),
+    (
+        "pack_constants",
+        _PACK_CONSTANTS,
+        examples.complex_register_wrapper
+    ),
+    ("pack_constants", _PACK_CONSTANTS, examples.simple_length_one_array),
+)
+
+
+@pytest.mark.parametrize(
+    "suffix,options,ckt",
+    _OPTION_EXAMPLES,
+    ids=[f"{ckt.name}-{suffix}" for suffix, _, ckt in _OPTION_EXAMPLES]
+)
+def test_compile_to_mlir_with_options(suffix, options, ckt):
+    run_test_compile_to_mlir(
+        ckt, options=options, gold_name=f"{ckt.name}.{suffix}")
@@ -0,0 +1,43 @@
+import random
+import re
+
+from test_utils import line_hash_diff
+
+
+def _apply_diff(a, diff):
+    """Applies unified @diff (with full context) to lines @a."""
+    out = []
+    pos = 0
+    for line in diff[2:]:
+        match = re.match(r"@@ -(\d+)", line)
+        if match:
+            start = int(match.group(1)) - 1
+            start = max(start, 0) if a else 0
+            out += a[pos:start]
+            pos = start
+            continue
+        if line[0] in " -":
+            assert a[pos] == line[1:]
+            pos += 1
+        if line[0] in " +":
+            out.append(line[1:])
+    return out + a[pos:]
+
+
+def test_line_hash_diff():
+    rng = random.Random(0)
+    for _ in range(200):
+        a = [f"{rng.randrange(5)}\n" for _ in range(rng.randrange(30))]
+        b = list(a)
+        for _ in range(rng.randrange(4)):
+            index = rng.randrange(len(b) + 1)
+            if b and rng.random() < 0.5:
+                del b[index:index + rng.randrange(1, 4)]
+            else:
+                b[index:index] = ["new\n"] * rng.randrange(1, 4)
+        diff = list(line_hash_diff(
+            [line.encode() for line in a], [line.encode() for line in b]))
+        if a == b:
+            assert not diff
+            continue
+        assert _apply_diff(a, diff) == b
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from graph_lib import (
+    Graph, Loop, find_loops, simple_cycles, topological_sort, _sort_cycle)
+
+
+def test_adjacency_order():
+    g = Graph()
+    g.add_edge("a", "c", 0, "x")
+    g.add_edge("b", "c", 1, "y")
+    g.add_edge("a", "c", 2, "z")
+    g.add_edge("c", "d", 3, "x")
+    assert list(g.predecessors("c")) == ["a", "b"]
+    # Edges are grouped by source, in order of first appearance.
+    assert list(g.in_edges("c", data=True)) == [
+        ("a", "c", 0, "x"), ("a", "c", 2, "z"), ("b", "c", 1, "y")]
+    assert list(g.successors("a")) == ["c"]
+    assert list(g.predecessors("z")) == []
+    g.add_edge("d", "c", 4, "w")
+    assert list(g.predecessors("c")) == ["a", "b", "d"]
+
+
+def test_topological_sort():
+    g = Graph()
+    for u, v in (("c", "d"), ("a", "b"), ("b", "c"), ("a", "c")):
+        g.add_edge(u, v)
+    assert list(topological_sort(g)) == ["a", "b", "c", "d"]
+    g.add_edge("d", "a")
+    with pytest.raises(ValueError):
+        list(topological_sort(g))
+
+
+def test_simple_cycles():
+    g = Graph()
+    for u, v in ((0, 1), (1, 2), (2, 0), (1, 0), (2, 2), (3, 0)):
+        g.add_edge(u, v)
+    cycles = sorted(simple_cycles(g))
+    assert cycles == [[0, 1], [0, 1, 2], [2]]
+
+
+def test_find_loops():
+    g = Graph()
+    edges = (
+        ("a", "b"), ("b", "c"), ("c", "d"), ("d", "a"), ("c", "a"),
+        ("e", "e"), ("d", "f"), ("f", "g"), ("g", "r"), ("r", "f"))
+    for u, v in edges:
+        g.add_edge(u, v)
+    assert find_loops(g) == [
+        Loop(["a", "b", "c", "d"], ["a", "b", "c"]),
+        Loop(["e"], ["e"]),
+        Loop(["f", "g", "r"], ["f", "g", "r"]),
+    ]
+    # Loops through nodes which break them (e.g. registers) are ignored.
+    loops = find_loops(g, lambda node: node in ("c", "r"))
+    assert loops == [Loop(["e"], ["e"])]
+
+
+def test_find_loops_deep_chain():
+    depth = 100000
+    g = Graph()
+    for i in range(depth):
+        g.add_edge(i, i + 1)
+    assert find_loops(g) == []
+    g.add_edge(depth, 0)
+    (loop,) = find_loops(g)
+    assert loop.witness == list(range(depth + 1))
+
+
+def test_matches_networkx():
+    nx = pytest.importorskip("networkx")
+    rng = random.Random(0)
+    for _ in range(100):
+        g = Graph()
+        nx_graph = nx.MultiDiGraph()
+        num_nodes = rng.randint(1, 10)
+        for info in range(rng.randint(0, 30)):
+            u, v = rng.randrange(num_nodes), rng.randrange(num_nodes)
+            g.add_edge(u, v, info, -info)
+            nx_graph.add_edge(u, v, info=info)
+        for node in nx_graph:
+            assert list(g.predecessors(node)) == list(
+                nx_graph.predecessors(node))
+            expected = [
+                (u, v, data["info"], -data["info"])
+                for u, v, data in nx_graph.in_edges(node, data=True)
+            ]
+            assert list(g.in_edges(node, data=True)) == expected
+        expected = sorted(map(_sort_cycle, nx.simple_cycles(nx_graph)))
+        assert sorted(simple_cycles(g)) == expected
+        loops = find_loops(g)
+        expected = [
+            sorted(c) for c in nx.strongly_connected_components(nx_graph)
+            if len(c) > 1 or nx_graph.has_edge(*c, *c)
+        ]
+        assert sorted(sorted(loop.component) for loop in loops) == sorted(
+            expected)
+        for loop in loops:
+            start = loop.witness[0]
+            shortest = min(
+                len(cycle) for cycle in nx.simple_cycles(nx_graph)
+                if start in cycle)
+            assert len(loop.witness) == shortest
@@ -0,0 +1,23 @@
+from builtin import builtin
+from comb import comb
+from hw import hw
+from mlir import MlirValue
+from sv import sv
+
+
+def test_slots():
+    T = builtin.IntegerType(8)
+    assert T.emit() == "i8"
+    value = MlirValue(T, "x")
+    ops = (
+        comb.BaseOp(operands=[value], results=[value], op_name="and"),
+        hw.ConstantOp(value=1, results=[value]),
+        sv.IfOp(operands=[value]),
+    )
+    # Neither ops (including their fields) nor types have a __dict__.
+    for obj in ops + (T, value):
+        assert not hasattr(obj, "__dict__"), obj
+    if_op = ops[2]
+    assert len(if_op.regions) == 1
+    assert if_op.else_block is if_op.else_block
+    assert len(if_op.regions) == 2
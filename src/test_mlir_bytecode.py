@@ -0,0 +1,278 @@
+import io
+from typing import List, Optional
+
+import magma as m
+import pytest
+
+import examples
+from compile_to_mlir import compile_to_mlir
+from mlir_bytecode import encode_varint, is_bytecode
+from mlir_printer_utils import emit_string
+from passes import walk_ops
+from translation_unit import TranslationUnit
+
+
+class _Decoder:
+    """
+    Minimal reader of the bytecode written by mlir_bytecode, following MLIR's
+    own reader, which renders the IR in a generic-like form. Values are named
+    by their number in the enclosing scope.
+    """
+    def __init__(self, data: bytes):
+        self._data = data
+        self._pos = 0
+        assert self._bytes(4) == b"ML\xefR"
+        self.version = self._varint()
+        self.producer = self._cstring()
+        sections = {}
+        while self._pos < len(data):
+            section_id = self._byte()
+            length = self._varint()
+            assert section_id not in sections
+            sections[section_id] = self._bytes(length)
+        assert sorted(sections) == [0, 1, 2, 3, 4]
+        self._read_strings(sections[0])
+        self._read_dialects(sections[1])
+        self._read_attrs_and_types(sections[3], sections[2])
+        self._ir = sections[4]
+        self.num_ops = 0
+
+    def _reset(self, data: bytes):
+        self._data, self._pos = data, 0
+
+    def _at_end(self) -> bool:
+        return self._pos == len(self._data)
+
+    def _byte(self) -> int:
+        self._pos += 1
+        return self._data[self._pos - 1]
+
+    def _bytes(self, n: int) -> bytes:
+        self._pos += n
+        assert self._pos <= len(self._data)
+        return self._data[self._pos - n:self._pos]
+
+    def _varint(self) -> int:
+        first = self._data[self._pos]
+        if first == 0:
+            self._pos += 1
+            return int.from_bytes(self._bytes(8), "little")
+        num_bytes = (first & -first).bit_length()
+        return int.from_bytes(self._bytes(num_bytes), "little") >> num_bytes
+
+    def _cstring(self) -> str:
+        end = self._data.index(b"\x00", self._pos)
+        s = self._data[self._pos:end].decode()
+        self._pos = end + 1
+        return s
+
+    def _read_strings(self, data: bytes):
+        self._reset(data)
+        lengths = [self._varint() for _ in range(self._varint())]
+        self.strings = [self._cstring() for _ in lengths]
+        assert lengths[::-1] == [len(s.encode()) + 1 for s in self.strings]
+        assert self._at_end()
+
+    def _read_groups(self, read_entry, count: Optional[int] = None):
+        entries = []
+        while not self._at_end() if count is None else len(entries) < count:
+            dialect = self.dialects[self._varint()]
+            entries += [read_entry(dialect) for _ in range(self._varint())]
+        return entries
+
+    def _read_dialects(self, data: bytes):
+        self._reset(data)
+        num_dialects = self._varint()
+        self.dialects = [
+            self.strings[self._varint()] for _ in range(num_dialects)]
+        self.op_names = self._read_groups(
+            lambda dialect: f"{dialect}.{self.strings[self._varint()]}")
+
+    def _read_attrs_and_types(self, offsets: bytes, data: bytes):
+        self._reset(offsets)
+        num_attrs, num_types = self._varint(), self._varint()
+        sizes = []
+
+        def read_entry(dialect):
+            size = self._varint()
+            assert not size & 1  # custom encoding
+            sizes.append(size >> 1)
+
+        self._read_groups(read_entry, num_attrs)
+        self._read_groups(read_entry, num_types)
+        assert self._at_end()
+        entries, pos = [], 0
+        for size in sizes:
+            assert data[pos + size - 1] == 0
+            entries.append(data[pos:pos + size - 1].decode())
+            pos += size
+        assert pos == len(data)
+        self.attrs, self.types = entries[:num_attrs], entries[num_attrs:]
+
+    def decode(self) -> List[str]:
+        self._reset(self._ir)
+        num_ops = self._varint()
+        assert num_ops == 1 << 1
+        lines = self._op([[]], "")
+        assert self._at_end()
+        return lines
+
+    def _op(self, scopes: List[List[Optional[str]]], indent: str) -> List[str]:
+        self.num_ops += 1
+        name = self.op_names[self._varint()]
+        mask = self._byte()
+        assert self.attrs[self._varint()] == "loc(unknown)"
+        attrs = self.attrs[self._varint()] if mask & 0x01 else ""
+        result_types = []
+        if mask & 0x02:
+            result_types = [
+                self.types[self._varint()] for _ in range(self._varint())]
+        operands = []
+        if mask & 0x04:
+            values = scopes[-1]
+            for _ in range(self._varint()):
+                index = self._varint()
+                assert index < len(values)
+                operands.append(index)
+        # Results are numbered in order by the enclosing region.
+        values = scopes[-1]
+        results = []
+        for t in result_types:
+            index = values.index(None)
+            values[index] = t
+            results.append(f"%{index}")
+        text = f"{', '.join(results)} = " if results else ""
+        text += f"\"{name}\"({', '.join(f'%{i}' for i in operands)})"
+        if attrs:
+            text += f" {attrs}"
+        if result_types:
+            text += f" -> ({', '.join(result_types)})"
+        if not mask & 0x10:
+            return [indent + text]
+        num_regions = self._varint()
+        if num_regions & 1:
+            scopes = scopes + [[]]
+        lines = [indent + text + " ({"]
+        for i in range(num_regions >> 1):
+            if i:
+                lines.append(indent + "}, {")
+            lines += self._region(scopes, indent + "  ")
+        lines.append(indent + "})")
+        return lines
+
+    def _region(
+            self, scopes: List[List[Optional[str]]], indent: str) -> List[str]:
+        num_blocks = self._varint()
+        if not num_blocks:
+            return []
+        values = scopes[-1]
+        base = len(values)
+        values += [None] * self._varint()
+        lines = []
+        for _ in range(num_blocks):
+            encoding = self._varint()
+            arguments = []
+            if encoding & 1:
+                for _ in range(self._varint()):
+                    t = self.types[self._varint()]
+                    assert self.attrs[self._varint()] == "loc(unknown)"
+                    index = values.index(None)
+                    values[index] = t
+                    arguments.append(f"%{index}: {t}")
+            lines.append(f"{indent}^bb({', '.join(arguments)}):")
+            for _ in range(encoding >> 1):
+                lines += self._op(scopes, indent + "  ")
+        # Every value of the region must have been defined.
+        assert None not in values[base:]
+        del values[base:]
+        return lines
+
+
+def _compile_to_bytecode(ckt, **kwargs) -> bytes:
+    sout = io.BytesIO()
+    compile_to_mlir(ckt, sout, bytecode=True, **kwargs)
+    return sout.getvalue()
+
+
+def test_encode_varint():
+    assert encode_varint(0) == b"\x01"
+    assert encode_varint(127) == b"\xff"
+    assert encode_varint(128) == bytes((0b00000010, 0b00000010))
+    assert encode_varint(1 << 56) == b"\x00" + (1 << 56).to_bytes(8, "little")
+    for value in (1000, 1 << 20, (1 << 56) - 1):
+        decoder = _Decoder.__new__(_Decoder)
+        decoder._reset(encode_varint(value))
+        assert decoder._varint() == value
+        assert decoder._at_end()
+
+
+def test_emit_string():
+    assert emit_string("abc") == "\"abc\""
+    assert emit_string("a\"b\\c\n\u00e9") == "\"a\\22b\\\\c\\0A\\C3\\A9\""
+
+
+def test_bytecode():
+    data = _compile_to_bytecode(examples.simple_hierarchy)
+    assert is_bytecode(data)
+    decoder = _Decoder(data)
+    assert decoder.version == 0
+    assert decoder.dialects == ["builtin", "hw", "comb"]
+    assert decoder.types == ["i16"]
+    assert decoder.decode() == [
+        "\"builtin.module\"() ({",
+        "  ^bb():",
+        "    \"hw.module\"() {argNames = [\"a\", \"b\", \"c\"], "
+        "function_type = (i16, i16, i16) -> (i16, i16), parameters = [], "
+        "resultNames = [\"y\", \"z\"], sym_name = \"simple_comb\"} ({",
+        "      ^bb(%0: i16, %1: i16, %2: i16):",
+        "        %3 = \"hw.constant\"() {value = -1 : i16} -> (i16)",
+        "        %4 = \"comb.xor\"(%3, %0) -> (i16)",
+        "        %5 = \"comb.or\"(%0, %4) -> (i16)",
+        "        %6 = \"comb.or\"(%5, %1) -> (i16)",
+        "        \"hw.output\"(%6, %6)",
+        "    })",
+        "    \"hw.module\"() {argNames = [\"a\", \"b\", \"c\"], "
+        "function_type = (i16, i16, i16) -> (i16, i16), parameters = [], "
+        "resultNames = [\"y\", \"z\"], sym_name = \"simple_hierarchy\"} ({",
+        "      ^bb(%0: i16, %1: i16, %2: i16):",
+        "        %3, %4 = \"hw.instance\"(%0, %1, %2) "
+        "{argNames = [\"a\", \"b\", \"c\"], "
+        "instanceName = \"simple_comb_inst0\", "
+        "moduleName = @simple_comb, parameters = [], "
+        "resultNames = [\"y\", \"z\"]} -> (i16, i16)",
+        "        \"hw.output\"(%3, %4)",
+        "    })",
+        "})",
+    ]
+
+
+@pytest.mark.parametrize(
+    "ckt",
+    (
+        examples.complex_register_wrapper,
+        examples.complex_aggregates_nested_array,
+        examples.simple_aggregates_tuple,
+        examples.complex_wire,
+        examples.simple_lut,
+    ),
+    ids=lambda ckt: ckt.name,
+)
+def test_bytecode_examples(ckt):
+    m.passes.clock.WireClockPass(ckt).run()
+    translation_unit = TranslationUnit(ckt)
+    translation_unit.compile()
+    num_ops = 1 + sum(1 for _ in walk_ops(translation_unit.mlir_module))
+    decoder = _Decoder(_compile_to_bytecode(ckt))
+    lines = decoder.decode()
+    assert decoder.num_ops == num_ops
+    # Each distinct attribute dictionary and type is only stored once.
+    assert len(set(decoder.attrs)) == len(decoder.attrs)
+    assert len(set(decoder.types)) == len(decoder.types)
+    assert len(set(decoder.strings)) == len(decoder.strings)
+    assert any("\"sv.alwaysff\"" in line for line in lines) == (
+        ckt is examples.complex_register_wrapper)
+
+
+def test_bytecode_unsupported():
+    with pytest.raises(ValueError):
+        _compile_to_bytecode(examples.simple_comb, stream=True)
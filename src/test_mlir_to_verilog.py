@@ -0,0 +1,140 @@
+import io
+import subprocess
+
+import pytest
+
+from mlir_to_verilog import (
+    _make_batch_input, _run_batch, _split_batch_output, _subprocess_run,
+    _open_subprocess_pipe)
+
+
+def test_make_batch_input():
+    batch = _make_batch_input([b"hw.module @a() -> () {\n}", b"x\n"], 3)
+    chunks = batch.split(b"// -----\n")
+    assert chunks == [
+        b"hw.module @a() -> () {\n}\n",
+        b"hw.module @mlir_to_verilog_batch_end_3() -> () {\n}\n",
+        b"x\n",
+        b"hw.module @mlir_to_verilog_batch_end_4() -> () {\n}\n",
+    ]
+
+
+def test_split_batch_output():
+    output = (
+        b"module a(\t// <stdin> split at line #1:1:1\n"
+        b"  input I);\n"
+        b"endmodule\n"
+        b"\n"
+        b"\n"
+        b"// ----- 8< ----- FILE \"bindfile\" ----- 8< -----\n"
+        b"\n"
+        b"bind a b b_inst ();\n"
+        b"module mlir_to_verilog_batch_end_3("
+        b"\t// <stdin> split at line #3:1:1\n"
+        b");\n"
+        b"endmodule\n"
+        b"\n"
+        b"module mlir_to_verilog_batch_end_4("
+        b"\t// <stdin> split at line #6:1:1\n"
+        b");\n"
+        b"endmodule\n"
+        b"\n"
+    )
+    a, b, c = _split_batch_output(output, 3, 3)
+    assert a == (
+        b"module a(\t// <stdin>:1:1\n"
+        b"  input I);\n"
+        b"endmodule\n"
+        b"\n"
+        b"\n"
+        b"// ----- 8< ----- FILE \"bindfile\" ----- 8< -----\n"
+        b"\n"
+        b"bind a b b_inst ();\n"
+    )
+    # Empty output (e.g. circt-opt failed on this input, and carried on).
+    assert b is None
+    # No sentinel (e.g. circt-opt failed on this input).
+    assert c is None
+
+
+def test_split_batch_output_out_of_order():
+    output = (
+        b"module mlir_to_verilog_batch_end_1();\nendmodule\n"
+        b"module mlir_to_verilog_batch_end_1();\nendmodule\n"
+    )
+    assert _split_batch_output(output, 0, 2) == [None, None]
+
+
+def test_subprocess_run_large_output():
+    # Larger than any pipe buffer, so that this deadlocks unless the input is
+    # written while the output is drained.
+    data = b"0123456789abcdef" * (1 << 20)
+    out = io.BytesIO()
+    assert _subprocess_run(["cat"], io.BytesIO(data), out) == 0
+    assert out.getvalue() == data
+    out = io.StringIO()
+    _subprocess_run(["cat"], io.StringIO(data.decode()), out)
+    assert out.getvalue() == data.decode()
+
+
+def test_subprocess_pipe():
+    out = io.BytesIO()
+    with _open_subprocess_pipe(["cat"], out) as sin:
+        for i in range(100000):
+            sin.write(f"line {i}\n")
+    assert out.getvalue() == b"".join(
+        f"line {i}\n".encode() for i in range(100000))
+
+
+def test_subprocess_pipe_binary():
+    data = bytes(range(256)) * 1000
+    out = io.BytesIO()
+    with _open_subprocess_pipe(["cat"], out, binary=True) as sin:
+        sin.write(data)
+    assert out.getvalue() == data
+
+
+def test_run_batch_bytecode(tmp_path):
+    # The command logs the size of batched inputs (and produces no output for
+    # them, so every input is then re-run on its own, through cat).
+    log = tmp_path / "log"
+    script = f"if [ \"$1\" ]; then wc -c >> {log}; else cat; fi"
+    bytecode = b"ML\xefR\x01magma-mlir\x00"
+    text = b"hw.module @a() -> () {\n}\n"
+    args = ["sh", "-c", script, "-"]
+    assert _run_batch(args, [text, bytecode], 0) == [text, bytecode]
+    # Only the text input was batched.
+    assert int(log.read_text()) == len(_make_batch_input([text], 0))
+
+
+def test_subprocess_failure():
+    # Failures are raised rather than returning truncated (here, empty) output.
+    with pytest.raises(subprocess.CalledProcessError):
+        _subprocess_run(["false"], io.BytesIO(b"x" * (1 << 20)), io.BytesIO())
+    with pytest.raises(subprocess.CalledProcessError):
+        with _open_subprocess_pipe(["false"], io.BytesIO()) as sin:
+            for i in range(100000):
+                sin.write(f"line {i}\n")
+    with pytest.raises(subprocess.CalledProcessError):
+        _run_batch(["false"], [b"hw.module @a() -> () {\n}\n"], 0)
+
+
+def test_run_batch_failure(tmp_path):
+    # The batched run outputs (non-empty) verilog for every input, but fails,
+    # as does the run of the invalid input on its own.
+    batch_output = tmp_path / "batch"
+    batch_output.write_bytes(b"".join(
+        b"module a();\nendmodule\n"
+        b"module mlir_to_verilog_batch_end_%d();\nendmodule\n" % i
+        for i in range(3)))
+    log = tmp_path / "log"
+    script = (
+        f"if [ \"$1\" ]; then cat {batch_output}; exit 1; fi; "
+        f"tee -a {log} | grep -v invalid")
+    valid = b"hw.module @a() -> () {\n}\n"
+    invalid = b"invalid\n"
+    args = ["sh", "-c", script, "-"]
+    with pytest.raises(subprocess.CalledProcessError):
+        _run_batch(args, [valid, invalid, valid], 0)
+    # Each input was re-run on its own, up to the invalid one.
+    assert log.read_bytes() == valid + invalid
@@ -0,0 +1,18 @@
+import pickle
+
+from builtin import builtin
+from hw import hw
+
+
+def test_types_are_interned():
+    i8 = builtin.IntegerType(8)
+    assert builtin.IntegerType(n=8) is i8
+    assert builtin.IntegerType(16) is not i8
+    T = hw.StructType((("x", hw.ArrayType((4,), i8)), ("y", i8)))
+    U = hw.StructType((("x", hw.ArrayType((4,), i8)), ("y", i8)))
+    assert T is U
+    assert {T: 0}[U] == 0
+    assert T.emit() == "!hw.struct<x: !hw.array<4xi8>, y: i8>"
+    assert T.emit() is U.emit()
+    assert hw.InOutType(T) is hw.InOutType(U)
+    assert pickle.loads(pickle.dumps(T)) is T
@@ -0,0 +1,88 @@
+import io
+
+import magma as m
+import pytest
+
+import examples
+from compile_cache import CompileCache
+from compile_options import CompileOptions
+from compile_to_mlir import compile_to_mlir
+from module_dedup import structural_hash
+from translation_unit import TranslationUnit
+
+
+_DEDUP_MODULES = CompileOptions(dedup_modules=True)
+
+
+def _compile(ckt, **kwargs):
+    translation_unit = TranslationUnit(ckt, options=_DEDUP_MODULES)
+    translation_unit.compile(**kwargs)
+    return translation_unit
+
+
+def test_structural_hash():
+    translation_unit = TranslationUnit(examples.simple_duplicate_modules)
+    translation_unit.compile()
+    hashes = {
+        op.name.raw_name: structural_hash(op)
+        for op in translation_unit.mlir_module.block.operations
+    }
+    # Leaves only differ in their symbols, but the middle modules instantiate
+    # different leaves (until these are merged).
+    assert hashes["duplicate_leaf0"] == hashes["duplicate_leaf1"]
+    assert hashes["duplicate_leaf0"] == hashes["duplicate_leaf2"]
+    assert hashes["duplicate_middle0"] != hashes["duplicate_middle1"]
+    assert hashes["duplicate_leaf0"] != hashes["duplicate_middle0"]
+
+
+def test_dedup_modules_mapping():
+    translation_unit = _compile(examples.simple_duplicate_modules)
+    assert dict(translation_unit.deduplicator.mapping) == {
+        "duplicate_leaf2": "duplicate_leaf1",
+        "duplicate_leaf0": "duplicate_leaf1",
+        "duplicate_middle0": "duplicate_middle1",
+    }
+    names = [
+        op.name.raw_name
+        for op in translation_unit.mlir_module.block.operations
+    ]
+    assert names == [
+        "duplicate_leaf1", "duplicate_middle1", "simple_duplicate_modules"]
+    report = io.StringIO()
+    compile_to_mlir(
+        examples.simple_duplicate_modules, io.StringIO(),
+        options=_DEDUP_MODULES, dedup_report_out=report)
+    assert report.getvalue().splitlines()[1:] == [
+        f"{'duplicate_leaf2':<40} duplicate_leaf1",
+        f"{'duplicate_leaf0':<40} duplicate_leaf1",
+        f"{'duplicate_middle0':<40} duplicate_middle1",
+        "3 module(s) replaced",
+    ]
+
+
+@pytest.mark.parametrize(
+    "ckt",
+    (
+        examples.simple_duplicate_modules,
+        examples.simple_compile_guard,
+        examples.complex_bind,
+    ),
+    ids=lambda ckt: ckt.name,
+)
+def test_dedup_modules_stream(ckt):
+    m.passes.clock.WireClockPass(ckt).run()
+    expected = io.StringIO()
+    compile_to_mlir(ckt, expected, options=_DEDUP_MODULES)
+    streamed = io.StringIO()
+    compile_to_mlir(ckt, streamed, stream=True, options=_DEDUP_MODULES)
+    assert streamed.getvalue() == expected.getvalue()
+
+
+def test_dedup_modules_unsupported(tmp_path):
+    ckt = examples.simple_duplicate_modules
+    with pytest.raises(ValueError):
+        compile_to_mlir(
+            ckt, io.StringIO(), cache=CompileCache(tmp_path),
+            options=_DEDUP_MODULES)
+    with pytest.raises(ValueError):
+        compile_to_mlir(ckt, io.StringIO(), jobs=2, options=_DEDUP_MODULES)
@@ -0,0 +1,255 @@
+import io
+import random
+
+import magma as m
+import pytest
+
+from benchmark_suite import make_lut_design, make_register_design
+from build_magma_graph import build_magma_graph
+from compile_options import CompileOptions
+from compile_to_mlir import compile_to_mlir
+from graph_lib import Graph
+from hardware_module import ModuleVisitor, pack_constant
+from hw import hw
+from passes import walk_ops
+from seq import seq
+from sv import sv
+from translation_unit import TranslationUnit
+
+
+class _RecordingVisitor(ModuleVisitor):
+    def __init__(self, graph: Graph):
+        super().__init__(graph, None)
+        self.order = []
+
+    def _emit(self, module):
+        self.order.append(module)
+
+
+def _recursive_order(graph: Graph, root):
+    order = []
+    visited = set()
+
+    def _visit(node):
+        visited.add(node)
+        for predecessor in graph.predecessors(node):
+            if predecessor not in visited:
+                _visit(predecessor)
+        order.append(node)
+
+    _visit(root)
+    return order
+
+
+def test_visit_order_matches_recursive():
+    rng = random.Random(0)
+    for _ in range(20):
+        graph = Graph()
+        num_nodes = 50
+        graph.add_node(num_nodes - 1)
+        for dst in range(num_nodes):
+            for src in rng.sample(range(dst), min(dst, 3)):
+                graph.add_edge(src, dst)
+        visitor = _RecordingVisitor(graph)
+        visitor.visit(num_nodes - 1)
+        assert visitor.order == _recursive_order(graph, num_nodes - 1)
+
+
+def test_visit_deep_chain():
+    depth = 100000
+    graph = Graph()
+    for i in range(depth):
+        graph.add_edge(i, i + 1)
+    visitor = _RecordingVisitor(graph)
+    visitor.visit(depth)
+    assert visitor.order == list(range(depth + 1))
+
+
+def test_check_loops():
+
+    class _Loop(m.Circuit):
+        io = m.IO(I=m.In(m.Bits[4]), O=m.Out(m.Bits[4]))
+        x = m.Bits[4](name="x")
+        y = x ^ io.I
+        x @= ~y
+        io.O @= y
+
+    class _RegisterLoop(m.Circuit):
+        io = m.IO(I=m.In(m.Bits[4]), O=m.Out(m.Bits[4])) + m.ClockIO()
+        reg = m.Register(m.Bits[4])()
+        reg.I @= reg.O ^ io.I
+        io.O @= reg.O
+
+    visitor = _RecordingVisitor(build_magma_graph(_Loop))
+    with pytest.raises(ValueError) as e:
+        visitor.visit(_Loop)
+    assert str(e.value) == (
+        "Found 1 combinational loop(s), e.g.: magma_Bits_4_xor_inst0 -> "
+        "magma_Bits_4_not_inst0 -> magma_Bits_4_xor_inst0")
+    assert visitor.order == []
+    m.passes.clock.WireClockPass(_RegisterLoop).run()
+    visitor = _RecordingVisitor(build_magma_graph(_RegisterLoop))
+    visitor.visit(_RegisterLoop)
+    assert visitor.order[-1] is _RegisterLoop
+
+
+
+def test_check_loops_options():
+
+    class _Comb(m.Circuit):
+        io = m.IO(I=m.In(m.Bits[4]), O=m.Out(m.Bits[4]))
+        io.O @= ~io.I
+
+    class _CombLoop(m.Circuit):
+        io = m.IO(I=m.In(m.Bits[4]), O=m.Out(m.Bits[4]))
+        x = m.Bits[4](name="x")
+        y = x ^ io.I
+        x @= ~y
+        io.O @= _Comb(name="inst")(y)
+
+    with pytest.raises(ValueError):
+        TranslationUnit(_CombLoop).compile()
+    options = CompileOptions(skip_loop_check=True)
+    TranslationUnit(_CombLoop, options=options).compile()
+
+    # Instances of non-primitive modules are opaque, and so break loops.
+    class _InstanceLoop(m.Circuit):
+        io = m.IO(I=m.In(m.Bits[4]), O=m.Out(m.Bits[4]))
+        inst = _Comb(name="inst")
+        inst.I @= inst.O ^ io.I
+        io.O @= inst.O
+
+    visitor = _RecordingVisitor(build_magma_graph(_InstanceLoop))
+    visitor.visit(_InstanceLoop)
+    assert visitor.order[-1] is _InstanceLoop
+
+@pytest.mark.parametrize("group_registers", (False, True))
+def test_group_registers(group_registers):
+    count = 16
+    defn = make_register_design(count=count, width=8)
+    m.passes.clock.WireClockPass(defn).run()
+    options = CompileOptions(group_registers=group_registers)
+    translation_unit = TranslationUnit(defn, options=options)
+    translation_unit.compile()
+    ops = list(walk_ops(translation_unit.mlir_module))
+    num_groups = 1 if group_registers else count
+    assert sum(isinstance(op, sv.AlwaysFFOp) for op in ops) == num_groups
+    assert sum(isinstance(op, sv.InitialOp) for op in ops) == num_groups
+    assert sum(isinstance(op, sv.RegOp) for op in ops) == count
+    assert sum(isinstance(op, sv.PAssignOp) for op in ops) == 2 * count
+
+
+def test_seq_registers_sync_reset():
+
+    class _SyncResetN(m.Circuit):
+        T = m.Bits[4]
+        io = m.IO(I=m.In(T), O=m.Out(T))
+        io += m.ClockIO(has_enable=True, has_resetn=True)
+        io.O @= m.Register(
+            T, init=5, reset_type=m.ResetN, has_enable=True)()(io.I)
+
+    m.passes.clock.WireClockPass(_SyncResetN).run()
+    sout = io.StringIO()
+    compile_to_mlir(
+        _SyncResetN, sout, options=CompileOptions(seq_registers=True))
+    lines = [line.strip() for line in sout.getvalue().splitlines()[1:-1]]
+    assert lines == [
+        "%1 = comb.mux %CE, %I, %0 : i4",
+        "%2 = hw.constant -1 : i1",
+        "%3 = comb.xor %2, %RESETN : i1",
+        "%4 = hw.constant 5 : i4",
+        "%0 = seq.compreg %1, %CLK, %3, %4 {name = \"Register_inst0\"} : i4",
+        "hw.output %0 : i4",
+    ]
+
+
+
+def test_seq_registers():
+
+    class _NoReset(m.Circuit):
+        T = m.Bits[4]
+        io = m.IO(I=m.In(T), O=m.Out(T)) + m.ClockIO()
+        io.O @= m.Register(T, init=5)()(io.I)
+
+    count = 4
+    defns = (
+        _NoReset,
+        make_register_design(count=count, width=8),
+        make_register_design(count=count, width=8, sync_reset=True),
+    )
+    num_compregs = []
+    num_initials = []
+    for defn in defns:
+        m.passes.clock.WireClockPass(defn).run()
+        options = CompileOptions(seq_registers=True)
+        translation_unit = TranslationUnit(defn, options=options)
+        translation_unit.compile()
+        ops = list(walk_ops(translation_unit.mlir_module))
+        num_compregs.append(sum(isinstance(op, seq.CompRegOp) for op in ops))
+        num_initials.append(sum(isinstance(op, sv.InitialOp) for op in ops))
+    # Only registers with a synchronous reset become seq.compreg ops; others
+    # (which seq.compreg can not express, or would not initialize) keep their
+    # sv.initial.
+    assert num_compregs == [0, 0, count]
+    assert num_initials == [1, count, 0]
+
+
+def _lut_tables(defn, compact_luts):
+    options = CompileOptions(compact_luts=compact_luts)
+    translation_unit = TranslationUnit(defn, options=options)
+    translation_unit.compile()
+    ops = list(walk_ops(translation_unit.mlir_module))
+    defining_ops = {op.results[0]: op for op in ops if op.results}
+    tables = []
+    for op in ops:
+        if not isinstance(op, hw.ArrayGetOp):
+            continue
+        array = defining_ops[op.operands[0]]
+        if compact_luts:
+            assert isinstance(array, hw.BitcastOp)
+            table = defining_ops[array.operands[0]].value
+            n = array.results[0].type.dims[0]
+            tables.append([(table >> i) & 1 for i in range(n)])
+            continue
+        # Elements of hw.array_create are listed from the highest index.
+        values = [defining_ops[v].value for v in reversed(array.operands)]
+        tables.append(values)
+    return tables
+
+
+def test_compact_luts():
+    defn = make_lut_design(inputs=6, width=4)
+    expected = _lut_tables(defn, compact_luts=False)
+    assert len(expected) == 4
+    assert _lut_tables(defn, compact_luts=True) == expected
+
+
+@pytest.mark.parametrize("compact_luts", (False, True))
+def test_lut_table_order(compact_luts):
+    values = (1, 1, 0, 1, 0, 0, 0, 0)
+
+    class _Lut(m.Circuit):
+        name = "lut_table_order"
+        io = m.IO(a=m.In(m.Bits[3]), y=m.Out(m.Bits[1]))
+        io.y @= m.LUT(m.Bits[1], tuple(m.Bits[1](v) for v in values))()(io.a)
+
+    (lut,) = type(_Lut.instances[0]).instances
+    init = [int(b) for b in type(lut).coreir_configargs["init"]]
+    assert init == list(values)
+    (table,) = _lut_tables(_Lut, compact_luts)
+    # Element i of the array holds init[N - 1 - i].
+    assert table[0] == init[7] == 0
+    assert table[4] == init[3] == 1
+    assert table[5] == init[2] == 0
+    assert table[7] == init[0] == 1
+    assert table == init[::-1]
+
+
+def test_pack_constant():
+    assert pack_constant(m.Bits[4], -1) == 0xF
+    assert pack_constant(m.Array[3, m.Bits[4]], (1, 2, 3)) == 0x321
+    T = m.Product.from_fields("anon", dict(x=m.Bits[8], y=m.Bit))
+    assert pack_constant(T, dict(x=0xAB, y=True)) == 0x157
+    assert pack_constant(m.Array[2, T]) == 0
+    value = (dict(x=1, y=False), dict(x=2, y=True))
+    assert pack_constant(m.Array[2, T], value) == (0x5 << 9) | 0x2
@@ -0,0 +1,49 @@
+import magma as m
+
+from builtin import builtin
+from magma_common import value_or_type_to_string
+from mlir import MlirValue
+from scoped_name_generator import ScopedNameGenerator
+
+
+def test_value_or_type_to_string():
+    T = m.Array[2, m.Bits[8]]
+    # Kinds of different directions compare equal, but must not share names.
+    assert value_or_type_to_string(T) == "Array__2_Bits_8"
+    assert value_or_type_to_string(m.In(T)) == "Array__2_In_Bits_8"
+    assert value_or_type_to_string(T) == "Array__2_Bits_8"
+
+    class _Foo(m.Circuit):
+        T = m.Array[2, m.Product.from_fields("anon", {"x": m.Bit})]
+        io = m.IO(I=m.In(T))
+
+    assert value_or_type_to_string(_Foo.I[1].x) == "I_1_x"
+
+    class _Bar(m.Circuit):
+        io = m.IO(O=m.Out(_Foo.T))
+        inst = _Foo(name="foo")
+
+    value = _Bar.inst.I[1].x
+    assert value_or_type_to_string(value) == "foo_I_1_x"
+    # Renaming (e.g. the instance) after the name was first built.
+    _Bar.inst.name = "bar"
+    assert value_or_type_to_string(value) == "bar_I_1_x"
+
+
+def test_scoped_name_generator():
+    generator = ScopedNameGenerator()
+    assert generator.allocate("x") == ("x", 0)
+    assert generator("x") == "x1"
+    assert generator.allocate("y", force=True) == ("y", None)
+    assert generator() == "0"
+    i8 = builtin.IntegerType(8)
+    value = MlirValue(i8, *generator.allocate("x"))
+    # Hashing and comparing values does not format their names.
+    assert value == MlirValue(i8, "x", 2)
+    assert hash(value) == hash(MlirValue(i8, "x", 2))
+    assert value != MlirValue(i8, "x", 3)
+    assert value._raw_name is None
+    assert value.name == "%x2"
+    # Values compare by prefix and index, rather than formatted names.
+    assert value != MlirValue(i8, "x2")
+    assert MlirValue(i8, "a").raw_name == "a"
@@ -0,0 +1,79 @@
+import io
+from typing import List
+
+from builtin import builtin
+from comb import comb
+from hw import hw
+from mlir import MlirSymbol, MlirValue, push_block
+from passes import CommonSubexpressionEliminationPass
+from printer_base import PrinterBase
+from sv import sv
+
+
+def _value(name: str, width: int = 8) -> MlirValue:
+    return MlirValue(builtin.IntegerType(width), name)
+
+
+def _module(*operands: MlirValue) -> hw.ModuleOp:
+    return hw.ModuleOp(
+        name=MlirSymbol("m"), operands=list(operands), results=[])
+
+
+def _print_body(op: hw.ModuleOp) -> List[str]:
+    sout = io.StringIO()
+    op.print(PrinterBase(sout=sout))
+    return [line.strip() for line in sout.getvalue().splitlines()[1:-1]]
+
+
+def test_cse_nested_regions():
+    clk = _value("clk", 1)
+    reg = MlirValue(hw.InOutType(builtin.IntegerType(8)), "r")
+    module = _module(clk)
+    with push_block(module):
+        hw.ConstantOp(value=1, results=[_value("c0")])
+        sv.RegOp(name="r", results=[reg])
+        always = sv.AlwaysFFOp(operands=[clk], clock_edge="posedge")
+        with push_block(always.body_block):
+            c1, c2 = _value("c1"), _value("c2")
+            hw.ConstantOp(value=1, results=[c1])
+            hw.ConstantOp(value=2, results=[c2])
+            sv.PAssignOp(operands=[reg, c1])
+            sv.PAssignOp(operands=[reg, c2])
+        # Defined after the sv.alwaysff, so not available in its body.
+        hw.ConstantOp(value=2, results=[_value("c3")])
+        initial = sv.InitialOp()
+        with push_block(initial):
+            c4 = _value("c4")
+            hw.ConstantOp(value=2, results=[c4])
+            sv.BPAssignOp(operands=[reg, c4])
+    assert CommonSubexpressionEliminationPass().run(module) == 2
+    assert _print_body(module) == [
+        "%c0 = hw.constant 1 : i8",
+        "%r = sv.reg {name = \"r\"} : !hw.inout<i8>",
+        "sv.alwaysff(posedge %clk) {",
+        "%c2 = hw.constant 2 : i8",
+        "sv.passign %r, %c0 : i8",
+        "sv.passign %r, %c2 : i8",
+        "}",
+        "%c3 = hw.constant 2 : i8",
+        "sv.initial {",
+        "sv.bpassign %r, %c3 : i8",
+        "}",
+    ]
+
+
+def test_cse_attr_dict():
+    a = _value("a")
+    module = _module(a)
+    with push_block(module):
+        results = [_value(f"x{i}") for i in range(3)]
+        for i, result in enumerate(results):
+            op = comb.BaseOp(op_name="xor", operands=[a, a], results=[result])
+            op.attr_dict["sv.namehint"] = f"\"n{i // 2}\""
+        hw.OutputOp(operands=results)
+    assert CommonSubexpressionEliminationPass().run(module) == 1
+    assert _print_body(module) == [
+        "%x0 = comb.xor %a, %a : i8",
+        "%x2 = comb.xor %a, %a : i8",
+        "hw.output %x0, %x0, %x2 : i8, i8, i8",
+    ]
@@ -0,0 +1,71 @@
+import io
+
+import magma as m
+import pytest
+
+import examples
+from printer_base import BufferedPrinter, PrinterBase
+from translation_unit import TranslationUnit
+
+
+def _print(printer, ops):
+    for op in ops:
+        op.print(printer)
+
+
+@pytest.fixture(scope="module")
+def ops():
+    # Registers are nested (sv.alwaysff/sv.initial) several levels deep.
+    ops = []
+    for ckt in (examples.complex_register_wrapper, examples.simple_hierarchy):
+        m.passes.clock.WireClockPass(ckt).run()
+        translation_unit = TranslationUnit(ckt)
+        translation_unit.compile()
+        ops += translation_unit.mlir_module.block.operations
+    return ops
+
+
+@pytest.fixture(scope="module")
+def expected(ops):
+    sout = io.StringIO()
+    _print(PrinterBase(sout=sout), ops)
+    return sout.getvalue()
+
+
+@pytest.mark.parametrize("bufsize", (1, 64, 1 << 16))
+def test_buffered_printer_text(ops, expected, bufsize):
+    sout = io.StringIO()
+    with BufferedPrinter(sout=sout, bufsize=bufsize) as printer:
+        _print(printer, ops)
+    assert sout.getvalue() == expected
+    # Indents are built once per level.
+    assert printer._indents == [" " * (4 * i) for i in range(4)]
+
+
+@pytest.mark.parametrize("bufsize", (1, 1 << 16))
+def test_buffered_printer_bytes(ops, expected, bufsize):
+    sout = io.BytesIO()
+    with BufferedPrinter(sout=sout, bufsize=bufsize) as printer:
+        _print(printer, ops)
+    assert sout.getvalue() == expected.encode()
+    assert printer.bytes_written == len(expected.encode())
+    target = bytearray(b"#")
+    with BufferedPrinter(sout=target, bufsize=bufsize) as printer:
+        _print(printer, ops)
+    assert target == b"#" + expected.encode()
+
+
+def test_buffered_printer_memoryview(ops, expected):
+    data = expected.encode()
+    buffer = bytearray(len(data) + 3)
+    with BufferedPrinter(sout=memoryview(buffer), bufsize=64) as printer:
+        _print(printer, ops)
+    assert printer.bytes_written == len(data)
+    assert buffer == data + bytes(3)
+    # Overflowing the target raises, rather than writing out of bounds.
+    small = bytearray(len(data) - 1)
+    printer = BufferedPrinter(sout=memoryview(small), bufsize=64)
+    with pytest.raises(BufferError):
+        _print(printer, ops)
+        printer.drain()
+    assert printer.bytes_written <= len(small)
@@ -0,0 +1,63 @@
+import io
+import json
+
+import magma as m
+
+from compile_to_mlir import compile_to_mlir
+import examples
+import tracing
+
+
+def _compile(ckt, **kwargs) -> str:
+    m.passes.clock.WireClockPass(ckt).run()
+    sout = io.StringIO()
+    compile_to_mlir(ckt, sout, **kwargs)
+    return sout.getvalue()
+
+
+def test_disabled():
+    assert not tracing.enabled()
+    assert tracing.span("x") is tracing.span("y")
+    with tracing.trace() as t:
+        assert tracing.enabled()
+    assert not tracing.enabled()
+    assert t.spans == []
+
+
+def test_trace_phases():
+    ckt = examples.complex_bind
+    with tracing.trace() as t:
+        _compile(ckt, options=None)
+    names = {span.name for span in t.spans}
+    assert {"dependencies", "hardware_module", "build_magma_graph", "visit",
+            "bind", "print"} <= names
+    modules = {s.module for s in t.spans if s.name == "hardware_module"}
+    assert {ckt.name, "complex_bind_asserts"} <= modules
+    for span in t.spans:
+        assert span.end_ns >= span.start_ns
+    events = json.loads(json.dumps(t.to_chrome_trace()))["traceEvents"]
+    assert len(events) == len(t.spans)
+    assert all(event["ph"] == "X" for event in events)
+    summary = t.summary()
+    assert "build_magma_graph" in summary
+    assert ckt.name in summary
+
+
+def test_hooks():
+    seen = []
+    tracing.add_hook(seen.append)
+    try:
+        _compile(examples.simple_hierarchy)
+    finally:
+        tracing.remove_hook(seen.append)
+    assert not tracing.enabled()
+    modules = {s.module for s in seen if s.name == "hardware_module"}
+    assert modules == {"simple_comb", "simple_hierarchy"}
+
+
+def test_parallel():
+    ckt = examples.simple_hierarchy
+    with tracing.trace() as t:
+        _compile(ckt, jobs=2)
+    modules = {s.module for s in t.spans if s.name == "hardware_module"}
+    assert modules == {"simple_comb", "simple_hierarchy"}
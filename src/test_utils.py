@@ -1,25 +1,39 @@
+import contextlib
+import dataclasses
 import difflib
 import functools
-import glob
+import hashlib
 import importlib
+import importlib.metadata
+import importlib.util
 import io
+import json
+import mmap
+import multiprocessing
 import os
 import pathlib
 import sys
-from typing import Any, List, Optional
+import tempfile
+import traceback
+from typing import (
+    Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple)
 
 import magma as m
+import pytest
 
+from compile_cache import DefinitionHasher, compiler_fingerprint
+from compile_options import CompileOptions
 from compile_to_mlir import compile_to_mlir
 import examples
-import magma_examples
-from mlir_to_verilog import mlir_to_verilog
+from mlir_to_verilog import mlir_to_verilog_batch
 
 
 _CMP_BUFSIZE = 8 * 1024
 _MAGMA_EXAMPLES_TO_SKIP = (
     "risc",
 )
+_GOLDS_DIR = "golds"
+_DIFF_CONTEXT = 3
 
 
 def _maybe_get_env(value: Any, key: str, default: Any) -> Any:
@@ -29,33 +43,6 @@ def _maybe_get_env(value: Any, key: str, default: Any) -> Any:
     return typ(os.environ.get(key, default))
 
 
-def _compile_to_mlir(
-        ckt: m.DefineCircuitKind, write_output_files: bool) -> io.TextIOBase:
-    if not write_output_files:
-        mlir_out = io.TextIOWrapper(io.BytesIO())
-        compile_to_mlir(ckt, mlir_out)
-        return mlir_out
-    filename = f"{ckt.name}.mlir"
-    with open(filename, "w") as mlir_out:
-        compile_to_mlir(ckt, mlir_out)
-    mlir_out = open(filename, "rb")
-    return io.TextIOWrapper(mlir_out)
-
-
-def _compile_to_verilog(
-        ckt: m.DefineCircuitKind,
-        mlir_out: io.RawIOBase,
-        write_output_files: bool) -> io.RawIOBase:
-    if not write_output_files:
-        verilog_out = io.BytesIO()
-        mlir_to_verilog(mlir_out, verilog_out)
-        return verilog_out
-    filename = f"{ckt.name}.v"
-    with open(filename, "wb") as verilog_out:
-        mlir_to_verilog(mlir_out, verilog_out)
-    return open(filename, "rb")
-
-
 def cmp_streams(
         s1: io.RawIOBase,
         s2: io.RawIOBase,
@@ -70,6 +57,73 @@ def cmp_streams(
     raise RuntimeError("Should not reach here")
 
 
+def _format_range(start: int, stop: int) -> str:
+    length = stop - start
+    if length == 1:
+        return f"{start + 1}"
+    if not length:
+        start -= 1
+    return f"{start + 1},{length}"
+
+
+def line_hash_diff(
+        a: Sequence[bytes],
+        b: Sequence[bytes],
+        from_label: str = "",
+        to_label: str = "",
+        n: int = _DIFF_CONTEXT) -> Iterator[str]:
+    """
+    Yields the unified diff of lines @a and @b, like difflib.unified_diff().
+
+    The common prefix and suffix are trimmed first, and the remaining lines
+    are interned to integers before matching, so that diffing multi-megabyte
+    files which differ in a few places is roughly linear in their size.
+    """
+    prefix = 0
+    limit = min(len(a), len(b))
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    if prefix == len(a) == len(b):
+        return
+    ids = {}
+    a_ids = [ids.setdefault(l, len(ids)) for l in a[prefix:len(a) - suffix]]
+    b_ids = [ids.setdefault(l, len(ids)) for l in b[prefix:len(b) - suffix]]
+    matcher = difflib.SequenceMatcher(None, a_ids, b_ids)
+    opcodes = [("equal", 0, prefix, 0, prefix)]
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        opcodes.append(
+            (tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix))
+    opcodes.append(
+        ("equal", len(a) - suffix, len(a), len(b) - suffix, len(b)))
+    # Drop empty runs, which get_grouped_opcodes() doesn't expect.
+    matcher.opcodes = [op for op in opcodes if op[1] < op[2] or op[3] < op[4]]
+
+    def _lines(marker, lines):
+        for line in lines:
+            line = line.decode(errors="replace")
+            if not line.endswith("\n"):
+                line += "\n\\ No newline at end of file\n"
+            yield marker + line
+
+    yield f"--- {from_label}\n"
+    yield f"+++ {to_label}\n"
+    for group in matcher.get_grouped_opcodes(n):
+        first, last = group[0], group[-1]
+        a_range = _format_range(first[1], last[2])
+        b_range = _format_range(first[3], last[4])
+        yield f"@@ -{a_range} +{b_range} @@\n"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                yield from _lines(" ", a[i1:i2])
+                continue
+            yield from _lines("-", a[i1:i2])
+            yield from _lines("+", b[j1:j2])
+
+
 def check_streams_equal(
         s1: io.RawIOBase,
         s2: io.RawIOBase,
@@ -81,35 +135,330 @@ def check_streams_equal(
         return True
     s1.seek(0)
     s2.seek(0)
-    ts1 = io.TextIOWrapper(s1)
-    ts2 = io.TextIOWrapper(s2)
-    diff = difflib.unified_diff(
-        ts1.readlines(), ts2.readlines(), from_label, to_label)
+    diff = line_hash_diff(
+        s1.read().splitlines(True), s2.read().splitlines(True),
+        from_label, to_label)
     writer.writelines(diff)
     return False
 
 
+def _digest(data) -> str:
+    return hashlib.blake2b(data).hexdigest()
+
+
+def _file_digest(path: os.PathLike) -> Tuple[int, str]:
+    """Returns the size and digest of the file at @path (read via mmap)."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:  # empty files can't be mmap'ed
+            return 0, _digest(b"")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return size, _digest(data)
+
+
+def _compare_to_gold(out: bytes, gold_path: os.PathLike) -> Optional[str]:
+    """
+    Returns None if @out matches the gold file at @gold_path, and otherwise
+    the diff between them.
+    """
+    size, digest = _file_digest(gold_path)
+    if size == len(out) and digest == _digest(out):
+        return None
+    gold = pathlib.Path(gold_path).read_bytes()
+    diff = line_hash_diff(
+        out.splitlines(True), gold.splitlines(True), "out", "gold")
+    return "".join(diff)
+
+
+@dataclasses.dataclass(frozen=True)
+class GoldenCheck:
+    """Everything (besides the circuit) which a golden check depends on."""
+    gold_name: str
+    check_verilog: bool = False
+    write_output_files: bool = False
+    jobs: int = 1
+    stream: bool = False
+    options: Optional[CompileOptions] = None
+
+    def gold_paths(self) -> List[pathlib.Path]:
+        suffixes = (".mlir", ".v") if self.check_verilog else (".mlir",)
+        return [
+            pathlib.Path(_GOLDS_DIR) / f"{self.gold_name}{suffix}"
+            for suffix in suffixes
+        ]
+
+
+@dataclasses.dataclass
+class GoldenResult:
+    gold_name: str
+    ok: bool
+    skipped: bool = False
+    # Diff (or traceback) explaining a failure.
+    message: str = ""
+    # Key to record in the manifest on success.
+    manifest_key: Optional[str] = None
+
+
+def _make_check(
+        ckt: m.DefineCircuitKind,
+        check_verilog: Optional[bool] = None,
+        write_output_files: Optional[bool] = None,
+        jobs: Optional[int] = None,
+        stream: Optional[bool] = None,
+        options: Optional[CompileOptions] = None,
+        gold_name: Optional[str] = None) -> GoldenCheck:
+    return GoldenCheck(
+        gold_name=ckt.name if gold_name is None else gold_name,
+        check_verilog=bool(_maybe_get_env(check_verilog, "CHECK_VERILOG", 0)),
+        write_output_files=bool(
+            _maybe_get_env(write_output_files, "WRITE_OUTPUT_FILES", 0)),
+        jobs=_maybe_get_env(jobs, "COMPILE_JOBS", 1),
+        stream=bool(_maybe_get_env(stream, "STREAM_OUTPUT", 0)),
+        options=options,
+    )
+
+
+def _manifest_path() -> Optional[pathlib.Path]:
+    # The manifest is opt-in: golds are only skipped if GOLDEN_MANIFEST names
+    # the file to record passing checks in (e.g. .golden_manifest.json).
+    path = os.environ.get("GOLDEN_MANIFEST")
+    return pathlib.Path(path) if path else None
+
+
+def _load_manifest() -> Dict[str, str]:
+    path = _manifest_path()
+    if path is None:
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _update_manifest(results: Sequence[GoldenResult]):
+    path = _manifest_path()
+    if path is None:
+        return
+    manifest = _load_manifest()
+    for result in results:
+        if result.skipped:
+            continue
+        if result.ok and result.manifest_key is not None:
+            manifest[result.gold_name] = result.manifest_key
+        else:
+            manifest.pop(result.gold_name, None)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+
+
+@functools.lru_cache()
+def _magma_version() -> str:
+    version = getattr(m, "__version__", None)
+    if version is not None:
+        return version
+    try:
+        return importlib.metadata.version("magma-lang")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _manifest_key(ckt: m.DefineCircuitKind, check: GoldenCheck) -> str:
+    h = hashlib.sha256()
+    parts = [
+        compiler_fingerprint(),
+        _magma_version(),
+        DefinitionHasher(lambda defn_or_decl: defn_or_decl)(ckt),
+        repr(check),
+    ]
+    for path in check.gold_paths():
+        parts.append(_file_digest(path)[1])
+    for part in parts:
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _compile_to_mlir(ckt: m.DefineCircuitKind, check: GoldenCheck) -> bytes:
+    mlir_out = io.StringIO()
+    compile_to_mlir(
+        ckt, mlir_out, jobs=check.jobs, stream=check.stream,
+        options=check.options)
+    mlir = mlir_out.getvalue().encode()
+    if check.write_output_files:
+        pathlib.Path(f"{ckt.name}.mlir").write_bytes(mlir)
+    return mlir
+
+
+def check_goldens(
+        ckts_and_checks: Sequence[Tuple[m.DefineCircuitKind, GoldenCheck]],
+        manifest: Mapping[str, str]) -> List[GoldenResult]:
+    """
+    Compiles each circuit and compares the output against its gold(s).
+
+    Circuits whose manifest key (covering the compiler sources, the magma
+    version, the circuit definition, the check configuration, and the golds)
+    matches the entry in @manifest are skipped. Verilog is generated for all
+    circuits which pass the MLIR comparison at once, with a single batched
+    circt-opt run.
+    """
+    results = []
+    pending_verilog = []
+    for ckt, check in ckts_and_checks:
+        try:
+            m.passes.clock.WireClockPass(ckt).run()
+            key = _manifest_key(ckt, check)
+            if (not check.write_output_files and
+                    manifest.get(check.gold_name) == key):
+                results.append(GoldenResult(check.gold_name, True, True))
+                continue
+            mlir = _compile_to_mlir(ckt, check)
+            mlir_gold, *_ = check.gold_paths()
+            diff = _compare_to_gold(mlir, mlir_gold)
+        except Exception:
+            results.append(
+                GoldenResult(check.gold_name, False, False,
+                             traceback.format_exc()))
+            continue
+        result = GoldenResult(check.gold_name, diff is None, False,
+                              diff or "", key)
+        results.append(result)
+        if result.ok and check.check_verilog:
+            pending_verilog.append((ckt, check, mlir, result))
+    if not pending_verilog:
+        return results
+    try:
+        verilogs = mlir_to_verilog_batch(
+            [mlir for _, _, mlir, _ in pending_verilog])
+    except Exception:
+        message = traceback.format_exc()
+        for *_, result in pending_verilog:
+            result.ok, result.message = False, message
+        return results
+    for (ckt, check, _, result), verilog in zip(pending_verilog, verilogs):
+        if check.write_output_files:
+            pathlib.Path(f"{ckt.name}.v").write_bytes(verilog)
+        _, verilog_gold = check.gold_paths()
+        diff = _compare_to_gold(verilog, verilog_gold)
+        if diff is not None:
+            result.ok, result.message = False, diff
+    return results
+
+
+def _report(results: Sequence[GoldenResult]):
+    _update_manifest(results)
+    failed = [result for result in results if not result.ok]
+    for result in failed:
+        sys.stderr.write(f"{result.gold_name}:\n{result.message}")
+    assert not failed, [result.gold_name for result in failed]
+    if results and all(result.skipped for result in results):
+        pytest.skip("unchanged since it last passed (see GOLDEN_MANIFEST)")
+
+
 def run_test_compile_to_mlir(
         ckt: m.DefineCircuitKind,
         check_verilog: Optional[bool] = None,
-        write_output_files: Optional[bool] = None):
-    check_verilog = _maybe_get_env(check_verilog, "CHECK_VERILOG", 0)
-    write_output_files = _maybe_get_env(
-        write_output_files, "WRITE_OUTPUT_FILES", 0)
-    m.passes.clock.WireClockPass(ckt).run()
-    mlir_out = _compile_to_mlir(ckt, write_output_files)
-    mlir_out.seek(0)
-    with open(f"golds/{ckt.name}.mlir", "rb") as mlir_gold:
-        assert check_streams_equal(mlir_out.buffer, mlir_gold, "out", "gold")
-    if check_verilog:
-        with open(f"golds/{ckt.name}.v", "rb") as verilog_gold:
-            mlir_out.seek(0)
-            verilog_out = _compile_to_verilog(
-                ckt, mlir_out.buffer, write_output_files)
-            verilog_out.seek(0)
-            assert check_streams_equal(verilog_out, verilog_gold, "out", "gold")
-        verilog_out.close
-    mlir_out.close()
+        write_output_files: Optional[bool] = None,
+        jobs: Optional[int] = None,
+        stream: Optional[bool] = None,
+        options: Optional[CompileOptions] = None,
+        gold_name: Optional[str] = None):
+    check = _make_check(
+        ckt, check_verilog, write_output_files, jobs, stream, options,
+        gold_name)
+    _report(check_goldens([(ckt, check)], _load_manifest()))
+
+
+# Golden tests run on a pool of TEST_JOBS processes compute the results of
+# every selected test of the suite up front (on the first test), and later
+# tests look up their results. Circuits can't be pickled, so the tasks are
+# inherited by (forked) workers and referenced by index.
+_GoldenTask = Callable[[], Sequence[Tuple[m.DefineCircuitKind, GoldenCheck]]]
+_pool_state: Optional[Tuple[Sequence[_GoldenTask], Mapping[str, str]]] = None
+
+
+def _check_goldens_in_worker(index: int) -> List[GoldenResult]:
+    tasks, manifest = _pool_state
+    try:
+        return check_goldens(tasks[index](), manifest)
+    except Exception:
+        return [GoldenResult(f"<task {index}>", False, False,
+                             traceback.format_exc())]
+
+
+def _test_jobs() -> int:
+    # Pool workers are daemonic and can't run compile_to_mlir(jobs > 1).
+    if _maybe_get_env(None, "COMPILE_JOBS", 1) > 1:
+        return 1
+    return _maybe_get_env(None, "TEST_JOBS", os.cpu_count() or 1)
+
+
+def _run_tasks_in_pool(
+        tasks: Sequence[_GoldenTask]) -> List[List[GoldenResult]]:
+    global _pool_state
+    _pool_state = (tasks, _load_manifest())
+    try:
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(min(_test_jobs(), len(tasks))) as pool:
+            return pool.map(_check_goldens_in_worker, range(len(tasks)))
+    finally:
+        _pool_state = None
+
+
+class _GoldenSuite:
+    """
+    Runs the golden tests of a suite of tasks (each producing a list of
+    circuits to check), either on demand, or all at once on a process pool.
+    Tests are parametrized by @param, whose values map to task ids through
+    @get_task_id.
+    """
+    def __init__(
+            self,
+            tasks: Mapping[Any, _GoldenTask],
+            param: str,
+            get_task_id: Callable[[Any], Any] = lambda value: value):
+        self._tasks = tasks
+        self._param = param
+        self._get_task_id = get_task_id
+        self._results = None
+
+    def _selected_task_ids(self, request) -> List[Any]:
+        """
+        Returns the ids of the tasks whose tests (of the same function as the
+        test of @request) were collected, e.g. not deselected with -k.
+        """
+        if request is None:
+            return list(self._tasks)
+        ids = set()
+        for item in request.session.items:
+            if getattr(item, "function", None) is not request.function:
+                continue
+            callspec = getattr(item, "callspec", None)
+            if callspec is not None and self._param in callspec.params:
+                ids.add(self._get_task_id(callspec.params[self._param]))
+        return [task_id for task_id in self._tasks if task_id in ids]
+
+    def run(self, task_id: Any, request=None):
+        """
+        Runs the task @task_id. @request (the pytest request of the calling
+        test, if given) restricts the tasks run on the pool to those selected.
+        """
+        if self._results is None and _test_jobs() > 1:
+            ids = self._selected_task_ids(request)
+            results = _run_tasks_in_pool([self._tasks[i] for i in ids])
+            self._results = dict(zip(ids, results))
+        try:
+            results = self._results[task_id]
+        except (KeyError, TypeError):
+            results = check_goldens(self._tasks[task_id](), _load_manifest())
+        _report(results)
 
 
 @functools.lru_cache()
@@ -121,6 +470,8 @@ def get_local_examples() -> List[m.DefineCircuitKind]:
         examples.simple_aggregates_array,
         examples.simple_aggregates_nested_array,
         examples.complex_aggregates_nested_array,
+        examples.complex_bitwise,
+        examples.complex_aggregates_reshape,
         examples.simple_aggregates_tuple,
         examples.simple_constant,
         examples.aggregate_constant,
@@ -128,6 +479,7 @@ def get_local_examples() -> List[m.DefineCircuitKind]:
         examples.aggregate_mux_wrapper,
         examples.simple_register_wrapper,
         examples.complex_register_wrapper,
+        examples.sync_reset_register_wrapper,
         examples.counter,
         examples.twizzle,
         examples.simple_unused_output,
@@ -147,6 +499,7 @@ def get_local_examples() -> List[m.DefineCircuitKind]:
         examples.complex_wire,
         examples.simple_wrap_cast,
         examples.simple_redefinition,
+        examples.simple_duplicate_modules,
         examples.simple_lut,
         examples.complex_lut,
         examples.simple_side_effect_instance,
@@ -159,19 +512,78 @@ def get_local_examples() -> List[m.DefineCircuitKind]:
     ]
 
 
+def _local_example_task(ckt: m.DefineCircuitKind):
+    return [(ckt, _make_check(ckt))]
+
+
+@functools.lru_cache()
+def _local_examples_suite() -> _GoldenSuite:
+    tasks = {
+        ckt.name: functools.partial(_local_example_task, ckt)
+        for ckt in get_local_examples()
+    }
+    return _GoldenSuite(tasks, "ckt", lambda ckt: ckt.name)
+
+
+def run_test_local_example(ckt: m.DefineCircuitKind, request=None):
+    """
+    Like run_test_compile_to_mlir(@ckt), but runs on the TEST_JOBS pool (see
+    _GoldenSuite.run() for @request).
+    """
+    _local_examples_suite().run(ckt.name, request)
+
+
+@functools.lru_cache()
+def get_magma_example_modules(
+        skips=_MAGMA_EXAMPLES_TO_SKIP) -> List[str]:
+    """
+    Returns the names of the magma_examples modules, without importing them
+    (or magma_examples itself).
+    """
+    spec = importlib.util.find_spec("magma_examples")
+    if spec is None or spec.submodule_search_locations is None:
+        return []
+    names = set()
+    for path in spec.submodule_search_locations:
+        names.update(p.stem for p in pathlib.Path(path).glob("*.py"))
+    names.discard("__init__")
+    return sorted(names.difference(skips))
+
+
+def _get_module_circuits(module_name: str) -> List[m.DefineCircuitKind]:
+    py_module = importlib.import_module(f"magma_examples.{module_name}")
+    return list(filter(
+        lambda v: isinstance(v, m.DefineCircuitKind),
+        (getattr(py_module, k) for k in dir(py_module))))
+
+
 @functools.lru_cache()
 def get_magma_examples(
         skips=_MAGMA_EXAMPLES_TO_SKIP) -> List[m.DefineCircuitKind]:
-    path = magma_examples.__path__
-    py_filenames = glob.glob(f"{path._path[0]}/*.py")
     ckts = []
-    for py_filename in py_filenames:
-        py_module_name = py_filename.split("/")[-1].split(".")[0]
-        if py_module_name in skips:
-            continue
-        full_name = f"magma_examples.{py_module_name}"
-        py_module = importlib.import_module(full_name)
-        ckts += list(filter(
-            lambda v: isinstance(v, m.DefineCircuitKind),
-            (getattr(py_module, k) for k in dir(py_module))))
+    for module_name in get_magma_example_modules(skips):
+        ckts += _get_module_circuits(module_name)
     return ckts
+
+
+def _magma_example_task(module_name: str):
+    ckts = _get_module_circuits(module_name)
+    return [(ckt, _make_check(ckt)) for ckt in ckts]
+
+
+@functools.lru_cache()
+def _magma_examples_suite() -> _GoldenSuite:
+    tasks = {
+        module_name: functools.partial(_magma_example_task, module_name)
+        for module_name in get_magma_example_modules()
+    }
+    return _GoldenSuite(tasks, "module_name")
+
+
+def run_test_magma_example_module(module_name: str, request=None):
+    """
+    Checks every circuit in magma_examples.@module_name against its gold. The
+    module is only imported by the process which compiles it (see
+    _GoldenSuite.run() for @request).
+    """
+    _magma_examples_suite().run(module_name, request)
@@ -0,0 +1,191 @@
+"""
+Lightweight instrumentation of the compiler: spans around each phase, tagged
+with the module they belong to.
+
+Spans are only recorded while a trace is active (see trace()) or a hook is
+registered (see add_hook()); otherwise span() returns a shared no-op context
+manager, so instrumentation costs a single flag check.
+
+    with tracing.trace() as t:
+        compile_to_mlir(top, sout)
+    t.write_chrome_trace(open("trace.json", "w"))
+    print(t.summary())
+"""
+import collections
+import contextlib
+import dataclasses
+import json
+import os
+import threading
+import time
+from typing import (
+    Callable, ContextManager, Iterable, Iterator, List, Optional, TextIO)
+
+
+@dataclasses.dataclass(frozen=True)
+class Span:
+    name: str
+    # Name of the (hardware) module the span belongs to, if any.
+    module: Optional[str]
+    # perf_counter_ns() timestamps (monotonic, and shared by forked workers).
+    start_ns: int
+    end_ns: int
+    pid: int
+    tid: int
+
+    @property
+    def seconds(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+SpanHook = Callable[[Span], None]
+
+
+class Trace:
+    """Spans recorded while this trace was active, in order of completion."""
+    def __init__(self):
+        self._spans = []
+
+    @property
+    def spans(self) -> List[Span]:
+        return self._spans
+
+    def to_chrome_trace(self) -> dict:
+        """Returns the spans in the Chrome trace-event (JSON object) format."""
+        events = []
+        for span in self._spans:
+            event = dict(
+                name=span.name,
+                ph="X",
+                ts=span.start_ns / 1e3,
+                dur=(span.end_ns - span.start_ns) / 1e3,
+                pid=span.pid,
+                tid=span.tid,
+            )
+            if span.module is not None:
+                event["args"] = dict(module=span.module)
+            events.append(event)
+        return dict(traceEvents=events, displayTimeUnit="ms")
+
+    def write_chrome_trace(self, fout: TextIO):
+        json.dump(self.to_chrome_trace(), fout)
+
+    def summary(self, top_modules: int = 10) -> str:
+        """
+        Returns a table of the time spent in each phase, followed by the
+        @top_modules modules which took longest to compile. Time in nested
+        spans also counts towards each enclosing span.
+        """
+        phases = collections.defaultdict(list)
+        modules = collections.Counter()
+        for span in self._spans:
+            phases[span.name].append(span.seconds)
+            if span.module is not None and span.name == "hardware_module":
+                modules[span.module] += span.seconds
+        lines = [f"{'phase':<20} {'count':>7} {'total (ms)':>11} "
+                 f"{'mean (ms)':>10} {'max (ms)':>10}"]
+        for name, durations in phases.items():
+            total = sum(durations)
+            lines.append(
+                f"{name:<20} {len(durations):>7} {1000 * total:>11.3f} "
+                f"{1000 * total / len(durations):>10.3f} "
+                f"{1000 * max(durations):>10.3f}")
+        if modules:
+            lines.append("")
+            lines.append(f"{'module':<40} {'total (ms)':>11}")
+            for module, total in modules.most_common(top_modules):
+                lines.append(f"{module:<40} {1000 * total:>11.3f}")
+        return "\n".join(lines) + "\n"
+
+
+_traces: List[Trace] = []
+_hooks: List[SpanHook] = []
+# Whether any trace or hook is active; checked on every span() call.
+_active = False
+
+
+def _update_active():
+    global _active
+    _active = bool(_traces or _hooks)
+
+
+def enabled() -> bool:
+    return _active
+
+
+def record(spans: Iterable[Span]):
+    """
+    Records previously completed @spans (e.g. returned by a worker process)
+    in the active traces and passes them to the registered hooks.
+    """
+    for span in spans:
+        for t in _traces:
+            t.spans.append(span)
+        for hook in _hooks:
+            hook(span)
+
+
+class _SpanContext:
+    __slots__ = ("_name", "_module", "_start_ns")
+
+    def __init__(self, name: str, module: Optional[str]):
+        self._name = name
+        self._module = module
+
+    def __enter__(self):
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_):
+        end_ns = time.perf_counter_ns()
+        span = Span(
+            self._name, self._module, self._start_ns, end_ns, os.getpid(),
+            threading.get_ident())
+        record((span,))
+
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def span(name: str, module: Optional[str] = None) -> ContextManager:
+    """Returns a context manager which times its body as span @name."""
+    if not _active:
+        return _NULL_SPAN
+    return _SpanContext(name, module)
+
+
+@contextlib.contextmanager
+def trace(isolated: bool = False) -> Iterator[Trace]:
+    """
+    Records the spans completed inside the context into the yielded Trace. If
+    @isolated is set, other traces and hooks are suspended meanwhile (e.g. in
+    a worker process, whose spans are sent back to the parent instead).
+    """
+    global _traces, _hooks
+    t = Trace()
+    saved = _traces, _hooks
+    if isolated:
+        _traces, _hooks = [], []
+    _traces = _traces + [t]
+    _update_active()
+    try:
+        yield t
+    finally:
+        if isolated:
+            _traces, _hooks = saved
+        else:
+            _traces = [other for other in _traces if other is not t]
+        _update_active()
+
+
+def add_hook(hook: SpanHook):
+    """Registers @hook to be called with every completed span."""
+    global _hooks
+    _hooks = _hooks + [hook]
+    _update_active()
+
+
+def remove_hook(hook: SpanHook):
+    global _hooks
+    _hooks = [h for h in _hooks if h != hook]
+    _update_active()
@@ -1,17 +1,68 @@
-from typing import Any
+import io
+import itertools
+import multiprocessing
+from typing import Any, Iterable, List, Mapping, Optional, Tuple
 import weakref
 
 import magma as m
 
 from builtin import builtin
-from hardware_module import HardwareModule
-from mlir import MlirSymbol, push_block
+from compile_cache import CachedTextOp, CompileCache, DefinitionHasher
+from compile_options import CompileOptions
+from hardware_module import (
+    HardwareModule, make_signature, treat_as_definition, treat_as_primitive)
+from mlir import MlirBlock, MlirOp, MlirSymbol, push_block
+from module_dedup import ModuleDeduplicator
+from passes import PassManager
+from printer_base import BufferedPrinter, PrinterBase
 from scoped_name_generator import ScopedNameGenerator
+import tracing
+
+
+# State shared with worker processes. Magma circuits are not picklable, so
+# workers are forked after this is set and only receive indices into @deps.
+_worker_state = None
+
+
+def _compile_in_worker(
+        index: int) -> Tuple[str, Mapping, List[tracing.Span]]:
+    top, options, deps, canonical = _worker_state
+    translation_unit = TranslationUnit(top, options=options)
+    if not tracing.enabled():
+        text = translation_unit.compile_standalone(deps[index], canonical)
+        return text, translation_unit.pass_manager.stats, []
+    # Spans are sent back to (and recorded by) the parent process.
+    with tracing.trace(isolated=True) as trace:
+        text = translation_unit.compile_standalone(deps[index], canonical)
+    return text, translation_unit.pass_manager.stats, trace.spans
+
+
+def _print_ops(ops: Iterable[MlirOp]) -> str:
+    sout = io.StringIO()
+    with BufferedPrinter(sout=sout) as printer:
+        for op in ops:
+            op.print(printer)
+    return sout.getvalue()
 
 
 class TranslationUnit:
-    def __init__(self, magma_top: m.DefineCircuitKind):
+    def __init__(
+            self,
+            magma_top: m.DefineCircuitKind,
+            cache: Optional[CompileCache] = None,
+            options: Optional[CompileOptions] = None):
         self._magma_top = magma_top
+        self._cache = cache
+        if options is None:
+            options = CompileOptions()
+        if options.dedup_modules and cache is not None:
+            raise ValueError("dedup_modules is not supported with cache")
+        self._options = options
+        self._pass_manager = PassManager(options.passes)
+        self._hasher = None
+        self._deduplicator = None
+        if options.dedup_modules:
+            self._deduplicator = ModuleDeduplicator()
         self._mlir_module = builtin.ModuleOp()
         self._hardware_modules = {}
         self._symbol_map = {}
@@ -25,6 +76,22 @@ class TranslationUnit:
     def mlir_module(self) -> builtin.ModuleOp:
         return self._mlir_module
 
+    @property
+    def cache(self) -> Optional[CompileCache]:
+        return self._cache
+
+    @property
+    def options(self) -> CompileOptions:
+        return self._options
+
+    @property
+    def pass_manager(self) -> PassManager:
+        return self._pass_manager
+
+    @property
+    def deduplicator(self) -> Optional[ModuleDeduplicator]:
+        return self._deduplicator
+
     def new_hardware_module(
             self, magma_defn_or_decl: m.circuit.CircuitKind) -> HardwareModule:
         return HardwareModule(magma_defn_or_decl, weakref.ref(self))
@@ -67,16 +134,203 @@ class TranslationUnit:
         name = self._symbol_name_generator(**kwargs)
         return MlirSymbol(name)
 
-    def compile(self):
-        deps = m.passes.dependencies(self._magma_top, include_self=True)
+    def compile(self, printer: Optional[PrinterBase] = None):
+        """
+        Compiles every dependency of the top circuit into mlir_module.
+
+        If @printer is given, compilation is streamed instead: each module is
+        printed as soon as it is compiled, and then its IR is dropped (keeping
+        only its signature), so that peak memory is bounded by the largest
+        single module rather than the whole design.
+        """
+        with tracing.span("dependencies"):
+            deps = self._get_dependencies()
+        if self._cache is not None:
+            _, canonical = self._schedule(deps)
+            self._make_hasher(canonical)
+        block = self._mlir_module.block
         with push_block(self._mlir_module):
             for dep in deps:
                 if self.has_hardware_module(dep):
                     continue
+                num_keys = len(self._hardware_modules)
+                num_ops = len(block.operations)
                 hardware_module = self.new_hardware_module(dep)
-                hardware_module.compile()
+                if self._cache is None or treat_as_primitive(dep):
+                    hardware_module.compile()
+                else:
+                    self._compile_with_cache(hardware_module)
                 if hardware_module.hw_module:
+                    if self._deduplicator is not None:
+                        hardware_module = self._deduplicate(
+                            hardware_module, num_ops)
                     self.set_hardware_module(dep, hardware_module)
+                if printer is None:
+                    continue
+                with tracing.span("print", dep.name):
+                    for op in block.operations:
+                        op.print(printer)
+                block.operations.clear()
+                self._release_hardware_modules(num_keys)
+
+    def _deduplicate(
+            self, hardware_module: HardwareModule,
+            start: int) -> HardwareModule:
+        """
+        Returns the first compiled module structurally identical to (the just
+        compiled) @hardware_module, erasing the ops of the latter, which were
+        added from index @start of mlir_module. Returns @hardware_module itself
+        if there is no such module.
+        """
+        if hardware_module.magma_defn_or_decl is self._magma_top:
+            return hardware_module
+        ops = self._mlir_module.block.operations
+        # Modules which own bind modules are compiled into several ops, and
+        # are kept as is.
+        op = hardware_module.hw_module
+        if len(ops) != start + 1 or ops[start] is not op:
+            return hardware_module
+        with tracing.span("dedup", hardware_module.name):
+            canonical = self._deduplicator.find_canonical(
+                op, hardware_module)
+        if canonical is None:
+            return hardware_module
+        del ops[start:]
+        return canonical
+
+    def _release_hardware_modules(self, start: int):
+        # Only the keys added from index @start on are visited (from the end),
+        # so that streaming stays linear in the number of modules.
+        num_keys = len(self._hardware_modules) - start
+        keys = list(
+            itertools.islice(reversed(self._hardware_modules), num_keys))
+        for key in reversed(keys):
+            value = self._hardware_modules[key]
+            # NOTE: Bind modules are registered as their hw op directly (see
+            # BindProcessor.preprocess()).
+            if isinstance(value, HardwareModule):
+                value.release()
+            else:
+                self._hardware_modules[key] = make_signature(value)
+
+    def _make_hasher(self, canonical: Mapping[str, m.circuit.CircuitKind]):
+        self._hasher = DefinitionHasher(
+            lambda defn: canonical.get(self._make_key(defn), defn))
+
+    def _cache_key(self, defn_or_decl: m.circuit.CircuitKind) -> str:
+        return self._cache.make_key(
+            self._hasher(defn_or_decl), repr(self._options))
+
+    def _compile_with_cache(self, hardware_module: HardwareModule):
+        defn_or_decl = hardware_module.magma_defn_or_decl
+        key = self._cache_key(defn_or_decl)
+        text = self._cache.get(key)
+        if text is None:
+            block = self._mlir_module.block
+            start = len(block.operations)
+            hardware_module.compile()
+            self._cache.put(key, _print_ops(block.operations[start:]))
+            return
+        # The cached text already contains the module (and any bind modules it
+        # owns); only signatures are needed so that parents can instantiate
+        # them. These are built into a detached block so they are not printed.
+        with push_block(MlirBlock()):
+            hardware_module.compile(signature_only=True)
+            if treat_as_definition(defn_or_decl):
+                for bind_module in defn_or_decl.bind_modules:
+                    bind = self.new_hardware_module(bind_module)
+                    bind.compile(signature_only=True)
+                    self.set_hardware_module(bind_module, bind.hw_module)
+        CachedTextOp(text=text)
+
+    def compile_parallel(self, jobs: int) -> Iterable[str]:
+        """
+        Compiles every dependency of the top circuit on a pool of @jobs worker
+        processes, yielding the printed text of each compiled module in the
+        same order as a serial compile()/print would.
+
+        Each module only depends on the signatures (symbol and port names) of
+        the modules it instantiates, which workers rebuild cheaply, so all
+        modules can be compiled independently of one another.
+        """
+        global _worker_state
+        if self._deduplicator is not None:
+            raise ValueError("dedup_modules is not supported with jobs")
+        with tracing.span("dependencies"):
+            deps, canonical = self._schedule(self._get_dependencies())
+        keys = [None] * len(deps)
+        texts = [None] * len(deps)
+        if self._cache is not None:
+            self._make_hasher(canonical)
+            keys = [self._cache_key(dep) for dep in deps]
+            texts = [self._cache.get(key) for key in keys]
+        misses = [index for index, text in enumerate(texts) if text is None]
+        _worker_state = (self._magma_top, self._options, deps, canonical)
+        chunksize = max(1, len(misses) // (4 * jobs))
+        context = multiprocessing.get_context("fork")
+        try:
+            with context.Pool(jobs) as pool:
+                results = pool.imap(_compile_in_worker, misses, chunksize)
+                for key, text in zip(keys, texts):
+                    if text is None:
+                        text, stats, spans = next(results)
+                        self._pass_manager.merge_stats(stats)
+                        tracing.record(spans)
+                        if self._cache is not None:
+                            self._cache.put(key, text)
+                    yield text
+        finally:
+            _worker_state = None
+
+    def compile_standalone(
+            self,
+            defn_or_decl: m.circuit.CircuitKind,
+            canonical: Mapping[str, m.circuit.CircuitKind]) -> str:
+        """
+        Compiles @defn_or_decl (and any bind modules it owns) into this
+        translation unit and returns the printed text. Instantiated modules are
+        compiled as signatures only, resolving names through @canonical.
+        """
+        for inst in getattr(defn_or_decl, "instances", []):
+            child = type(inst)
+            if treat_as_primitive(child):
+                continue
+            child = canonical.get(self._make_key(child), child)
+            if self.has_hardware_module(child):
+                continue
+            hardware_module = self.new_hardware_module(child)
+            hardware_module.compile(signature_only=True)
+            self.set_hardware_module(child, hardware_module)
+        with push_block(self._mlir_module):
+            hardware_module = self.new_hardware_module(defn_or_decl)
+            hardware_module.compile()
+        return _print_ops(self._mlir_module.block.operations)
+
+    def _get_dependencies(self) -> List[m.circuit.CircuitKind]:
+        return m.passes.dependencies(self._magma_top, include_self=True)
+
+    def _schedule(
+            self, deps: List[m.circuit.CircuitKind]) -> Tuple[
+                List[m.circuit.CircuitKind],
+                Mapping[str, m.circuit.CircuitKind]]:
+        """
+        Replays the key de-duplication done by compile() without compiling
+        anything. Returns the dependencies which would produce a module, and
+        the definition each key resolves to.
+        """
+        scheduled = []
+        canonical = {}
+        for dep in deps:
+            key = self._make_key(dep)
+            if key in canonical or treat_as_primitive(dep):
+                continue
+            canonical[key] = dep
+            scheduled.append(dep)
+            if not treat_as_definition(dep):
+                continue
+            for bind_module in dep.bind_modules:
+                canonical.setdefault(self._make_key(bind_module), bind_module)
+        return scheduled, canonical
 
     @staticmethod
     def _make_key(magma_defn_or_decl: m.circuit.CircuitKind) -> str: